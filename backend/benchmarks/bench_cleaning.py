@@ -0,0 +1,100 @@
+"""
+Micro-benchmark: per-row cleaning helpers vs. the vectorized kernels in
+services/cleaning.py, on 100k-row columns shaped like the workbooks
+(mostly numbers, some "$1,234.50" text, some blanks and garbage).
+
+Run from backend/:  python benchmarks/bench_cleaning.py [rows]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import cleaning  # noqa: E402
+
+
+# Per-row helpers as they were in services/cobranza.py and services/cartera.py
+def clean_money(val):
+    if pd.isna(val):
+        return None
+    if isinstance(val, (int, float)):
+        return float(val)
+    s = str(val).replace("$", "").replace(",", "").strip()
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def process_percentage(val):
+    if pd.isna(val):
+        return None
+    try:
+        return float(val) / 100.0
+    except:
+        return None
+
+
+def make_money_column(rows: int) -> pd.Series:
+    rng = np.random.default_rng(42)
+    amounts = rng.uniform(10, 250_000, rows).round(2)
+    values = amounts.astype(object)
+    text = rng.random(rows) < 0.3
+    values[text] = [f"${x:,.2f}" for x in amounts[text]]
+    values[rng.random(rows) < 0.05] = None
+    values[rng.random(rows) < 0.01] = "N/A"
+    return pd.Series(values, dtype=object)
+
+
+def make_percentage_column(rows: int) -> pd.Series:
+    rng = np.random.default_rng(7)
+    values = rng.integers(1, 60, rows).astype(object)
+    values[rng.random(rows) < 0.05] = None
+    values[rng.random(rows) < 0.01] = "n/d"
+    return pd.Series(values, dtype=object)
+
+
+def check_same(old: pd.Series, new: pd.Series):
+    old = pd.to_numeric(old, errors="coerce").astype("float64")
+    assert np.allclose(old.fillna(-1), new.fillna(-1)), "results differ"
+
+
+def bench(label: str, func, repeat: int = 5) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"  {label:<12} {best * 1000:9.1f} ms")
+    return best
+
+
+def main(rows: int):
+    money_col = make_money_column(rows)
+    pct_col = make_percentage_column(rows)
+
+    check_same(money_col.apply(clean_money), cleaning.money(money_col))
+    check_same(money_col.astype(str).apply(clean_money), cleaning.money(money_col.astype(str)))
+    check_same(pct_col.apply(process_percentage), cleaning.percentage(pct_col))
+
+    print(f"money, mixed numbers and text ({rows} rows)")
+    old = bench("per-row", lambda: money_col.apply(clean_money))
+    new = bench("vectorized", lambda: cleaning.money(money_col))
+    print(f"  speedup      {old / new:9.1f}x")
+
+    # The common case: Excel stored the amounts as numbers
+    numeric_col = pd.to_numeric(money_col, errors="coerce").astype("float64")
+    print(f"money, numeric column ({rows} rows)")
+    old = bench("per-row", lambda: numeric_col.apply(clean_money))
+    new = bench("vectorized", lambda: cleaning.money(numeric_col))
+    print(f"  speedup      {old / new:9.1f}x")
+
+    print(f"percentage ({rows} rows)")
+    old = bench("per-row", lambda: pct_col.apply(process_percentage))
+    new = bench("vectorized", lambda: cleaning.percentage(pct_col))
+    print(f"  speedup      {old / new:9.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
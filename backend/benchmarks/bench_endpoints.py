@@ -0,0 +1,204 @@
+"""
+Benchmark: drive every read endpoint in-process (FastAPI TestClient) against
+synthetic workbooks and report latency, throughput and peak memory.
+
+For each endpoint:
+- cold: the first request, which parses and cleans the workbook
+- p50/p95: warm requests served from the workbook cache
+- req/s: warm requests per second, one client at a time
+- MB/s: response bytes per second over the same requests
+- peak MB: largest Python allocation (tracemalloc) while serving one warm
+  request; the parse itself shows up in the final max RSS
+
+Sidecars are disabled and cleaning runs in-process by default, so cold
+numbers measure the xlsx parse and memory tracing sees everything.
+
+Run from backend/:
+    python benchmarks/bench_endpoints.py [--rows 10000] [--data DIR] [--repeat 20]
+                                         [--json out.json] [--compare baseline.json]
+
+Without --data the workbooks are generated (and reused) under the system
+temp directory. --compare prints the change against an earlier --json run
+and exits non-zero if any warm p50 got more than --tolerance slower.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+ENDPOINTS = [
+    ("GET", "/cobranza/vida"),
+    ("GET", "/cobranza/gmm"),
+    ("GET", "/cobranza/vida?insurer=SURA"),
+    ("GET", "/cobranza/vida?insurer=AARCO_AXA"),
+    ("GET", "/cobranza/vida?start_date=2025-01-01&end_date=2025-06-30"),
+    ("GET", "/cobranza/vida?limit=100&sort=-Prima Pagada"),
+    ("GET", "/cobranza/vida?insurer=SURA&format=columns"),
+    ("GET", "/renovaciones/upcoming?start_date=2020-01-01&end_date=2030-12-31"),
+    ("GET", "/renovaciones/upcoming?insurer=SURA&days=90"),
+    ("GET", "/renovaciones/upcoming?insurer=AARCO_AXA&days=90"),
+    ("GET", "/cartera/data?insurer=Metlife"),
+    ("GET", "/cartera/data?insurer=SURA"),
+    ("GET", "/cartera/search?query=maria garcia"),
+    ("GET", "/clientes/"),
+    ("GET", "/clientes/search?name=juan perez&fuzzy=true"),
+    ("GET", "/dashboards/rollup"),
+    ("POST", "/login"),
+]
+LOGIN = {"username": "admin", "password": "admin"}
+
+
+def configure(data_dir: Path, work_dir: Path, cpu_workers: int, sidecars: bool):
+    # Must run before config is imported
+    os.environ["TAIICO_DATA_DIR"] = str(data_dir)
+    os.environ["TAIICO_WARMUP"] = "0"
+    os.environ["TAIICO_CPU_WORKERS"] = str(cpu_workers)
+    os.environ["TAIICO_SIDECAR_DIR"] = str(work_dir / "sidecar") if sidecars else ""
+    os.environ["TAIICO_JOURNAL_PATH"] = str(work_dir / "journal.sqlite3")
+    os.environ["TAIICO_CLIENTS_DB_PATH"] = str(work_dir / "clientes.sqlite3")
+    os.environ["TAIICO_CLIENTS_EXPORT_SECONDS"] = "0"
+
+
+def request(client, method: str, url: str):
+    if method == "POST":
+        response = client.post(url, json=LOGIN)
+    else:
+        response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def bench_endpoint(client, method: str, url: str, repeat: int) -> dict:
+    start = time.perf_counter()
+    response = request(client, method, url)
+    cold = time.perf_counter() - start
+
+    timings, sent = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = request(client, method, url)
+        timings.append(time.perf_counter() - start)
+        sent += len(response.content)
+
+    # Traced separately: tracemalloc slows allocations down a lot
+    tracemalloc.start()
+    request(client, method, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(timings)
+    return {
+        "cold_ms": cold * 1000,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "req_per_s": repeat / total,
+        "mb_per_s": sent / total / 1e6,
+        "bytes": len(response.content),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss / 1e6 if sys.platform == "darwin" else rss / 1e3
+
+
+def print_table(results: dict):
+    print(f"{'endpoint':<66} {'cold ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8} {'MB/s':>7} {'KB':>8} {'peak MB':>8}")
+    for name, r in results.items():
+        print(
+            f"{name[:66]:<66} {r['cold_ms']:9.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} "
+            f"{r['req_per_s']:8.1f} {r['mb_per_s']:7.1f} {r['bytes'] / 1e3:8.1f} {r['peak_mb']:8.1f}"
+        )
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    """
+    Print warm p50 and cold latency against an earlier run. Returns False if
+    any warm p50 regressed by more than `tolerance` (0.2 = 20% slower).
+    """
+    baseline = json.loads(Path(baseline_path).read_text())["endpoints"]
+    ok = True
+    print(f"\nagainst {baseline_path}:")
+    for name, r in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        change = r["p50_ms"] / old["p50_ms"] - 1
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"  {name[:66]:<66} p50 {change:+7.1%}  cold {r['cold_ms'] / old['cold_ms'] - 1:+7.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the read endpoints on synthetic workbooks")
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows per workbook")
+    parser.add_argument("--data", help="Synthetic data directory (generated if missing)")
+    parser.add_argument("--repeat", type=int, default=20, help="Warm requests per endpoint")
+    parser.add_argument("--cpu-workers", type=int, default=0, help="Cleaning processes (0: in-process)")
+    parser.add_argument("--sidecars", action="store_true", help="Enable Parquet sidecars")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown for --compare")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data or Path(tempfile.gettempdir()) / f"taiico-bench-{args.rows}")
+    work_dir = Path(tempfile.mkdtemp(prefix="taiico-bench-state-"))
+    configure(data_dir, work_dir, args.cpu_workers, args.sidecars)
+
+    from benchmarks.generate_data import generate
+    generate(data_dir, args.rows)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    results = {}
+    with TestClient(app_main.app) as client:
+        for method, url in ENDPOINTS:
+            name = f"{method} {url}"
+            results[name] = bench_endpoint(client, method, url, args.repeat)
+            print(f"  {name}: {results[name]['p50_ms']:.2f} ms", file=sys.stderr)
+
+    print(f"\n{args.rows} rows per workbook, {args.repeat} warm requests per endpoint\n")
+    print_table(results)
+    rss = max_rss_mb()
+    if rss is not None:
+        print(f"\nmax RSS: {rss:.0f} MB")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "rows": args.rows,
+            "repeat": args.repeat,
+            "max_rss_mb": rss,
+            "endpoints": results,
+        }, indent=2))
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
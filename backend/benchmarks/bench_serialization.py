@@ -0,0 +1,70 @@
+"""
+Benchmark: the old response path (replace NaN -> None, to_dict(records),
+FastAPI's jsonable_encoder, json.dumps) against FrameJSONResponse, on a
+frame shaped like a cleaned cobranza sheet.
+
+Run from backend/:  python benchmarks/bench_serialization.py [rows]
+"""
+
+import json
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.serialization import FrameJSONResponse  # noqa: E402
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    money = rng.uniform(10, 250_000, rows).round(2)
+    money[rng.random(rows) < 0.05] = np.nan
+    dates = pd.Series(pd.date_range("2019-01-01", periods=2000, freq="D")).sample(rows, replace=True, random_state=1)
+    return pd.DataFrame({
+        "# de Póliza": rng.integers(1_000_000, 9_999_999, rows),
+        "Producto": rng.choice(["VIDA TOTAL", "TEMPORAL 20", "DOTAL"], rows),
+        "Conducto de Cobro": rng.choice(["CAT", "TDC", "DOMICILIADO", None], rows),
+        "Fecha de Pago del Recibo": dates.to_numpy(),
+        "Año de Vida Póliza": rng.integers(1, 30, rows),
+        "Prima Pagada": money,
+        "Comisión Bruto": money * 0.2,
+        "Comisión Neta": money * 0.17,
+    })
+
+
+def old_path(df: pd.DataFrame) -> bytes:
+    df = df.copy()
+    df["Fecha de Pago del Recibo"] = df["Fecha de Pago del Recibo"].dt.strftime("%Y-%m-%d")
+    records = df.replace({np.nan: None}).to_dict(orient="records")
+    return json.dumps(jsonable_encoder(records), ensure_ascii=False).encode("utf-8")
+
+
+def new_path(df: pd.DataFrame) -> bytes:
+    return FrameJSONResponse([df]).body
+
+
+def bench(label: str, func, repeat: int = 3) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"  {label:<22} {best * 1000:9.1f} ms")
+    return best
+
+
+def main(rows: int):
+    df = make_frame(rows)
+    old_rows = json.loads(old_path(df))
+    new_rows = json.loads(new_path(df))
+    assert len(old_rows) == len(new_rows) and old_rows[0].keys() == new_rows[0].keys()
+
+    print(f"serialize {rows} rows")
+    old = bench("to_dict + encoder", lambda: old_path(df))
+    new = bench("FrameJSONResponse", lambda: new_path(df))
+    print(f"  speedup                {old / new:9.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,331 @@
+"""
+Synthetic workbooks in the layout of the shared drive, for benchmarking
+without the real (confidential) files.
+
+Every workbook the services read is generated with the sheet names and
+columns its clean_* function expects, and with the same mess as the real
+extracts: amounts stored partly as "$12,345.67" text, blanks, Metlife GMM
+dates as YYYYMMDD numbers, repeated GMM policies (one row per insured),
+contratantes shared across workbooks and the client list.
+
+Run from backend/:
+    python benchmarks/generate_data.py OUT_DIR [--rows 10000] [--seed 0]
+    TAIICO_DATA_DIR=OUT_DIR uvicorn main:app
+
+--rows is the row count of each workbook (1k to 1M; Excel stops at
+1,048,575 data rows). Large sizes take minutes to write with openpyxl;
+pandas uses xlsxwriter instead when it is installed, which is faster.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config  # noqa: E402
+
+FIRST_NAMES = [
+    "JUAN", "MARÍA", "JOSÉ", "GUADALUPE", "FRANCISCO", "ANA", "LUIS", "PATRICIA", "CARLOS", "SOFÍA",
+    "JORGE", "VERÓNICA", "MIGUEL", "ALEJANDRA", "RICARDO", "FERNANDA", "ROBERTO", "GABRIELA", "EDUARDO", "LUCÍA",
+]
+LAST_NAMES = [
+    "HERNÁNDEZ", "GARCÍA", "MARTÍNEZ", "LÓPEZ", "GONZÁLEZ", "PÉREZ", "RODRÍGUEZ", "SÁNCHEZ", "RAMÍREZ", "CRUZ",
+    "FLORES", "GÓMEZ", "MORALES", "VÁZQUEZ", "REYES", "JIMÉNEZ", "TORRES", "DÍAZ", "GUTIÉRREZ", "RUIZ",
+    "MENDOZA", "AGUILAR", "ORTIZ", "MORENO", "CASTILLO", "ROMERO", "ÁLVAREZ", "MÉNDEZ", "CHÁVEZ", "RIVERA",
+]
+PROSPECTADORES = ["ANA TAIICO", "LUIS TAIICO", "DIRECTO", "OFICINA", "REFERIDO"]
+MANIFEST = "taiico-synthetic.json"
+
+
+class Generator:
+    def __init__(self, rows: int, seed: int):
+        self.rows = rows
+        self.rng = np.random.default_rng(seed)
+        # Contratantes are shared by every workbook and the client list
+        n_clients = max(rows // 5, 100)
+        first = self.rng.choice(FIRST_NAMES, n_clients)
+        last = self.rng.choice(LAST_NAMES, (2, n_clients))
+        self.clients = np.array([f"{f} {a} {b}" for f, a, b in zip(first, last[0], last[1])], dtype=object)
+        self.today = pd.Timestamp.today().normalize()
+
+    def names(self, n: int) -> np.ndarray:
+        return self.rng.choice(self.clients, n)
+
+    def policies(self, n: int, start: int) -> np.ndarray:
+        return start + self.rng.permutation(n)
+
+    def money(self, n: int, low: float = 500, high: float = 250_000) -> np.ndarray:
+        """
+        Amounts as numbers, ~30% as "$1,234.56" text and ~3% blank.
+        """
+        amounts = self.rng.uniform(low, high, n).round(2)
+        values = amounts.astype(object)
+        text = self.rng.random(n) < 0.3
+        values[text] = [f"${x:,.2f}" for x in amounts[text]]
+        values[self.rng.random(n) < 0.03] = None
+        return values
+
+    def dates(self, n: int, back: int = 730, ahead: int = 365) -> pd.Series:
+        offsets = self.rng.integers(-back, ahead, n)
+        return pd.Series(self.today + pd.to_timedelta(offsets, unit="D"))
+
+    def text_dates(self, n: int) -> np.ndarray:
+        """
+        Mostly real dates, ~10% ISO text and ~2% blank, as typed by hand.
+        """
+        values = self.dates(n).astype(object).to_numpy(copy=True)
+        text = self.rng.random(n) < 0.1
+        values[text] = [d.strftime("%Y-%m-%d") for d in values[text]]
+        values[self.rng.random(n) < 0.02] = None
+        return values
+
+    def yyyymmdd(self, n: int) -> np.ndarray:
+        return self.dates(n).dt.strftime("%Y%m%d").astype(int).to_numpy()
+
+    def choice(self, options, n: int) -> np.ndarray:
+        return self.rng.choice(np.array(options, dtype=object), n)
+
+    # One builder per schema, named after the config entry it feeds
+
+    def metlife_cobranza(self) -> dict:
+        n = self.rows
+        vida = pd.DataFrame({
+            "# de Póliza": self.policies(n, 1_000_000),
+            "Producto": self.choice(["VIDA TOTAL", "TEMPORAL 20", "DOTAL 65", "IMAGINA SER"], n),
+            "Conducto de Cobro": self.choice(["CARGO AUTOMATICO", "AGENTE", "DESCUENTO NOMINA"], n),
+            # Trailing space, as in the real header
+            "Fecha de Pago del Recibo ": self.dates(n),
+            "Año de Vida Póliza": self.rng.integers(1, 25, n),
+            "Prima Pagada": self.money(n),
+            "Comisión Bruto": self.money(n, 50, 40_000),
+            "Comisión Neta": self.money(n, 40, 35_000),
+        })
+        gmm = pd.DataFrame({
+            "# de Póliza": self.policies(n, 2_000_000),
+            "Producto": self.choice(["GMM MEDIKA", "GMM FLEX", "GMM COLECTIVO"], n),
+            "Conducto de Cobro": self.choice(["CARGO AUTOMATICO", "AGENTE"], n),
+            "Fecha de Pago del Recibo": self.dates(n),
+            "Año de Vida Póliza": self.rng.integers(1, 25, n),
+            "Estatus Recibo": self.choice(["PAGADO", "PENDIENTE", "CANCELADO"], n),
+            "Prima Pagada": self.money(n),
+            "Comisión Bruto": self.money(n, 50, 40_000),
+            "Comisión Neta": self.money(n, 40, 35_000),
+            "IVA Causado": self.money(n, 10, 6_000),
+        })
+        return {config.SHEET_NAMES["COBRANZA_VIDA"]: vida, config.SHEET_NAMES["COBRANZA_GMM"]: gmm}
+
+    def sura_cobranza(self) -> dict:
+        n = self.rows
+        return {"Cobranza": pd.DataFrame({
+            "Daños/Vida": self.choice(["Vida", "Daños"], n),
+            "Grupo": self.choice(["INDIVIDUAL", "COLECTIVO"], n),
+            "Oficina": self.choice(["CDMX", "GDL", "MTY"], n),
+            "Ramo": self.choice(["VIDA", "AUTOS", "HOGAR", "GMM"], n),
+            "Póliza": self.policies(n, 3_000_000),
+            "Contratante": self.names(n),
+            "Clave Agente": self.rng.integers(10_000, 99_999, n),
+            "Tipo de Cambio": 1.0,
+            "# Recibo": self.rng.integers(1, 12, n),
+            "Serie de Recibo": self.choice(["A", "B"], n),
+            "Prima Total": self.money(n),
+            "Prima Neta": self.money(n),
+            "% Comisión pagado": self.rng.integers(5, 30, n),
+            "Comisión de derecho": self.money(n, 0, 500),
+            "Monto Comisión Neta": self.money(n, 40, 35_000),
+            "Total Comisión pagado": self.money(n, 40, 35_000),
+            "# Liquidación": self.rng.integers(1, 9_999, n),
+            "# Comprobante": self.rng.integers(1, 99_999, n),
+            "Fecha aplicación de la póliza": self.text_dates(n),
+        })}
+
+    def aarco_cobranza(self) -> dict:
+        n = self.rows
+        return {"Hoja1": pd.DataFrame({
+            "CIA": self.choice(["AXA", "GNP", "QUALITAS"], n),
+            "NUM_POL": self.policies(n, 4_000_000),
+            "CLIENTE": self.names(n),
+            "PROSPECTADOR": self.choice(PROSPECTADORES, n),
+            "F_COBRO": self.dates(n),
+            "PRIMA_NETA_MN": self.money(n),
+            "COM_APL_MN": self.money(n, 40, 35_000),
+            "% COMISION PROSPECTADOR": self.rng.integers(5, 50, n),
+            "$ COMISION PROSPECTADOR": self.money(n, 10, 10_000),
+        })}
+
+    def metlife_cartera(self) -> dict:
+        n = self.rows
+        vida = pd.DataFrame({
+            "Poliza": self.policies(n, 1_000_000),
+            "Contratante": self.names(n),
+            "PROSPECTADOR ": self.choice(PROSPECTADORES, n),
+            "PORCENTAJE ": self.rng.integers(5, 50, n),
+        })
+        gmm = pd.DataFrame({
+            "POLIZA ": self.policies(n, 2_000_000),
+            "Poliza actual": self.policies(n, 2_000_000),
+            "Contratante": self.names(n),
+            "PROSPECTADOR ": self.choice(PROSPECTADORES, n),
+            "PORCENTAJE": self.rng.integers(5, 50, n),
+        })
+        return {config.SHEET_NAMES["CARTERA_VIDA"]: vida, config.SHEET_NAMES["CARTERA_GMM"]: gmm}
+
+    def sura_cartera(self) -> dict:
+        n = self.rows
+        return {"SURA": pd.DataFrame({
+            "PÓLIZA": self.policies(n, 3_000_000),
+            "PROSPECTADOR": self.choice(PROSPECTADORES, n),
+            # Stored as fractions in this workbook
+            "PORCENTAJE": self.rng.uniform(0.05, 0.5, n).round(2),
+        })}
+
+    def metlife_renovaciones_vida(self) -> dict:
+        n = self.rows
+        start = self.dates(n)
+        return {config.SHEET_NAMES["RENOVACIONES_VIDA"]: pd.DataFrame({
+            "POLIZA_ACTUAL": self.policies(n, 1_000_000),
+            "CONTRATANTE": self.names(n),
+            "INI_VIG": start,
+            "FIN_VIG": start + pd.DateOffset(years=1),
+            "FORMA_PAGO": self.choice(["ANUAL", "SEMESTRAL", "MENSUAL"], n),
+            "CONDUCTO_COBRO": self.choice(["CARGO AUTOMATICO", "AGENTE"], n),
+            "AGENTE": self.rng.integers(10_000, 99_999, n),
+            "PRIMA_ANUAL": self.money(n),
+            "PRIMA_MODAL": self.money(n, 100, 25_000),
+            "PAGADO_HASTA": self.dates(n),
+        })}
+
+    def metlife_renovaciones_gmm(self) -> dict:
+        n = self.rows
+        # One row per insured: policies repeat about 1.5 times
+        policies = np.sort(self.rng.choice(self.policies(max(n * 2 // 3, 1), 2_000_000), n))
+        return {config.SHEET_NAMES["RENOVACIONES_GMM"]: pd.DataFrame({
+            "NPOLIZA": policies,
+            "POLORIG": policies - 1_000_000,
+            "CONTRATANTE": self.names(n),
+            "FINIVIG": self.yyyymmdd(n),
+            "FFINVIG": self.yyyymmdd(n),
+            "PRIMA.1": self.money(n),
+            "IVA": self.money(n, 10, 6_000),
+            "NOMBREL": self.names(n),
+            "DEDUCIBLE": self.money(n, 5_000, 50_000),
+            "PAGADOHASTA": self.yyyymmdd(n),
+            "COASEGURO": self.choice([10, 20], n),
+        })}
+
+    def sura_renovaciones(self) -> dict:
+        n = self.rows
+        start = self.dates(n)
+        return {"Hoja1": pd.DataFrame({
+            "POLIZA": self.policies(n, 3_000_000),
+            "NOMBRE": self.names(n),
+            "INICIO VIGENCIA": start,
+            "FIN VIGENCIA": start + pd.DateOffset(years=1),
+            "RAMO": self.choice(["VIDA", "AUTOS", "HOGAR", "GMM"], n),
+            "PRIMA": self.money(n),
+            "PERIODICIDAD_PAGO": self.choice(["ANUAL", "MENSUAL"], n),
+            "PROSPECTADOR": self.choice(PROSPECTADORES, n),
+        })}
+
+    def aarco_renovaciones(self) -> dict:
+        n = self.rows
+        start = self.dates(n)
+        return {"Hoja1": pd.DataFrame({
+            "PROMOTORIA": "AARCO",
+            "AGENTE": self.rng.integers(10_000, 99_999, n),
+            "ASEGURADORA": self.choice(["AXA", "GNP"], n),
+            "POLIZA": self.policies(n, 4_000_000),
+            "RAMO": self.choice(["AUTOS", "GMM", "VIDA"], n),
+            "PRODUCTO": self.choice(["FLEX", "PLUS", "BASICO"], n),
+            "CONTRATANTE": self.names(n),
+            "ASEGURADO": self.names(n),
+            "INICIO VIGENCIA": start,
+            "FIN VIGENCIA": start + pd.DateOffset(years=1),
+            "FRECUENCIA PAGO": self.choice(["ANUAL", "MENSUAL"], n),
+            "CONDUCTO COBRO": self.choice(["CARGO AUTOMATICO", "AGENTE"], n),
+            "PRIMA NETA ANUAL": self.money(n),
+            "PRIMA TOTAL ANUAL": self.money(n),
+            "PROSPECTADOR": self.choice(PROSPECTADORES, n),
+            "ESTATUS": self.choice(["VIGENTE", "PENDIENTE"], n),
+        })}
+
+    def clientes(self) -> dict:
+        n = len(self.clients)
+        phones = (5_500_000_000 + self.rng.integers(0, 99_999_999, n)).astype(float).astype(object)
+        phones[self.rng.random(n) < 0.1] = None
+        return {"Hoja1": pd.DataFrame({
+            "Clientes": self.clients,
+            "Mail": [f"cliente{i}@ejemplo.com" for i in range(n)],
+            "Telefono": phones,
+        })}
+
+    def users(self) -> dict:
+        return {"Hoja1": pd.DataFrame({"Usuario": ["admin", "agente"], "Password": ["admin", 1234]})}
+
+
+def workbooks(gen: Generator) -> dict:
+    """
+    {configured path: builder} for every workbook the backend reads.
+    """
+    return {
+        config.METLIFE_PATHS["COBRANZA"]: gen.metlife_cobranza,
+        config.SURA_PATHS["COBRANZA"]: gen.sura_cobranza,
+        config.AARCO_PATHS["COBRANZA"]: gen.aarco_cobranza,
+        config.METLIFE_PATHS["CARTERA"]: gen.metlife_cartera,
+        config.SURA_PATHS["CARTERA"]: gen.sura_cartera,
+        config.METLIFE_PATHS["RENOVACIONES_VIDA"]: gen.metlife_renovaciones_vida,
+        config.METLIFE_PATHS["RENOVACIONES_GMM"]: gen.metlife_renovaciones_gmm,
+        config.SURA_PATHS["RENOVACIONES"]: gen.sura_renovaciones,
+        config.AARCO_PATHS["RENOVACIONES"]: gen.aarco_renovaciones,
+        config.CLIENT_EMAILS_PATH: gen.clientes,
+        config.USERS_DB: gen.users,
+    }
+
+
+def generate(out_dir, rows: int = 10_000, seed: int = 0, force: bool = False) -> Path:
+    """
+    Write every workbook under out_dir, in the folder layout config expects
+    below BASE_DIR. A manifest records rows and seed, so an existing data
+    set of the same size is reused unless `force` is set.
+    """
+    out_dir = Path(out_dir)
+    manifest = out_dir / MANIFEST
+    wanted = {"rows": rows, "seed": seed}
+    if not force and manifest.exists() and json.loads(manifest.read_text()) == wanted:
+        print(f"Reusing synthetic data in {out_dir} ({rows} rows)")
+        return out_dir
+
+    gen = Generator(rows, seed)
+    for path, build in workbooks(gen).items():
+        target = out_dir / Path(path).relative_to(config.BASE_DIR)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        sheets = build()
+        with pd.ExcelWriter(target) as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        size = target.stat().st_size / 1e6
+        print(f"  {target.relative_to(out_dir)}: {size:.1f} MB in {time.perf_counter() - start:.1f}s")
+    manifest.write_text(json.dumps(wanted))
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", help="Directory to use as TAIICO_DATA_DIR")
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows per workbook (1k to 1M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the data set exists")
+    args = parser.parse_args()
+    if not 1 <= args.rows <= 1_048_575:
+        parser.error("--rows must be between 1 and 1,048,575 (the Excel row limit)")
+    generate(args.out_dir, args.rows, args.seed, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,11 @@ from pathlib import Path
 BACKEND_DIR = Path(__file__).resolve().parent
 # Resolve the project root (taiico-crm)
 PROJECT_ROOT = BACKEND_DIR.parent
-# Resolve the shared drive root (2025 - Antigravity CRM)
-BASE_DIR = PROJECT_ROOT.parent
+# Resolve the shared drive root (2025 - Antigravity CRM).
+# TAIICO_DATA_DIR points it elsewhere, e.g. at the synthetic workbooks
+# written by benchmarks/generate_data.py.
+_data_dir = os.environ.get("TAIICO_DATA_DIR")
+BASE_DIR = Path(_data_dir).resolve() if _data_dir else PROJECT_ROOT.parent
 
 METLIFE_PATHS = {
     "COBRANZA": BASE_DIR / "Bases de cobranza y comisiones" / "Metlife base cobranza.xlsx",
@@ -42,3 +45,57 @@ SHEET_NAMES = {
     "RENOVACIONES_VIDA": "Vida",
     "RENOVACIONES_GMM": "GMM",
 }
+
+# In-process cache of cleaned DataFrames (see services/cache.py).
+# Budget is in megabytes; least recently used sheets are evicted first.
+CACHE_MAX_BYTES = int(os.environ.get("TAIICO_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Columnar copies of the cleaned sheets (see services/sidecar.py).
+# Set TAIICO_SIDECAR_DIR to an empty string to disable them.
+_sidecar_dir = os.environ.get("TAIICO_SIDECAR_DIR", str(BACKEND_DIR / ".sidecar"))
+SIDECAR_DIR = Path(_sidecar_dir) if _sidecar_dir else None
+
+# Write-ahead journal for renewal edits (see services/journal.py). Pending
+# edits are flushed to the workbooks every JOURNAL_FLUSH_SECONDS or once
+# JOURNAL_FLUSH_EDITS are queued for a workbook.
+# Set TAIICO_JOURNAL_PATH to an empty string to write straight through.
+_journal_path = os.environ.get("TAIICO_JOURNAL_PATH", str(BACKEND_DIR / ".journal" / "renovaciones.sqlite3"))
+JOURNAL_PATH = Path(_journal_path) if _journal_path else None
+JOURNAL_FLUSH_SECONDS = float(os.environ.get("TAIICO_JOURNAL_FLUSH_SECONDS", "5"))
+JOURNAL_FLUSH_EDITS = int(os.environ.get("TAIICO_JOURNAL_FLUSH_EDITS", "50"))
+
+# Client list database (see services/clientes_store.py), imported from
+# CLIENT_EMAILS_PATH and again whenever that workbook is edited outside the
+# app. Changes are exported back to it every CLIENTS_EXPORT_SECONDS; 0
+# disables the export.
+CLIENTS_DB_PATH = Path(os.environ.get("TAIICO_CLIENTS_DB_PATH", str(BACKEND_DIR / ".clientes" / "clientes.sqlite3")))
+CLIENTS_EXPORT_SECONDS = float(os.environ.get("TAIICO_CLIENTS_EXPORT_SECONDS", "60"))
+
+# Incremental ingest of the append-only cobranza sheets (see
+# services/ingest.py): when only rows were added at the bottom, only those
+# are parsed and cleaned. Set TAIICO_INCREMENTAL_INGEST=0 to always read
+# the whole sheet.
+INCREMENTAL_INGEST = os.environ.get("TAIICO_INCREMENTAL_INGEST", "1").lower() in {"1", "true", "yes"}
+
+# Worker pools (see services/executor.py). CPU workers are processes that
+# parse and clean workbooks; set TAIICO_CPU_WORKERS=0 to clean in-process.
+IO_WORKERS = int(os.environ.get("TAIICO_IO_WORKERS", "8"))
+CPU_WORKERS = int(os.environ.get("TAIICO_CPU_WORKERS", "2"))
+SMTP_WORKERS = int(os.environ.get("TAIICO_SMTP_WORKERS", "2"))
+
+# Load every workbook in the background at startup (see services/warmup.py)
+WARMUP = os.environ.get("TAIICO_WARMUP", "1").lower() in {"1", "true", "yes"}
+
+# Response compression (see main.py): bodies of at least COMPRESS_MIN_BYTES
+# are sent brotli-compressed when brotli-asgi is installed and the client
+# accepts it, gzip otherwise. Set TAIICO_COMPRESS_MIN_BYTES=0 to disable.
+COMPRESS_MIN_BYTES = int(os.environ.get("TAIICO_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("TAIICO_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("TAIICO_BROTLI_QUALITY", "4"))
+
+# On-demand request profiling (see services/profiling.py). Requests sent
+# with `X-Profile: <token>` are profiled; the last PROFILE_KEEP profiles
+# are kept in PROFILE_DIR. Unset TAIICO_PROFILE_TOKEN disables it.
+PROFILE_TOKEN = os.environ.get("TAIICO_PROFILE_TOKEN") or None
+PROFILE_DIR = Path(os.environ.get("TAIICO_PROFILE_DIR", str(BACKEND_DIR / ".profiles")))
+PROFILE_KEEP = int(os.environ.get("TAIICO_PROFILE_KEEP", "50"))
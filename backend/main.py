@@ -1,9 +1,31 @@
-from fastapi import FastAPI, HTTPException, Body
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Body, Response
 from fastapi.middleware.cors import CORSMiddleware
-from services import cobranza, renovaciones, cartera, auth, clientes
+from fastapi.middleware.gzip import GZipMiddleware
+from config import COMPRESS_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY
+from services import cobranza, renovaciones, cartera, auth, clientes, dashboards, journal, clientes_store, executor, metrics, profiling, warmup
+from services.executor import blocking
+from services.listing import TOTAL_COUNT_HEADER
 from pydantic import BaseModel
 
-app = FastAPI(title="TAIICO CRM API")
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    # Without brotli-asgi responses are gzip-compressed only
+    BrotliMiddleware = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Apply renewal edits left in the journal by a previous run
+    journal.resume()
+    # Parse all workbooks in the background; requests are served meanwhile
+    warmup.start()
+    yield
+    journal.flush_all()
+    clientes_store.flush()
+    executor.shutdown()
+
+app = FastAPI(title="TAIICO CRM API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -12,14 +34,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[TOTAL_COUNT_HEADER, "ETag"],
 )
 
+# Compress large responses (list payloads repeat long Spanish column names)
+if COMPRESS_MIN_BYTES > 0:
+    if BrotliMiddleware is not None:
+        app.add_middleware(BrotliMiddleware, quality=BROTLI_QUALITY, minimum_size=COMPRESS_MIN_BYTES, gzip_fallback=True)
+    else:
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES, compresslevel=GZIP_LEVEL)
+
+# Profiles requests that carry the profile token (see services/profiling.py)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Latency per endpoint, compression included (added last: outermost);
+# spans inside the services add per-stage timings
+app.add_middleware(metrics.MetricsMiddleware)
+
 class LoginRequest(BaseModel):
     username: str
     password: str
 
 @app.post("/login")
-async def login(request: LoginRequest):
+@blocking
+def login(request: LoginRequest):
     if auth.verify_credentials(request.username, request.password):
         return {"success": True, "message": "Login successful"}
     else:
@@ -27,12 +65,18 @@ async def login(request: LoginRequest):
 
 @app.get("/")
 def read_root():
-    return {"status": "ok", "message": "TAIICO CRM Backend is running"}
+    return {"status": "ok", "message": "TAIICO CRM Backend is running", "warmup": warmup.status(), "pools": executor.stats()}
+
+@app.get("/metrics")
+def read_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 app.include_router(cobranza.router)
 app.include_router(renovaciones.router)
 app.include_router(cartera.router)
 app.include_router(clientes.router)
+app.include_router(dashboards.router)
+app.include_router(profiling.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,7 +1,10 @@
 import pandas as pd
 from config import USERS_DB
 import os
+from services import metrics
+from services.cache import load_frame
 
+@metrics.span("auth")
 def verify_credentials(username, password):
     """
     Verify username and password against the Excel file.
@@ -11,7 +14,7 @@ def verify_credentials(username, password):
         return False
 
     try:
-        df = pd.read_excel(USERS_DB)
+        df = load_frame(USERS_DB)
         
         # Ensure columns exist (case insensitive search if needed, but assuming exact match based on request)
         # Request said 'Usuario' and 'Password' columns
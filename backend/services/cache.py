@@ -0,0 +1,277 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict, deque
+from contextlib import ExitStack
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from config import CACHE_MAX_BYTES
+from services import executor, ingest, metrics, sidecar
+from services.ingest import IngestState
+
+
+def file_version(path) -> Optional[tuple]:
+    """
+    Return (mtime_ns, size) for a file, or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def cleaner_name(clean: Optional[Callable]) -> str:
+    if clean is None:
+        return "raw"
+    return f"{clean.__module__}.{clean.__qualname__}"
+
+
+class CacheEntry:
+    def __init__(self, version: tuple, frame: pd.DataFrame, state: Optional[IngestState] = None):
+        self.version = version
+        self.frame = frame
+        # For append-only sheets: the raw rows this frame was cleaned from
+        self.state = state
+        self.nbytes = int(frame.memory_usage(deep=True).sum())
+
+
+class WorkbookCache:
+    """
+    LRU cache of parsed (and optionally cleaned) Excel sheets.
+
+    Entries are keyed by (path, sheet, cleaner) and tagged with the file
+    version (mtime + size) they were read from. A lookup that finds a
+    different version on disk re-reads the sheet; for append-only sheets
+    only the new rows are cleaned (see ingest.py). Returned frames are
+    shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _lookup(self, key, version) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.frame
+
+    def _previous(self, key) -> Optional[Tuple[pd.DataFrame, IngestState]]:
+        # The cleaned frame of an older version, to append new rows to
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.state is None:
+                return None
+            return entry.frame, entry.state
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _store(self, key, entry: CacheEntry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            if entry.nbytes > self.max_bytes:
+                # Larger than the whole budget: serve it but don't keep it
+                return
+            self._entries[key] = entry
+            self.nbytes += entry.nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def _read(self, path: str, sheets: Dict[object, Optional[Callable]], version: tuple):
+        frames, states = {}, {}
+        for sheet_name, clean in sheets.items():
+            # Raw sheets feed the write paths, so they always come from the xlsx
+            if clean is not None:
+                with metrics.span("sidecar_read", source=os.path.basename(path)):
+                    frame = sidecar.read(path, sheet_name, cleaner_name(clean), version)
+                if frame is not None:
+                    frames[sheet_name] = frame
+                    metrics.count("taiico_source_rows_read_total", len(frame),
+                                  source=os.path.basename(path), sheet=sheet_name, origin="sidecar")
+
+        todo = {sheet_name: clean for sheet_name, clean in sheets.items() if sheet_name not in frames}
+        if todo:
+            heads, previous = {}, {}
+            for sheet_name, clean in todo.items():
+                if not ingest.applies(clean):
+                    continue
+                prior = self._previous((path, sheet_name, cleaner_name(clean)))
+                if prior is None:
+                    with metrics.span("sidecar_read", source=os.path.basename(path)):
+                        prior = sidecar.read_previous(path, sheet_name, cleaner_name(clean))
+                if prior is not None:
+                    heads[sheet_name], previous[sheet_name] = prior
+
+            parsed, split = executor.read_sheets(path, todo, previous)
+            for sheet_name, (appended, state) in split.items():
+                if appended:
+                    parsed[sheet_name] = ingest.combine(heads[sheet_name], parsed[sheet_name])
+                states[sheet_name] = state
+                metrics.count("taiico_ingest_total", source=os.path.basename(path), sheet=sheet_name,
+                              mode="append" if appended else "full")
+            for sheet_name, clean in todo.items():
+                if clean is not None:
+                    with metrics.span("sidecar_write", source=os.path.basename(path)):
+                        sidecar.write(path, sheet_name, cleaner_name(clean), version, parsed[sheet_name],
+                                      states.get(sheet_name))
+            frames.update(parsed)
+        return frames, states
+
+    def load(self, path, sheet_name=0, clean: Optional[Callable] = None) -> pd.DataFrame:
+        """
+        Return the sheet as a DataFrame, passed through `clean` if given.
+        Raises FileNotFoundError if the workbook does not exist.
+        """
+        return self.load_many(path, {sheet_name: clean})[sheet_name]
+
+    def load_many(self, path, sheets: Dict[object, Optional[Callable]]) -> Dict[object, pd.DataFrame]:
+        """
+        Return {sheet: frame} for several sheets of one workbook, given as
+        {sheet: clean}. Sheets that aren't cached are parsed together in one
+        read_excel call, so the workbook is opened and decompressed once.
+        Raises FileNotFoundError if the workbook does not exist.
+        """
+        with metrics.span("load", source=os.path.basename(path)):
+            return self._load_many(path, sheets)
+
+    def _load_many(self, path, sheets: Dict[object, Optional[Callable]]) -> Dict[object, pd.DataFrame]:
+        path = str(path)
+        keys = {sheet_name: (path, sheet_name, cleaner_name(clean)) for sheet_name, clean in sheets.items()}
+        version = file_version(path)
+        if version is None:
+            raise FileNotFoundError(path)
+
+        frames = {sheet_name: self._lookup(key, version) for sheet_name, key in keys.items()}
+        if all(frame is not None for frame in frames.values()):
+            return frames
+
+        # Only one thread parses a given sheet; the others wait and reuse it.
+        # Locks are taken in a fixed order so overlapping requests can't deadlock.
+        missing = sorted((key for sheet_name, key in keys.items() if frames[sheet_name] is None), key=repr)
+        with ExitStack() as stack:
+            for key in missing:
+                stack.enter_context(self._key_lock(key))
+
+            todo = {}
+            for sheet_name, key in keys.items():
+                if frames[sheet_name] is None:
+                    frames[sheet_name] = self._lookup(key, version)
+                    if frames[sheet_name] is None:
+                        todo[sheet_name] = sheets[sheet_name]
+            if not todo:
+                return frames
+
+            with self._lock:
+                self.misses += len(todo)
+            read, states = self._read(path, todo, version)
+            for sheet_name, frame in read.items():
+                # Tag with the version seen before reading, so a write that
+                # lands mid-read is picked up on the next lookup
+                self._store(keys[sheet_name], CacheEntry(version, frame, states.get(sheet_name)))
+                frames[sheet_name] = frame
+            return frames
+
+    def invalidate(self, path):
+        """
+        Drop every cached sheet of a workbook. Called after we write to it,
+        since some shared drives only keep mtimes to the second.
+        """
+        path = str(path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self.nbytes -= self._entries.pop(key).nbytes
+
+    def replace(self, path, sheet_name, frame: pd.DataFrame):
+        """
+        Drop every cached sheet of a workbook whose cells we just patched,
+        but keep `frame`, the raw sheet as written, for the new version, so
+        the next edit doesn't parse the sheet again.
+        """
+        path = str(path)
+        self.invalidate(path)
+        version = file_version(path)
+        if version is not None:
+            self._store((path, sheet_name, cleaner_name(None)), CacheEntry(version, frame))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+workbook_cache = WorkbookCache(CACHE_MAX_BYTES)
+
+# Structures derived from a cached frame (indexes, rollups, ...), keyed by
+# the frame's identity so they are dropped together with the frame
+_derived = {}
+_derived_lock = threading.Lock()
+# Slots whose frame was collected. The weakref callback only queues them:
+# it can run from a GC pass on a thread that already holds _derived_lock
+# (memo allocates under it), so taking the lock there would deadlock.
+_forgotten = deque()
+
+
+def _purge():
+    # Called with _derived_lock held
+    while _forgotten:
+        key, ref = _forgotten.popleft()
+        slot = _derived.get(key)
+        if slot is not None and slot[0] is ref:
+            del _derived[key]
+
+
+def memo(frame: pd.DataFrame, name, build: Callable):
+    """
+    Return build() memoized for this frame object under `name`. Since the
+    cache hands out a new frame whenever the workbook changes, derived data
+    is rebuilt exactly once per file version.
+    """
+    key = id(frame)
+    with _derived_lock:
+        _purge()
+        slot = _derived.get(key)
+        if slot is None or slot[0]() is not frame:
+            ref = weakref.ref(frame, lambda ref, key=key: _forgotten.append((key, ref)))
+            slot = (ref, {}, threading.Lock())
+            _derived[key] = slot
+    _, values, lock = slot
+    with lock:
+        if name not in values:
+            values[name] = build()
+        return values[name]
+
+
+def load_frame(path, sheet_name=0, clean: Optional[Callable] = None) -> pd.DataFrame:
+    return workbook_cache.load(path, sheet_name, clean)
+
+
+def load_frames(path, sheets: Dict[object, Optional[Callable]]) -> Dict[object, pd.DataFrame]:
+    return workbook_cache.load_many(path, sheets)
+
+
+def invalidate(path):
+    workbook_cache.invalidate(path)
+
+
+def replace(path, sheet_name, frame: pd.DataFrame):
+    workbook_cache.replace(path, sheet_name, frame)
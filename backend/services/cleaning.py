@@ -0,0 +1,95 @@
+"""
+Column-at-a-time cleaning kernels shared by the services.
+
+They replace the old per-cell helpers (clean_money, process_percentage, ...)
+that were applied with Series.apply, and return float64 columns with NaN
+where the old helpers returned None.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _to_float(values: np.ndarray) -> np.ndarray:
+    """
+    Convert an object array to float64. NumPy's cast calls float() per item
+    in C and is much faster than pd.to_numeric, but it raises on the first
+    bad value; only then do we pay for the coercing path. The result is
+    always a writable copy (pandas 3 hands out read-only views).
+    """
+    try:
+        return values.astype("float64")
+    except (TypeError, ValueError):
+        coerced = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+        return np.array(coerced, dtype="float64", copy=True)
+
+
+def money(series: pd.Series) -> pd.Series:
+    """
+    Convert a column of currency strings or numbers to float.
+    Strips '$' and ',' from text values; anything unparseable becomes NaN.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+
+    raw = series.to_numpy(dtype=object)
+    try:
+        # Numbers and blanks only (the usual case for an object column)
+        return pd.Series(raw.astype("float64"), index=series.index, name=series.name)
+    except (TypeError, ValueError):
+        pass
+
+    # openpyxl hands back Python floats for numeric cells and str for text
+    # cells, so split the column once and convert each part in bulk
+    is_text = np.fromiter((type(v) is str for v in raw), dtype=bool, count=len(raw))
+    values = _to_float(np.where(is_text, None, raw))
+    text = pd.Series(raw[is_text], dtype=object)
+    text = text.str.replace("$", "", regex=False).str.replace(",", "", regex=False)
+    values[is_text] = _to_float(text.to_numpy(dtype=object))
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def percentage(series: pd.Series, scale: float = 100.0) -> pd.Series:
+    """
+    Convert a column of percentages to float, dividing by `scale`
+    (Metlife stores 15 for 15%). Use scale=1 for sources already in decimals.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.astype("float64")
+    else:
+        values = pd.Series(_to_float(series.to_numpy(dtype=object)), index=series.index, name=series.name)
+    if scale != 1:
+        values = values / scale
+    return values
+
+
+def _yyyymmdd_text(values) -> pd.Series:
+    # Metlife GMM stores dates as integers (20240115), often read as floats
+    numbers = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    return np.trunc(numbers).astype("Int64").astype(str).str.zfill(8)
+
+
+def dates(series: pd.Series, format: str = None) -> pd.Series:
+    """
+    Parse a date column to datetime64 at midnight (NaT for blanks/garbage).
+
+    Date columns hold a few hundred distinct values over thousands of rows,
+    so each distinct value is parsed once and the result mapped back.
+    Pass `format` when the layout is known, e.g. "%Y%m%d" for Metlife GMM.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.normalize()
+
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=series.index, name=series.name, dtype="datetime64[ns]")
+
+    if format == "%Y%m%d":
+        uniques = _yyyymmdd_text(uniques)
+    else:
+        uniques = pd.Series(uniques, dtype=object)
+    parsed = pd.to_datetime(uniques, format=format or "mixed", errors="coerce").dt.normalize()
+
+    values = parsed.to_numpy().take(codes)
+    values[codes < 0] = np.datetime64("NaT")
+    return pd.Series(values, index=series.index, name=series.name)
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Depends
 from typing import List, Optional
-import pandas as pd
-import os
 from pydantic import BaseModel
-from config import CLIENT_EMAILS_PATH
+from services import clientes_store, search
+from services.conditional import conditional
+from services.executor import blocking
+from services.listing import ListParams, page_records
 
 router = APIRouter(prefix="/clientes", tags=["clientes"])
 
@@ -12,77 +13,23 @@ class Client(BaseModel):
     correo: Optional[str] = None
     telefono: Optional[str] = None
 
-@router.get("/", response_model=List[Client])
-async def get_clients():
+@router.get("/")
+@conditional(clientes_store.version)
+@blocking
+def get_clients(params: ListParams = Depends()):
     try:
-        if not os.path.exists(CLIENT_EMAILS_PATH):
-            return []
-        
-        df = pd.read_excel(CLIENT_EMAILS_PATH)
-        
-        # Normalize columns
-        # Expected: ['Clientes', 'Mail', 'Telefono']
-        # Map to: nombre, correo, telefono
-        
-        clients = []
-        for _, row in df.iterrows():
-            cliente = row.get('Clientes')
-            
-            # Skip empty rows
-            if pd.isna(cliente):
-                continue
-                
-            mail = row.get('Mail')
-            tel = row.get('Telefono')
-            
-            # Handle Phone Number Formatting
-            if pd.notna(tel):
-                try:
-                    # Convert to float first to handle strings "123.0", then to int
-                    tel_clean = int(float(tel))
-                    tel_str = str(tel_clean)
-                except ValueError:
-                    tel_str = str(tel).strip()
-            else:
-                tel_str = None
-
-            clients.append(Client(
-                nombre=str(cliente).strip(),
-                correo=str(mail).strip() if pd.notna(mail) else None,
-                telefono=tel_str
-            ))
-            
-        return clients
+        df = clientes_store.list_clients()
+        return page_records([df], params)
         
     except Exception as e:
         print(f"Error reading clients: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/", response_model=Client)
-async def add_client(client: Client):
+@blocking
+def add_client(client: Client):
     try:
-        if not os.path.exists(CLIENT_EMAILS_PATH):
-            # Create new file if doesn't exist? Or error?
-            # Assuming file structure usually exists, but we can create empty df
-             df = pd.DataFrame(columns=['Clientes', 'Mail', 'Telefono'])
-        else:
-             df = pd.read_excel(CLIENT_EMAILS_PATH)
-        
-        # Check if client already exists? (Optional, but good practice)
-        # For now, just append as requested.
-        
-        new_row = {
-            'Clientes': client.nombre,
-            'Mail': client.correo,
-            'Telefono': client.telefono
-        }
-        
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        
-        # Save
-        with pd.ExcelWriter(CLIENT_EMAILS_PATH, engine='openpyxl', mode='w') as writer:
-             df.to_excel(writer, index=False)
-             
+        clientes_store.add(client.nombre, client.correo, client.telefono)
         return client
         
     except Exception as e:
@@ -94,29 +41,12 @@ class UpdateClientRequest(BaseModel):
     client: Client
 
 @router.post("/update")
-async def update_client(req: UpdateClientRequest):
+@blocking
+def update_client(req: UpdateClientRequest):
     try:
-        if not os.path.exists(CLIENT_EMAILS_PATH):
-            raise HTTPException(status_code=404, detail="Database file not found")
-            
-        df = pd.read_excel(CLIENT_EMAILS_PATH)
-        
-        # Find the index of the client to update
-        # We assume 'Clientes' column is the identifier and is unique enough for now
-        mask = df['Clientes'].astype(str).str.strip() == req.original_nombre
-        
-        if not mask.any():
+        # 'Clientes' is the identifier and is assumed unique enough for now
+        if not clientes_store.update(req.original_nombre, req.client.nombre, req.client.correo, req.client.telefono):
             raise HTTPException(status_code=404, detail="Client not found")
-            
-        # Update values
-        idx = df[mask].index[0]
-        df.at[idx, 'Clientes'] = req.client.nombre
-        df.at[idx, 'Mail'] = req.client.correo
-        df.at[idx, 'Telefono'] = req.client.telefono
-        
-        # Save
-        with pd.ExcelWriter(CLIENT_EMAILS_PATH, engine='openpyxl', mode='w') as writer:
-             df.to_excel(writer, index=False)
              
         return {"success": True, "client": req.client}
         
@@ -130,23 +60,11 @@ class DeleteClientRequest(BaseModel):
     nombre: str
 
 @router.post("/delete")
-async def delete_client(req: DeleteClientRequest):
+@blocking
+def delete_client(req: DeleteClientRequest):
     try:
-        if not os.path.exists(CLIENT_EMAILS_PATH):
-             raise HTTPException(status_code=404, detail="Database file not found")
-            
-        df = pd.read_excel(CLIENT_EMAILS_PATH)
-        
-        initial_len = len(df)
-        # Filter out the client
-        df = df[df['Clientes'].astype(str).str.strip() != req.nombre]
-        
-        if len(df) == initial_len:
+        if not clientes_store.delete(req.nombre):
              raise HTTPException(status_code=404, detail="Client not found")
-
-        # Save
-        with pd.ExcelWriter(CLIENT_EMAILS_PATH, engine='openpyxl', mode='w') as writer:
-             df.to_excel(writer, index=False)
              
         return {"success": True}
         
@@ -157,71 +75,53 @@ async def delete_client(req: DeleteClientRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/search")
-async def search_client(name: str):
+@blocking
+def search_client(name: Optional[str] = None, email: Optional[str] = None, fuzzy: bool = False):
+    """
+    Look up a client's email by name (normalized: case and extra spaces are
+    ignored), or the client(s) registered under an email.
+    With fuzzy=true, near matches ("JUAN PEREZ" for "JUAN PÉREZ LOPEZ") are
+    returned too, best first, and the email is that of the best match.
+    """
     try:
-        if not os.path.exists(CLIENT_EMAILS_PATH):
-            return {"email": None}
-            
-        df = pd.read_excel(CLIENT_EMAILS_PATH)
-        
-        # Normalize logic: similar to Renovaciones
-        def normalize_name(val):
-            if not val: return ""
-            return " ".join(str(val).strip().upper().split())
-            
-        target_norm = normalize_name(name)
-        df['__norm'] = df['Clientes'].apply(normalize_name)
-        
-        match = df[df['__norm'] == target_norm]
-        
-        if not match.empty and 'Mail' in match.columns:
-            val = match.iloc[0]['Mail']
-            if pd.notna(val) and str(val).strip():
-                return {"email": str(val).strip()}
-                
-        return {"email": None}
+        if fuzzy and name:
+            exact = clientes_store.find_email(name)
+            matches = search.search(name, kinds=["cliente"], limit=10)
+            if exact is None and matches:
+                exact = matches[0]["email"]
+            return {"email": exact, "matches": matches}
+        if email:
+            clients = clientes_store.find_by_email(email)
+            return {"email": clients[0]["correo"] if clients else None, "clients": clients}
+        return {"email": clientes_store.find_email(name)}
         
     except Exception as e:
         print(f"Error searching client: {e}")
         return {"email": None}
 
+class ResolveRequest(BaseModel):
+    names: List[str]
+
+@router.post("/resolve")
+@blocking
+def resolve_client_emails(req: ResolveRequest):
+    """
+    Resolve a batch of client names (e.g. contratantes) to emails in one call.
+    Names without a known email map to null.
+    """
+    try:
+        return {"emails": clientes_store.resolve_emails(req.names)}
+    except Exception as e:
+        print(f"Error resolving client emails: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 def upsert_client_internal(nombre: str, correo: str):
-# ... existing code ...
     """
     Helper function to add or update a client's email internally.
     Called by Renovaciones module when sending an email with a manual override.
     """
     try:
-        if not os.path.exists(CLIENT_EMAILS_PATH):
-             # Create new
-             df = pd.DataFrame(columns=['Clientes', 'Mail', 'Telefono'])
-        else:
-             df = pd.read_excel(CLIENT_EMAILS_PATH)
-        
-        # Check if client exists
-        # Name matching logic: strip and exact match?
-        mask = df['Clientes'].astype(str).str.strip().str.lower() == nombre.strip().lower()
-        
-        if mask.any():
-            # Update existing
-            idx = df[mask].index[0]
-            print(f"Updating existing client {nombre} with new email {correo}")
-            df.at[idx, 'Mail'] = correo
-            # Retain phone? Yes, we just update mail.
-        else:
-            # Add new
-            print(f"Auto-adding new client {nombre} with email {correo}")
-            new_row = {
-                'Clientes': nombre.strip(),
-                'Mail': correo.strip(),
-                'Telefono': None
-            }
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            
-        # Save
-        with pd.ExcelWriter(CLIENT_EMAILS_PATH, engine='openpyxl', mode='w') as writer:
-             df.to_excel(writer, index=False)
-             
+        clientes_store.upsert_email(nombre, correo)
     except Exception as e:
         print(f"Error in upsert_client_internal: {e}")
         # Build resiliently: don't crash the email sending if this fails, just log it.
@@ -0,0 +1,422 @@
+"""
+SQLite-backed store for the client list.
+
+The clientes endpoints used to read 'Clientes Correos Taiico.xlsx' for every
+request and rewrite the whole workbook on every change. Clients now live in
+an embedded SQLite database with indexes on the normalized name and on the
+email. The database is filled from the workbook the first time it is
+opened, and the workbook is rewritten every CLIENTS_EXPORT_SECONDS (if
+anything changed) so the office can keep opening it in Excel.
+
+The office also edits the workbook directly. Changes made here are logged
+until they are exported, and whenever the workbook was saved by someone else
+since the last import or export, it is imported again and the logged
+changes are replayed on top, before anything is read or exported.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import CLIENT_EMAILS_PATH, CLIENTS_DB_PATH, CLIENTS_EXPORT_SECONDS
+from services import metrics
+from services.cache import file_version, invalidate, memo
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    nombre_norm TEXT NOT NULL,
+    correo TEXT,
+    telefono TEXT
+);
+CREATE INDEX IF NOT EXISTS clients_nombre_norm ON clients (nombre_norm);
+CREATE INDEX IF NOT EXISTS clients_correo ON clients (correo COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS changes (id INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, args TEXT NOT NULL);
+"""
+
+_conn = None
+_lock = threading.RLock()
+# Bumped on every write; list_clients() and the export key off it
+_version = 0
+_exported_version = 0
+# Part of the version token, since _version restarts at 0 with the process
+_started = time.time()
+_changed_at = _started
+_frame = (None, None)
+_exporter = None
+# Workbook (mtime_ns, size) as of the last import or export
+_workbook_seen = None
+
+
+def normalize_name(value) -> str:
+    if not value:
+        return ""
+    return " ".join(str(value).strip().upper().split())
+
+
+def format_phone(series: pd.Series) -> pd.Series:
+    """
+    Render phone numbers read as floats (5512345678.0) as plain digits,
+    leaving text such as '55-1234-5678' as is.
+    """
+    numbers = pd.to_numeric(series, errors="coerce")
+    is_number = np.isfinite(numbers)
+    text = series.astype(str).str.strip().astype(object)
+    text[is_number] = np.trunc(numbers[is_number]).astype("int64").astype(str)
+    return text.where(series.notna(), None)
+
+
+def clean_clients(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Map the workbook columns ['Clientes', 'Mail', 'Telefono'] to
+    nombre, correo, telefono, skipping rows without a name.
+    """
+    for col in ['Clientes', 'Mail', 'Telefono']:
+        if col not in df.columns:
+            df[col] = None
+    df = df[df['Clientes'].notna()]
+
+    mail = df['Mail']
+    return pd.DataFrame({
+        'nombre': df['Clientes'].astype(str).str.strip(),
+        'correo': mail.astype(str).str.strip().where(mail.notna(), None),
+        'telefono': format_phone(df['Telefono']),
+    })
+
+
+def _db() -> sqlite3.Connection:
+    # One shared connection; every use goes through _lock
+    global _conn
+    if _conn is None:
+        Path(CLIENTS_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(CLIENTS_DB_PATH), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _import_workbook(conn)
+        _conn = conn
+    _sync(_conn)
+    return _conn
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: str):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _workbook_rows() -> list:
+    df = clean_clients(pd.read_excel(CLIENT_EMAILS_PATH))
+    return [
+        (nombre, normalize_name(nombre), correo, telefono)
+        for nombre, correo, telefono in df.itertuples(index=False)
+    ]
+
+
+def _import_workbook(conn: sqlite3.Connection):
+    """
+    Copy the client workbook into an empty database, once.
+    """
+    global _workbook_seen
+    if _get_meta(conn, "imported_from") is not None:
+        # Databases from before the workbook version was recorded take the
+        # workbook as it is now as their last export
+        stored = _get_meta(conn, "workbook_version")
+        _workbook_seen = tuple(json.loads(stored)) if stored else file_version(CLIENT_EMAILS_PATH)
+        return
+    seen = file_version(CLIENT_EMAILS_PATH)
+    rows = _workbook_rows() if seen is not None else []
+    with conn:
+        conn.executemany(
+            "INSERT INTO clients (nombre, nombre_norm, correo, telefono) VALUES (?, ?, ?, ?)", rows
+        )
+        _set_meta(conn, "imported_from", str(CLIENT_EMAILS_PATH))
+        _set_meta(conn, "workbook_version", json.dumps(seen))
+    _workbook_seen = seen
+    print(f"Imported {len(rows)} clients from {CLIENT_EMAILS_PATH}")
+
+
+def _sync(conn: sqlite3.Connection):
+    """
+    Re-import the workbook if someone else saved it since the last import
+    or export, then replay the changes made here that it doesn't have yet.
+    """
+    global _workbook_seen, _exported_version
+    current = file_version(CLIENT_EMAILS_PATH)
+    if current is None or current == _workbook_seen:
+        return
+    try:
+        rows = _workbook_rows()
+    except Exception as e:
+        # Typically Excel is still saving it; try again on the next call
+        print(f"Error re-importing clients from {CLIENT_EMAILS_PATH}: {e}")
+        return
+    with conn:
+        changes = conn.execute("SELECT op, args FROM changes ORDER BY id").fetchall()
+        conn.execute("DELETE FROM clients")
+        conn.executemany(
+            "INSERT INTO clients (nombre, nombre_norm, correo, telefono) VALUES (?, ?, ?, ?)", rows
+        )
+        for op, args in changes:
+            _OPS[op](conn, *json.loads(args))
+        _set_meta(conn, "workbook_version", json.dumps(current))
+    _workbook_seen = current
+    print(f"Re-imported {len(rows)} clients from {CLIENT_EMAILS_PATH} and replayed {len(changes)} changes")
+    _changed()
+    if not changes:
+        # The database matches the workbook again
+        _exported_version = _version
+
+
+def _changed():
+    global _version, _changed_at
+    _version += 1
+    _changed_at = time.time()
+    _start_exporter()
+
+
+def version() -> Tuple[str, Optional[float]]:
+    """
+    (token, time of the last change) for the client list, for ETags.
+    """
+    with _lock:
+        _db()
+    return f"{_started}:{_version}", _changed_at
+
+
+def list_clients() -> pd.DataFrame:
+    """
+    All clients as a nombre/correo/telefono frame, in insertion order.
+    The frame is shared until the next write and must not be modified.
+    """
+    global _frame
+    with _lock:
+        db = _db()
+        version, frame = _frame
+        if version != _version or frame is None:
+            with metrics.span("sqlite"):
+                frame = pd.read_sql_query("SELECT nombre, correo, telefono FROM clients ORDER BY id", db)
+            _frame = (_version, frame)
+        return frame
+
+
+def _email_index(df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    # The first client with a given normalized name wins, as in the old
+    # linear scans; a blank email still shadows later rows
+    names = df["nombre"].str.upper().str.split().str.join(" ")
+    index = {}
+    for name, email in zip(names, df["correo"]):
+        if name not in index:
+            index[name] = str(email).strip() or None if pd.notna(email) else None
+    return index
+
+
+def email_index() -> Dict[str, Optional[str]]:
+    """
+    Normalized client name -> email, shared by every lookup and rebuilt
+    once after each change to the client list.
+    """
+    df = list_clients()
+    return memo(df, "email_index", lambda: _email_index(df))
+
+
+def find_email(name: str) -> Optional[str]:
+    """
+    Email of the first client whose normalized name matches, if any.
+    """
+    return email_index().get(normalize_name(name))
+
+
+def resolve_emails(names: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Resolve many names (e.g. the contratantes of a renewal list) in one call.
+    """
+    index = email_index()
+    return {name: index.get(normalize_name(name)) for name in names}
+
+
+def find_by_email(correo: str) -> List[dict]:
+    """
+    Clients with this email (case-insensitive), in insertion order.
+    """
+    with _lock:
+        rows = _db().execute(
+            "SELECT nombre, correo, telefono FROM clients WHERE correo = ? COLLATE NOCASE ORDER BY id",
+            (correo.strip(),),
+        ).fetchall()
+    return [{"nombre": n, "correo": c, "telefono": t} for n, c, t in rows]
+
+
+def _exact(conn: sqlite3.Connection, nombre: str, match_case: bool = True) -> List[int]:
+    # Candidates come from the normalized-name index, then the legacy
+    # comparison (strip, optionally case-insensitive) picks the rows
+    rows = conn.execute(
+        "SELECT id, nombre FROM clients WHERE nombre_norm = ? ORDER BY id", (normalize_name(nombre),)
+    ).fetchall()
+    wanted = nombre.strip()
+    if match_case:
+        return [i for i, n in rows if n.strip() == wanted]
+    return [i for i, n in rows if n.strip().lower() == wanted.lower()]
+
+
+# Each write takes the connection and its arguments and returns whether it
+# changed anything, so it can be logged and replayed after a re-import
+
+def _add(conn: sqlite3.Connection, nombre: str, correo: Optional[str], telefono: Optional[str]) -> bool:
+    conn.execute(
+        "INSERT INTO clients (nombre, nombre_norm, correo, telefono) VALUES (?, ?, ?, ?)",
+        (nombre, normalize_name(nombre), correo, telefono),
+    )
+    return True
+
+
+def _update(conn: sqlite3.Connection, original_nombre: str, nombre: str, correo: Optional[str], telefono: Optional[str]) -> bool:
+    ids = _exact(conn, original_nombre)
+    if not ids:
+        return False
+    conn.execute(
+        "UPDATE clients SET nombre = ?, nombre_norm = ?, correo = ?, telefono = ? WHERE id = ?",
+        (nombre, normalize_name(nombre), correo, telefono, ids[0]),
+    )
+    return True
+
+
+def _delete(conn: sqlite3.Connection, nombre: str) -> int:
+    ids = _exact(conn, nombre)
+    conn.executemany("DELETE FROM clients WHERE id = ?", [(i,) for i in ids])
+    return len(ids)
+
+
+def _upsert_email(conn: sqlite3.Connection, nombre: str, correo: str) -> bool:
+    ids = _exact(conn, nombre, match_case=False)
+    if ids:
+        print(f"Updating existing client {nombre} with new email {correo}")
+        conn.execute("UPDATE clients SET correo = ? WHERE id = ?", (correo, ids[0]))
+    else:
+        print(f"Auto-adding new client {nombre} with email {correo}")
+        conn.execute(
+            "INSERT INTO clients (nombre, nombre_norm, correo, telefono) VALUES (?, ?, ?, NULL)",
+            (nombre.strip(), normalize_name(nombre), correo.strip()),
+        )
+    return True
+
+
+_OPS = {"add": _add, "update": _update, "delete": _delete, "upsert_email": _upsert_email}
+
+
+def _write(op: str, *args):
+    with _lock:
+        db = _db()
+        with db:
+            result = _OPS[op](db, *args)
+            if result:
+                db.execute("INSERT INTO changes (op, args) VALUES (?, ?)", (op, json.dumps(args)))
+        if result:
+            _changed()
+        return result
+
+
+def add(nombre: str, correo: Optional[str], telefono: Optional[str]):
+    _write("add", nombre, correo, telefono)
+
+
+def update(original_nombre: str, nombre: str, correo: Optional[str], telefono: Optional[str]) -> bool:
+    """
+    Replace the first client named `original_nombre`. False if there is none.
+    """
+    return _write("update", original_nombre, nombre, correo, telefono)
+
+
+def delete(nombre: str) -> int:
+    """
+    Delete every client named `nombre`; returns how many were removed.
+    """
+    return _write("delete", nombre)
+
+
+def upsert_email(nombre: str, correo: str):
+    """
+    Set the email of the client named `nombre` (case-insensitive), or add it.
+    """
+    _write("upsert_email", nombre, correo)
+
+
+@metrics.span("clientes_export")
+def export_workbook():
+    """
+    Write the client list back to the workbook (Clientes, Mail, Telefono),
+    through a temp file so Excel never sees a half-written file. Edits
+    saved to the workbook in the meantime are merged in first (see _sync).
+    """
+    global _exported_version, _workbook_seen
+    with _lock:
+        # list_clients() syncs with the workbook
+        df = list_clients().rename(columns={"nombre": "Clientes", "correo": "Mail", "telefono": "Telefono"})
+        version = _version
+        (last_change,) = _conn.execute("SELECT COALESCE(MAX(id), 0) FROM changes").fetchone()
+
+    path = Path(CLIENT_EMAILS_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".xlsx", dir=str(path.parent))
+    os.close(fd)
+    try:
+        df.to_excel(tmp, index=False)
+        if path.exists():
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    invalidate(path)
+    with _lock:
+        # Not _db(): the file just written must not be taken for an edit.
+        # Changes logged after the snapshot aren't in it yet and are kept.
+        with _conn:
+            _conn.execute("DELETE FROM changes WHERE id <= ?", (last_change,))
+            _workbook_seen = file_version(path)
+            _set_meta(_conn, "workbook_version", json.dumps(_workbook_seen))
+        _exported_version = version
+
+
+def _export_loop():
+    while True:
+        time.sleep(CLIENTS_EXPORT_SECONDS)
+        if _exported_version == _version:
+            continue
+        try:
+            export_workbook()
+        except Exception as e:
+            # Typically the workbook is open in Excel; retry next round
+            print(f"Error exporting clients to {CLIENT_EMAILS_PATH}: {e}")
+
+
+def _start_exporter():
+    global _exporter
+    if CLIENTS_EXPORT_SECONDS > 0 and _exporter is None:
+        _exporter = threading.Thread(target=_export_loop, name="clientes-export", daemon=True)
+        _exporter.start()
+
+
+def flush():
+    """
+    Export pending changes right away (e.g. on shutdown).
+    """
+    if CLIENTS_EXPORT_SECONDS > 0 and _exported_version != _version:
+        try:
+            export_workbook()
+        except Exception as e:
+            print(f"Error exporting clients to {CLIENT_EMAILS_PATH}: {e}")
@@ -1,41 +1,23 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends
 import pandas as pd
 from config import METLIFE_PATHS, SURA_PATHS, AARCO_PATHS, SHEET_NAMES
+from services import cleaning
+from services.cache import load_frame
+from services.conditional import conditional
+from services.dateindex import filter_date_range, parse_date
+from services.executor import blocking
+from services.ingest import append_only
+from services.listing import ListParams, page_records
 import numpy as np
 from typing import Optional, List
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/cobranza", tags=["cobranza"])
 
-def clean_money(val):
-    """
-    Convert currency string or number to float.
-    """
-    if pd.isna(val):
-        return None
-    if isinstance(val, (int, float)):
-        return float(val)
-    # Remove $ and ,
-    s = str(val).replace("$", "").replace(",", "").strip()
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
-def parse_date(val):
-    """
-    Parse date to ISO string YYYY-MM-DD.
-    """
-    if pd.isna(val):
-        return None
-    try:
-        dt = pd.to_datetime(val, errors='coerce')
-        if pd.isna(dt):
-            return None
-        return dt.strftime("%Y-%m-%d")
-    except:
-        return None
+# Every workbook a /cobranza response may be built from
+SOURCES = [METLIFE_PATHS["COBRANZA"], SURA_PATHS["COBRANZA"], AARCO_PATHS["COBRANZA"]]
 
+@append_only
 def clean_vida(df: pd.DataFrame) -> pd.DataFrame:
     # Columns to keep: '# de Póliza', 'Producto', 'Conducto de Cobro', 'Fecha de Pago del Recibo', 'Año de Vida Póliza', 'Prima Pagada', 'Comisión Bruto', 'Comisión Neta'
     
@@ -44,13 +26,13 @@ def clean_vida(df: pd.DataFrame) -> pd.DataFrame:
     
     # Date conversion
     if 'Fecha de Pago del Recibo' in df.columns:
-        df['Fecha de Pago del Recibo'] = df['Fecha de Pago del Recibo'].apply(parse_date)
+        df['Fecha de Pago del Recibo'] = cleaning.dates(df['Fecha de Pago del Recibo'])
         
     # Money conversion
     money_cols = ['Prima Pagada', 'Comisión Bruto', 'Comisión Neta']
     for col in money_cols:
         if col in df.columns:
-            df[col] = df[col].apply(clean_money)
+            df[col] = cleaning.money(df[col])
 
     requested_cols = [
         '# de Póliza', 'Producto', 'Conducto de Cobro', 
@@ -63,8 +45,9 @@ def clean_vida(df: pd.DataFrame) -> pd.DataFrame:
         if col not in df.columns:
             df[col] = None
             
-    return df[requested_cols].replace({np.nan: None})
+    return df[requested_cols]
 
+@append_only
 def clean_gmm(df: pd.DataFrame) -> pd.DataFrame:
     # Columns to keep: '# de Póliza', 'Producto', 'Conducto de Cobro', 'Fecha de Pago del Recibo', 'Año de Vida Póliza', 'Estado', 'Prima Pagada', 'Comisión Bruto', 'Comisión Neta', 'IVA Causado'
     
@@ -72,13 +55,13 @@ def clean_gmm(df: pd.DataFrame) -> pd.DataFrame:
     
     # Date conversion
     if 'Fecha de Pago del Recibo' in df.columns:
-        df['Fecha de Pago del Recibo'] = df['Fecha de Pago del Recibo'].apply(parse_date)
+        df['Fecha de Pago del Recibo'] = cleaning.dates(df['Fecha de Pago del Recibo'])
 
     # Money conversion
     money_cols = ['Prima Pagada', 'Comisión Bruto', 'Comisión Neta', 'IVA Causado']
     for col in money_cols:
         if col in df.columns:
-            df[col] = df[col].apply(clean_money)
+            df[col] = cleaning.money(df[col])
             
     # Handle 'Estado' mapping if 'Estado' column doesn't exist but 'Estatus Recibo' does
     if 'Estado' not in df.columns and 'Estatus Recibo' in df.columns:
@@ -95,8 +78,9 @@ def clean_gmm(df: pd.DataFrame) -> pd.DataFrame:
         if col not in df.columns:
             df[col] = None
             
-    return df[requested_cols].replace({np.nan: None})
+    return df[requested_cols]
 
+@append_only
 def clean_sura_cobranza(df: pd.DataFrame) -> pd.DataFrame:
     """
     Clean and normalize SURA Cobranza data.
@@ -107,17 +91,17 @@ def clean_sura_cobranza(df: pd.DataFrame) -> pd.DataFrame:
     
     # Date conversion
     if 'Fecha aplicación de la póliza' in df.columns:
-        df['Fecha aplicación de la póliza'] = df['Fecha aplicación de la póliza'].apply(parse_date)
+        df['Fecha aplicación de la póliza'] = cleaning.dates(df['Fecha aplicación de la póliza'])
         
     # Money conversion
     money_cols = ['Prima Total', 'Prima Neta', 'Monto Comisión Neta', 'Total Comisión pagado']
     for col in money_cols:
         if col in df.columns:
-            df[col] = df[col].apply(clean_money)
+            df[col] = cleaning.money(df[col])
             
     # Percentage conversion
     if '% Comisión pagado' in df.columns:
-        df['% Comisión pagado'] = pd.to_numeric(df['% Comisión pagado'], errors='coerce') / 100.0
+        df['% Comisión pagado'] = cleaning.percentage(df['% Comisión pagado'])
         
     # Select all columns as requested (or specific ones? User listed all columns and types, implying we keep them)
     # User said: "To this table in order to display it properly we wil wrangle it in the backend"
@@ -134,8 +118,9 @@ def clean_sura_cobranza(df: pd.DataFrame) -> pd.DataFrame:
         if col not in df.columns:
             df[col] = None
             
-    return df[requested_cols].replace({np.nan: None})
+    return df[requested_cols]
 
+@append_only
 def clean_aarco(df: pd.DataFrame) -> pd.DataFrame:
     """
     Clean and normalize AARCO/AXA Cobranza data.
@@ -146,13 +131,13 @@ def clean_aarco(df: pd.DataFrame) -> pd.DataFrame:
     
     # Date conversion
     if 'F_COBRO' in df.columns:
-        df['F_COBRO'] = df['F_COBRO'].apply(parse_date)
+        df['F_COBRO'] = cleaning.dates(df['F_COBRO'])
         
     # Money conversion
     money_cols = ['PRIMA_NETA_MN', 'COM_APL_MN', '$ COMISION PROSPECTADOR']
     for col in money_cols:
         if col in df.columns:
-            df[col] = df[col].apply(clean_money)
+            df[col] = cleaning.money(df[col])
             
     requested_cols = [
         'CIA', 'NUM_POL', 'CLIENTE', 'PROSPECTADOR', 'F_COBRO', 
@@ -164,24 +149,25 @@ def clean_aarco(df: pd.DataFrame) -> pd.DataFrame:
         if col not in df.columns:
             df[col] = None
             
-    return df[requested_cols].replace({np.nan: None})
+    return df[requested_cols]
 
 @router.get("/vida")
-async def get_cobranza_vida(
+@conditional(*SOURCES)
+@blocking
+def get_cobranza_vida(
     start_date: Optional[str] = Query(None, description="Start date YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="End date YYYY-MM-DD"),
-    insurer: str = Query("Metlife", description="Insurer name")
+    insurer: str = Query("Metlife", description="Insurer name"),
+    params: ListParams = Depends()
 ):
+    start_date, end_date = parse_date(start_date, "start_date"), parse_date(end_date, "end_date")
     try:
         if insurer.lower() == "metlife":
-            df = pd.read_excel(METLIFE_PATHS["COBRANZA"], sheet_name=SHEET_NAMES["COBRANZA_VIDA"])
-            df = clean_vida(df)
+            df = load_frame(METLIFE_PATHS["COBRANZA"], SHEET_NAMES["COBRANZA_VIDA"], clean_vida)
             
-            if start_date and end_date:
-                if 'Fecha de Pago del Recibo' in df.columns:
-                    mask = (df['Fecha de Pago del Recibo'] >= start_date) & (df['Fecha de Pago del Recibo'] <= end_date)
-                    df = df[mask]
-            return df.to_dict(orient="records")
+            if start_date is not None and end_date is not None:
+                df = filter_date_range(df, 'Fecha de Pago del Recibo', start_date, end_date)
+            return page_records([df], params)
         elif insurer.lower() == "sura":
             # SURA doesn't have separate Vida/GMM endpoints usually, but if frontend calls /vida for SURA, 
             # we might return the whole list or filter by 'Daños/Vida' if applicable.
@@ -191,28 +177,22 @@ async def get_cobranza_vida(
             # Given the frontend structure, it's better to have a generic endpoint or handle it here.
             # Let's return the SURA data here if requested, or maybe filter by 'Vida' if that column exists?
             # The column is 'Daños/Vida'.
-            df = pd.read_excel(SURA_PATHS["COBRANZA"], sheet_name="Cobranza")
-            df = clean_sura_cobranza(df)
+            df = load_frame(SURA_PATHS["COBRANZA"], "Cobranza", clean_sura_cobranza)
             
-            if start_date and end_date:
-                if 'Fecha aplicación de la póliza' in df.columns:
-                    mask = (df['Fecha aplicación de la póliza'] >= start_date) & (df['Fecha aplicación de la póliza'] <= end_date)
-                    df = df[mask]
+            if start_date is not None and end_date is not None:
+                df = filter_date_range(df, 'Fecha aplicación de la póliza', start_date, end_date)
             
             # Optional: Filter by 'Daños/Vida' if we want to mimic the endpoint structure
             # But SURA might be mixed. Let's return all for now or filter if 'Vida' is in the column.
-            return df.to_dict(orient="records")
+            return page_records([df], params)
         
         elif insurer.upper() == "AARCO_AXA":
-            df = pd.read_excel(AARCO_PATHS["COBRANZA"])
-            df = clean_aarco(df)
+            df = load_frame(AARCO_PATHS["COBRANZA"], 0, clean_aarco)
             
-            if start_date and end_date:
-                if 'F_COBRO' in df.columns:
-                    mask = (df['F_COBRO'] >= start_date) & (df['F_COBRO'] <= end_date)
-                    df = df[mask]
+            if start_date is not None and end_date is not None:
+                df = filter_date_range(df, 'F_COBRO', start_date, end_date)
             
-            return df.to_dict(orient="records")
+            return page_records([df], params)
             
         return []
     except Exception as e:
@@ -220,34 +200,32 @@ async def get_cobranza_vida(
         return []
 
 @router.get("/gmm")
-async def get_cobranza_gmm(
+@conditional(*SOURCES)
+@blocking
+def get_cobranza_gmm(
     start_date: Optional[str] = Query(None, description="Start date YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="End date YYYY-MM-DD"),
-    insurer: str = Query("Metlife", description="Insurer name")
+    insurer: str = Query("Metlife", description="Insurer name"),
+    params: ListParams = Depends()
 ):
+    start_date, end_date = parse_date(start_date, "start_date"), parse_date(end_date, "end_date")
     try:
         if insurer.lower() == "metlife":
-            df = pd.read_excel(METLIFE_PATHS["COBRANZA"], sheet_name=SHEET_NAMES["COBRANZA_GMM"])
-            df = clean_gmm(df)
+            df = load_frame(METLIFE_PATHS["COBRANZA"], SHEET_NAMES["COBRANZA_GMM"], clean_gmm)
             
-            if start_date and end_date:
-                 if 'Fecha de Pago del Recibo' in df.columns:
-                    mask = (df['Fecha de Pago del Recibo'] >= start_date) & (df['Fecha de Pago del Recibo'] <= end_date)
-                    df = df[mask]
-            return df.to_dict(orient="records")
+            if start_date is not None and end_date is not None:
+                df = filter_date_range(df, 'Fecha de Pago del Recibo', start_date, end_date)
+            return page_records([df], params)
         elif insurer.lower() == "sura":
              # Same logic as above, return SURA data (maybe filtered)
              # Since SURA is one table, we can just return it here too, or return empty if we want to force 'Vida' tab usage.
              # User didn't specify splitting SURA.
              # Let's return it here too for now.
-            df = pd.read_excel(SURA_PATHS["COBRANZA"], sheet_name="Cobranza")
-            df = clean_sura_cobranza(df)
+            df = load_frame(SURA_PATHS["COBRANZA"], "Cobranza", clean_sura_cobranza)
             
-            if start_date and end_date:
-                if 'Fecha aplicación de la póliza' in df.columns:
-                    mask = (df['Fecha aplicación de la póliza'] >= start_date) & (df['Fecha aplicación de la póliza'] <= end_date)
-                    df = df[mask]
-            return df.to_dict(orient="records")
+            if start_date is not None and end_date is not None:
+                df = filter_date_range(df, 'Fecha aplicación de la póliza', start_date, end_date)
+            return page_records([df], params)
         
         elif insurer.upper() == "AARCO_AXA":
             # For AARCO_AXA we return nothing here as it's not GMM specific, 
@@ -0,0 +1,146 @@
+"""
+Conditional GET for the read endpoints.
+
+The frontend refetches whole datasets every time a view mounts or a filter
+changes. A response's ETag is derived from the versions of the sources it
+is built from (workbook mtime + size, pending journal edits, the client
+store's change counter) plus the path, query string and Accept header, so
+it can be computed with a few stat() calls, before anything is parsed.
+A request whose If-None-Match (or, failing that, If-Modified-Since) still
+matches gets an empty 304.
+
+    @router.get("/data")
+    @conditional(METLIFE_PATHS["CARTERA"], SURA_PATHS["CARTERA"])
+    @blocking
+    def get_data(...):
+
+Sources are workbook paths or callables returning (token, modified), where
+modified is a Unix timestamp or None.
+"""
+
+import functools
+import hashlib
+import inspect
+from datetime import date, datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from services.cache import file_version
+from services.executor import io_pool
+
+# Name of the Request parameter added to the wrapped handler's signature
+_REQUEST_PARAM = "conditional_request"
+
+
+def file_source(path) -> Tuple[str, Optional[float]]:
+    version = file_version(path)
+    if version is None:
+        return "-", None
+    mtime_ns, size = version
+    return f"{mtime_ns}:{size}", mtime_ns / 1e9
+
+
+def today_source() -> Tuple[str, Optional[float]]:
+    """
+    For responses that default to a window starting today.
+    """
+    today = date.today()
+    return today.isoformat(), datetime.combine(today, datetime.min.time()).timestamp()
+
+
+def _validators(request: Request, sources: list) -> Tuple[str, Optional[float]]:
+    tokens, modified = [], []
+    for source in sources:
+        token, mtime = source() if callable(source) else file_source(source)
+        tokens.append(token)
+        if mtime is not None:
+            modified.append(mtime)
+    key = repr((
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        request.headers.get("accept", ""),
+        tokens,
+    ))
+    # Weak: the same data may go out with a different Content-Encoding
+    etag = 'W/"' + hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + '"'
+    return etag, max(modified) if modified else None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore the W/ prefix on both sides
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str, modified: Optional[float]) -> bool:
+    """
+    If-None-Match takes precedence; If-Modified-Since is only consulted
+    when the client sent no ETag.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole-second resolution
+        return int(modified) <= since
+    return False
+
+
+def _headers(etag: str, modified: Optional[float]) -> dict:
+    # no-cache: browsers may keep the body but must revalidate every time,
+    # instead of guessing a freshness lifetime from Last-Modified
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = formatdate(modified, usegmt=True)
+    return headers
+
+
+def conditional(*sources) -> Callable:
+    """
+    Decorate an async (e.g. @blocking) route handler with ETag /
+    Last-Modified validation. Put it between @router.get and @blocking.
+    """
+    def decorate(handler: Callable) -> Callable:
+        signature = inspect.signature(handler)
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.pop(_REQUEST_PARAM, None)
+            if request is None:
+                # Called directly rather than routed (e.g. a legacy alias)
+                return await handler(*args, **kwargs)
+
+            # Taken before the handler reads anything: if a source changes
+            # mid-request the client holds an older tag and refetches
+            etag, modified = await io_pool.run(_validators, request, sources)
+            headers = _headers(etag, modified)
+            if not_modified(request, etag, modified):
+                return Response(status_code=304, headers=headers)
+
+            response = await handler(*args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                response.headers.update(headers)
+            return response
+
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter(_REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+        ])
+        return wrapper
+
+    return decorate
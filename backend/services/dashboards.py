@@ -0,0 +1,137 @@
+from fastapi import APIRouter, HTTPException, Query
+import pandas as pd
+from typing import Optional
+from config import METLIFE_PATHS, SURA_PATHS, AARCO_PATHS, SHEET_NAMES
+from services import cobranza, metrics
+from services.cache import load_frames, memo
+from services.dateindex import parse_date
+from services.executor import blocking
+from services.serialization import FrameJSONResponse
+
+router = APIRouter(prefix="/dashboards", tags=["dashboards"])
+
+# Cobranza sheets feeding the commission dashboards, keyed by (insurer, type).
+# 'dimensions' maps the optional rollup dimensions to each sheet's columns;
+# a dimension a sheet doesn't have is reported as null.
+ROLLUP_SOURCES = {
+    ("Metlife", "VIDA"): {
+        "path": METLIFE_PATHS["COBRANZA"],
+        "sheet": SHEET_NAMES["COBRANZA_VIDA"],
+        "clean": cobranza.clean_vida,
+        "date": "Fecha de Pago del Recibo",
+        "value": "Comisión Neta",
+        "dimensions": {"producto": "Producto", "conducto": "Conducto de Cobro"},
+    },
+    ("Metlife", "GMM"): {
+        "path": METLIFE_PATHS["COBRANZA"],
+        "sheet": SHEET_NAMES["COBRANZA_GMM"],
+        "clean": cobranza.clean_gmm,
+        "date": "Fecha de Pago del Recibo",
+        "value": "Comisión Neta",
+        "dimensions": {"producto": "Producto", "conducto": "Conducto de Cobro"},
+    },
+    ("SURA", "ALL"): {
+        "path": SURA_PATHS["COBRANZA"],
+        "sheet": "Cobranza",
+        "clean": cobranza.clean_sura_cobranza,
+        "date": "Fecha aplicación de la póliza",
+        "value": "Total Comisión pagado",
+        "dimensions": {"producto": "Ramo"},
+    },
+    ("AARCO_AXA", "ALL"): {
+        "path": AARCO_PATHS["COBRANZA"],
+        "sheet": 0,
+        "clean": cobranza.clean_aarco,
+        "date": "F_COBRO",
+        "value": "COM_APL_MN",
+        "dimensions": {"producto": "CIA", "prospectador": "PROSPECTADOR"},
+    },
+}
+
+DIMENSIONS = ["producto", "conducto", "prospectador"]
+
+
+@metrics.span("aggregate")
+def daily_rollup(df: pd.DataFrame, source: dict, dims: tuple) -> pd.DataFrame:
+    """
+    Commission total and receipt count per day (and per dimension value).
+    Computed once per workbook version; month rollups for any date range
+    are then cheap re-aggregations of these few thousand rows.
+    """
+    data = {
+        "date": df[source["date"]],
+        "value": pd.to_numeric(df[source["value"]], errors="coerce"),
+    }
+    for dim in dims:
+        column = source["dimensions"].get(dim)
+        data[dim] = df[column] if column else None
+    frame = pd.DataFrame(data)
+    frame = frame[frame["date"].notna()]
+
+    return (
+        frame.groupby(["date", *dims], dropna=False, sort=True)
+        .agg(total=("value", "sum"), count=("value", "size"))
+        .reset_index()
+    )
+
+
+@router.get("/rollup")
+@blocking
+def get_commission_rollup(
+    insurer: str = Query("ALL", description="Metlife, SURA, AARCO_AXA or ALL"),
+    type: str = Query("ALL", description="Metlife policy type: ALL, VIDA, GMM"),
+    start_date: Optional[str] = Query(None, description="Start date YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="End date YYYY-MM-DD"),
+    dimensions: Optional[str] = Query(None, description="Extra group-by dimensions: producto, conducto, prospectador"),
+):
+    """
+    Commission totals per insurer, type and month ('YYYY-MM'), optionally
+    split by product, payment channel or prospectador.
+    """
+    dims = tuple(d.strip().lower() for d in (dimensions or "").split(",") if d.strip())
+    unknown = [d for d in dims if d not in DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dimensions: {', '.join(unknown)}")
+    start_date, end_date = parse_date(start_date, "start_date"), parse_date(end_date, "end_date")
+
+    selected = [
+        (source_insurer, source_type, source)
+        for (source_insurer, source_type), source in ROLLUP_SOURCES.items()
+        if (insurer.upper() == "ALL" or insurer.upper() == source_insurer.upper())
+        and (source_type == "ALL" or type.upper() in ["ALL", source_type])
+    ]
+
+    # Metlife Vida and GMM share a workbook: read the needed sheets in one pass
+    sheets = {}
+    for source_insurer, source_type, source in selected:
+        sheets.setdefault(str(source["path"]), {})[source["sheet"]] = source["clean"]
+    loaded = {}
+    for path, wanted in sheets.items():
+        try:
+            loaded[path] = load_frames(path, wanted)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            print(f"Error loading {path} for rollup: {e}")
+
+    frames = []
+    for source_insurer, source_type, source in selected:
+        if str(source["path"]) not in loaded:
+            continue
+        df = loaded[str(source["path"])][source["sheet"]]
+
+        daily = memo(df, ("daily_rollup", dims), lambda: daily_rollup(df, source, dims))
+        if start_date is not None and end_date is not None:
+            daily = daily[(daily["date"] >= start_date) & (daily["date"] <= end_date)]
+
+        month = daily["date"].dt.strftime("%Y-%m").rename("month")
+        monthly = (
+            daily.groupby([month, *[daily[d] for d in dims]], dropna=False, sort=True)[["total", "count"]]
+            .sum()
+            .reset_index()
+        )
+        monthly.insert(0, "type", source_type)
+        monthly.insert(0, "insurer", source_insurer)
+        frames.append(monthly)
+
+    return FrameJSONResponse(frames)
@@ -0,0 +1,72 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from services import metrics
+from services.cache import memo
+
+
+class DateIndex:
+    """
+    Row positions of a frame ordered by one date column, so that a date
+    range can be found with two binary searches instead of a full scan.
+    Rows without a date are left out, as they never match a range.
+    """
+
+    def __init__(self, column: pd.Series):
+        if not pd.api.types.is_datetime64_any_dtype(column):
+            column = pd.to_datetime(column, errors="coerce")
+        values = column.to_numpy(dtype="datetime64[ns]")
+        positions = np.flatnonzero(~np.isnat(values))
+        order = np.argsort(values[positions], kind="stable")
+        self.positions = positions[order]
+        self.values = values[self.positions]
+        # Sheets appended to in date order (most cobranza bases) need no
+        # reordering: the date order is the row order
+        self.in_row_order = bool(np.all(self.positions[1:] > self.positions[:-1]))
+
+    def between(self, start, end) -> np.ndarray:
+        """
+        Positions of rows with start <= date <= end, in their original order.
+
+        The matches are a contiguous slice of the date-ordered positions,
+        which keep row order within each date. Across dates they are sorted
+        back into row order (O(k log k) for k matches), since the endpoints
+        have always returned rows in sheet order and paginate on it; for a
+        sheet already in date order the slice is returned as is.
+        """
+        lo = np.searchsorted(self.values, pd.Timestamp(start).to_datetime64(), side="left")
+        hi = np.searchsorted(self.values, pd.Timestamp(end).to_datetime64(), side="right")
+        matches = self.positions[lo:hi]
+        return matches if self.in_row_order else np.sort(matches)
+
+
+def parse_date(value: Optional[str], name: str) -> Optional[pd.Timestamp]:
+    """
+    Parse a start_date/end_date query parameter (YYYY-MM-DD). Blank means
+    not given; anything that isn't a date is a 400, rather than an error
+    deep in the filter that the handlers would turn into an empty list.
+    """
+    if not value:
+        return None
+    try:
+        parsed = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        parsed = pd.NaT
+    if parsed is pd.NaT:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} {value!r}, expected YYYY-MM-DD")
+    return parsed
+
+
+def filter_date_range(df: pd.DataFrame, column: str, start, end) -> pd.DataFrame:
+    """
+    Rows of a cached frame whose `column` falls within [start, end].
+    The index is built on first use and reused until the workbook changes.
+    """
+    if column not in df.columns:
+        return df
+    with metrics.span("filter"):
+        index = memo(df, ("date_index", column), lambda: DateIndex(df[column]))
+        return df.take(index.between(start, end))
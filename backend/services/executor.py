@@ -0,0 +1,216 @@
+"""
+Worker pools that keep blocking work off the event loop.
+
+Every handler used to be `async def` while calling pd.read_excel, openpyxl
+and smtplib directly, so one slow workbook or SMTP handshake stalled every
+other request on the worker, /login included. Blocking work now runs in one
+of three bounded pools:
+
+- io_pool: request handlers that read/write workbooks or the SQLite stores
+- cpu_pool: parsing + cleaning of workbook sheets, in separate processes
+- smtp_pool: sending mail, so a slow server can't tie up the I/O threads
+
+Sizes come from config. Each pool keeps queue-depth counters (see stats()).
+"""
+
+import asyncio
+import contextvars
+import functools
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from config import IO_WORKERS, CPU_WORKERS, SMTP_WORKERS
+from services import ingest, metrics, profiling
+
+
+class Pool:
+    """
+    A bounded executor that counts submitted, pending and finished tasks.
+    """
+
+    def __init__(self, name: str, workers: int, factory: Callable[[], Executor], threads: bool = True):
+        self.name = name
+        self.workers = workers
+        self._factory = factory
+        self.threads = threads
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.max_pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory()
+            return self._executor
+
+    def _done(self, future: Future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if self.threads:
+            # Run in the caller's context (e.g. a request being profiled)
+            context = contextvars.copy_context()
+            future = self._get_executor().submit(context.run, profiling.run, fn, *args, **kwargs)
+        else:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        with self._lock:
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+        future.add_done_callback(self._done)
+        return future
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """
+        Run fn in the pool and wait for it (from a worker thread).
+        """
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run fn in the pool without blocking the event loop.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": min(self.pending, self.workers),
+                "queued": max(self.pending - self.workers, 0),
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+io_pool = Pool("io", IO_WORKERS, lambda: ThreadPoolExecutor(IO_WORKERS, thread_name_prefix="io"))
+smtp_pool = Pool("smtp", SMTP_WORKERS, lambda: ThreadPoolExecutor(SMTP_WORKERS, thread_name_prefix="smtp"))
+# 'spawn' rather than fork: the server process is multi-threaded
+cpu_pool = Pool("cpu", CPU_WORKERS, lambda: ProcessPoolExecutor(
+    CPU_WORKERS, mp_context=multiprocessing.get_context("spawn")
+), threads=False)
+
+POOLS = [io_pool, cpu_pool, smtp_pool]
+
+
+def blocking(handler: Callable) -> Callable:
+    """
+    Turn a blocking route handler into an async one that runs in io_pool.
+    Put it under the @router decorator:
+
+        @router.get("/data")
+        @blocking
+        def get_data(...):
+    """
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        return await io_pool.run(handler, *args, **kwargs)
+
+    return wrapper
+
+
+def _read_sheets(
+    path: str,
+    sheets: Dict[object, Optional[Callable]],
+    previous: Dict[object, ingest.IngestState],
+) -> Tuple[Dict[object, pd.DataFrame], Dict[object, Tuple[bool, Optional[ingest.IngestState]]], dict]:
+    # Timed here since this may run in a worker process; read_sheets()
+    # records the figures in the server process
+    start = time.perf_counter()
+    source, trimmed, states = path, None, {}
+    tracked = {sheet_name: previous.get(sheet_name) for sheet_name, clean in sheets.items() if ingest.applies(clean)}
+    if tracked:
+        # Parsed from the same bytes that were fingerprinted
+        data = Path(path).read_bytes()
+        source = io.BytesIO(data)
+        trimmed, states = ingest.split(data, tracked)
+    appended = [sheet_name for sheet_name, (tail, _) in states.items() if tail]
+    full = [sheet_name for sheet_name in sheets if sheet_name not in appended]
+    raw = pd.read_excel(source, sheet_name=full) if full else {}
+    if appended:
+        raw.update(pd.read_excel(io.BytesIO(trimmed), sheet_name=appended))
+    parsed = time.perf_counter()
+    frames = {
+        sheet_name: clean(raw[sheet_name]) if clean is not None else raw[sheet_name]
+        for sheet_name, clean in sheets.items()
+    }
+    timings = {
+        "read_excel": parsed - start,
+        "clean": time.perf_counter() - parsed,
+        "rows": {sheet_name: len(raw[sheet_name]) for sheet_name in sheets},
+    }
+    return frames, states, timings
+
+
+def _record(path: str, timings: dict, cleaned: bool):
+    source = Path(path).name
+    metrics.observe_stage("read_excel", timings["read_excel"], source=source)
+    if cleaned:
+        metrics.observe_stage("clean", timings["clean"], source=source)
+    for sheet_name, rows in timings["rows"].items():
+        metrics.count("taiico_source_rows_read_total", rows, source=source, sheet=sheet_name, origin="xlsx")
+    try:
+        metrics.count("taiico_source_bytes_read_total", os.path.getsize(path), source=source)
+    except OSError:
+        pass
+
+
+def read_sheets(
+    path: str,
+    sheets: Dict[object, Optional[Callable]],
+    previous: Optional[Dict[object, ingest.IngestState]] = None,
+) -> Tuple[Dict[object, pd.DataFrame], Dict[object, Tuple[bool, Optional[ingest.IngestState]]]]:
+    """
+    Parse several sheets of a workbook in one pass, cleaning those that have
+    a cleaner. Runs in cpu_pool when there is cleaning to do; inline when
+    CPU_WORKERS is 0 or the worker processes are gone.
+
+    Append-only sheets (see ingest.py) are checked against their `previous`
+    state; when only rows were added, just those are parsed and cleaned.
+    Returns (frames, {sheet: (appended, state)} for those sheets).
+    """
+    cleaned = any(clean is not None for clean in sheets.values())
+    previous = previous or {}
+    result = None
+    if CPU_WORKERS > 0 and cleaned:
+        try:
+            result = cpu_pool.call(_read_sheets, path, sheets, previous)
+        except BrokenProcessPool as e:
+            print(f"Cleaning pool unavailable, cleaning in-process: {e}")
+            cpu_pool.shutdown()
+    if result is None:
+        result = _read_sheets(path, sheets, previous)
+    frames, states, timings = result
+    _record(str(path), timings, cleaned)
+    return frames, states
+
+
+def stats() -> dict:
+    return {pool.name: pool.stats() for pool in POOLS}
+
+
+def shutdown():
+    for pool in POOLS:
+        pool.shutdown()
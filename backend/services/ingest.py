@@ -0,0 +1,305 @@
+"""
+Incremental ingest of append-only sheets.
+
+The cobranza bases grow by appending each month's receipts at the bottom,
+yet every save used to re-parse and re-clean years of history. For sheets
+whose cleaner is marked @append_only (it works row by row), we remember
+how far the sheet was ingested and a fingerprint of those rows. When the
+workbook changes:
+
+- the sheet XML is decompressed and the ingested rows are fingerprinted
+  again, byte for byte, together with the shared strings and styles they
+  refer to (hashing is far cheaper than parsing);
+- if they are unchanged, pandas parses a trimmed copy of the workbook that
+  holds only the header and the new rows, which are cleaned and appended
+  to the frame cleaned before (see cache.py);
+- if any earlier row was edited, deleted or moved, or the header changed,
+  the sheet is parsed and cleaned in full.
+
+The state travels with the cached frame and is stored in the sidecar
+metadata, so it survives a restart. Anything unexpected in the package
+(not an xlsx, rows without numbers, ...) just means a full parse.
+"""
+
+import hashlib
+import io
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+
+from config import INCREMENTAL_INGEST
+from services.xlsx import workbook_parts
+_EMPTY_SHEET = b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData/></worksheet>'
+
+# Tags may carry a namespace prefix (<x:row>) depending on the writer
+_SHEET_DATA = re.compile(rb"<(?:\w+:)?sheetData\b[^>]*?(/?)>")
+_SHEET_DATA_END = re.compile(rb"</(?:\w+:)?sheetData>")
+_ROW = re.compile(rb'<(?:\w+:)?row\b(?:[^>]*?\br="(\d+)")?[^>]*?(/?)>')
+_ROW_END = re.compile(rb"</(?:\w+:)?row>")
+# A cell value pandas won't read as blank: <v>, or the text of an inline string
+_VALUE = re.compile(rb"<(?:\w+:)?(?:v|t)(?:\s[^>]*)?>[^<]")
+_ROW_REF = re.compile(rb'(<(?:\w+:)?row\b[^>]*?\br=")(\d+)')
+_CELL_REF = re.compile(rb'(<(?:\w+:)?c\b[^>]*?\br="[A-Z]+)(\d+)')
+_STRING = re.compile(rb"<(?:\w+:)?si\b")
+_STRINGS_END = re.compile(rb"</(?:\w+:)?sst>")
+_WORKBOOK_PR = re.compile(rb"<(?:\w+:)?workbookPr\b[^>]*>")
+# What _Workbook._canonical() drops or rewrites
+_LAYOUT = re.compile(rb' (?:spans|ht|customHeight|customFormat|hidden|outlineLevel|collapsed|thickTop|thickBot|ph|\w+:dyDescent)="[^"]*"')
+_EMPTY_CELL = re.compile(rb"<(?:\w+:)?c [^>]*/>")
+_STYLE_REF = re.compile(rb' s="(\d+)"')
+
+
+class IngestState(NamedTuple):
+    # Last sheet row ingested (a row with data), shared strings in the
+    # workbook at the time, and the fingerprint of rows 1..rows
+    rows: int
+    strings: int
+    fingerprint: str
+
+
+def append_only(clean: Callable) -> Callable:
+    """
+    Mark a cleaner as row-local, for sheets that only grow at the bottom.
+    Cleaning a tail of rows and appending it to the cleaned head must give
+    the same frame as cleaning the whole sheet.
+    """
+    clean.append_only = True
+    return clean
+
+
+def applies(clean: Optional[Callable]) -> bool:
+    return INCREMENTAL_INGEST and clean is not None and getattr(clean, "append_only", False)
+
+
+def _kind(codes: Dict[str, str], format_id: str) -> str:
+    # How openpyxl converts numbers in a cell with this format
+    code = codes.get(format_id) or BUILTIN_FORMATS.get(int(format_id)) or "General"
+    if is_timedelta_format(code):
+        return "timedelta"
+    return "date" if is_date_format(code) else "number"
+
+
+class _Sheet:
+    """
+    The rows of a worksheet's XML, located without parsing it.
+    """
+
+    def __init__(self, xml: bytes):
+        self.xml = xml
+        match = _SHEET_DATA.search(xml)
+        if match is None:
+            raise ValueError("worksheet has no sheetData")
+        self.start = self.end = match.end()
+        if not match.group(1):
+            self.end = _SHEET_DATA_END.search(xml, xml.rfind(b"<", 0, xml.rfind(b"sheetData>"))).start()
+
+    def _row(self, start: int) -> Tuple[int, int]:
+        # (end, number) of the row element starting at `start`
+        row = _ROW.match(self.xml, start)
+        if row.group(1) is None:
+            raise ValueError("row without a number")
+        end = row.end() if row.group(2) else _ROW_END.search(self.xml, row.end(), self.end).end()
+        return end, int(row.group(1))
+
+    def _row_before(self, position: int) -> Optional[int]:
+        # Start of the last row element before `position`
+        while True:
+            position = self.xml.rfind(b"<", self.start, position)
+            if position < 0:
+                return None
+            if _ROW.match(self.xml, position):
+                return position
+
+    def last_data_row(self) -> int:
+        # The row pandas trims trailing blank rows back to (0 if none)
+        position = self.end
+        while True:
+            start = self._row_before(position)
+            if start is None:
+                return 0
+            end, number = self._row(start)
+            if _VALUE.search(self.xml, start, end):
+                return number
+            position = start
+
+    def row_end(self, number: int) -> Optional[int]:
+        # Where row `number` ends in the XML, if that row exists. Cell
+        # references have a column letter, so only rows have r="<digits>".
+        position = self.xml.find(b' r="%d"' % number, self.start, self.end)
+        if position < 0:
+            return None
+        start = self._row_before(position)
+        return None if start is None else self._row(start)[0]
+
+    def trimmed(self, after: int) -> bytes:
+        """
+        The worksheet with row 1 (the header) followed by the rows past
+        `after`, renumbered to start at row 2 so blank rows in between keep
+        their place.
+        """
+        header = b""
+        first = _ROW.search(self.xml, self.start, self.end)
+        if first is not None and first.group(1) == b"1":
+            header = self.xml[first.start():self._row(first.start())[0]]
+        tail = b""
+        following = _ROW.search(self.xml, self.row_end(after), self.end)
+        if following is not None:
+            shift = after - 1
+            renumber = lambda match: match.group(1) + str(int(match.group(2)) - shift).encode()
+            tail = _CELL_REF.sub(renumber, _ROW_REF.sub(renumber, self.xml[following.start():self.end]))
+        return self.xml[:self.start] + header + tail + self.xml[self.end:]
+
+
+class _Workbook:
+    """
+    An xlsx package, read just far enough to fingerprint and trim sheets.
+    """
+
+    def __init__(self, data: bytes):
+        self.package = zipfile.ZipFile(io.BytesIO(data))
+        workbook, self.sheets, relationships = workbook_parts(self.package)
+        self.worksheets = {target for kind, target in relationships.values() if kind == "worksheet"}
+
+        parts = {kind: target for kind, target in relationships.values()}
+        self.strings = self.package.read(parts["sharedStrings"]) if "sharedStrings" in parts else b""
+        self.string_starts = [match.start() for match in _STRING.finditer(self.strings)]
+        # Cell values also depend on whether their style formats numbers as
+        # dates, and on the 1904 flag. Writers add and renumber styles freely,
+        # so rows are fingerprinted with each style index replaced by the
+        # kind of value it produces.
+        self.kinds = {}
+        if "styles" in parts:
+            styles = ET.fromstring(self.package.read(parts["styles"]))
+            codes = {e.get("numFmtId"): e.get("formatCode") for e in styles.iter() if e.tag.endswith("}numFmt")}
+            for xfs in (e for e in styles.iter() if e.tag.endswith("}cellXfs")):
+                self.kinds = {
+                    str(index).encode(): b's="' + _kind(codes, xf.get("numFmtId", "0")).encode() + b'"'
+                    for index, xf in enumerate(xfs)
+                }
+        flags = _WORKBOOK_PR.search(self.package.read(workbook))
+        self.flags = flags.group(0) if flags else b""
+        self._parsed: Dict[str, _Sheet] = {}
+
+    def sheet(self, sheet_name) -> Tuple[str, _Sheet]:
+        if isinstance(sheet_name, int):
+            part = self.sheets[sheet_name][1]
+        else:
+            part = next(part for name, part in self.sheets if name == sheet_name)
+        if part not in self._parsed:
+            self._parsed[part] = _Sheet(self.package.read(part))
+        return part, self._parsed[part]
+
+    def _canonical(self, rows: bytes) -> bytes:
+        # Row XML reduced to what the values depend on: writers differ in
+        # layout attributes (spans, heights), empty cells and style numbering
+        rows = _LAYOUT.sub(b"", rows)
+        rows = _EMPTY_CELL.sub(b"", rows)
+        return _STYLE_REF.sub(lambda match: self.kinds.get(match.group(1), b' s="?"'), rows)
+
+    def _strings(self, count: int) -> bytes:
+        # The first `count` shared strings
+        if not count:
+            return b""
+        end = self.string_starts[count] if count < len(self.string_starts) else _STRINGS_END.search(self.strings).start()
+        return self.strings[self.string_starts[0]:end]
+
+    def fingerprints(self, sheet: _Sheet, previous: Optional[IngestState], rows: int) -> Tuple[Optional[str], str]:
+        """
+        (fingerprint of the rows `previous` covered, as they are now, or None
+        if they are gone; fingerprint of rows 1..rows). The shared prefix is
+        only canonicalized and hashed once.
+        """
+        digest = hashlib.sha1(self.flags)
+        done, before = sheet.start, None
+        if previous is not None and previous.rows <= rows and previous.strings <= len(self.string_starts):
+            end = sheet.row_end(previous.rows)
+            if end is not None:
+                digest.update(self._canonical(sheet.xml[done:end]))
+                done = end
+                check = digest.copy()
+                check.update(self._strings(previous.strings))
+                before = check.hexdigest()
+        digest.update(self._canonical(sheet.xml[done:sheet.row_end(rows)]))
+        digest.update(self._strings(len(self.string_starts)))
+        return before, digest.hexdigest()
+
+    def trimmed(self, tails: Dict[str, bytes]) -> bytes:
+        # A copy of the package with the given worksheets replaced and the
+        # other worksheets emptied, stored uncompressed for a quick parse
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as copy:
+            for info in self.package.infolist():
+                if info.filename in tails:
+                    copy.writestr(info.filename, tails[info.filename])
+                elif info.filename in self.worksheets:
+                    copy.writestr(info.filename, _EMPTY_SHEET)
+                else:
+                    copy.writestr(info.filename, self.package.read(info))
+        return out.getvalue()
+
+
+def split(
+    data: bytes, previous: Dict[object, Optional[IngestState]]
+) -> Tuple[Optional[bytes], Dict[object, Tuple[bool, Optional[IngestState]]]]:
+    """
+    Check append-only sheets of a workbook (its file contents, so the
+    fingerprints match what is parsed) against what was ingested before,
+    given as {sheet: previous state or None}.
+
+    Returns (trimmed workbook, {sheet: (appended, state)}). Sheets with
+    appended=True only need the rows in the trimmed workbook parsed (it is
+    None if there are none); the others need a full parse. `state` is what
+    to keep for the next read, None if the sheet can't be tracked.
+    """
+    results = {sheet_name: (False, None) for sheet_name in previous}
+    try:
+        workbook = _Workbook(data)
+    except Exception as e:
+        print(f"Incremental ingest unavailable: {e}")
+        return None, results
+    try:
+        strings = len(workbook.string_starts)
+        tails = {}
+        for sheet_name, state in previous.items():
+            part, sheet = workbook.sheet(sheet_name)
+            rows = sheet.last_data_row()
+            if rows <= 1:
+                # Nothing below the header yet
+                continue
+            before, fingerprint = workbook.fingerprints(sheet, state, rows)
+            current = IngestState(rows, strings, fingerprint)
+            appended = state is not None and before == state.fingerprint
+            if appended:
+                tails[part] = sheet.trimmed(state.rows)
+            results[sheet_name] = (appended, current)
+        return (workbook.trimmed(tails) if tails else None), results
+    except Exception as e:
+        print(f"Incremental ingest unavailable for sheet {sheet_name}: {e}")
+        return None, {sheet_name: (False, None) for sheet_name in previous}
+    finally:
+        workbook.package.close()
+
+
+def combine(head: pd.DataFrame, tail: pd.DataFrame) -> pd.DataFrame:
+    """
+    Append newly cleaned rows to the frame cleaned before, typed as a full
+    parse would have typed them.
+    """
+    if tail.empty:
+        return head
+    head = head.copy(deep=False)
+    tail = tail.set_axis(pd.RangeIndex(len(head), len(head) + len(tail)))
+    for column in head.columns.intersection(tail.columns):
+        if head[column].dtype == tail[column].dtype:
+            continue
+        # An all-blank part adopts the other's type (NaT in a date column,
+        # NaN in a text one) instead of turning the column into objects
+        for blank, other in ((tail, head), (head, tail)):
+            if blank[column].isna().all() and other[column].dtype.kind not in "iub":
+                blank[column] = blank[column].astype(other[column].dtype)
+                break
+    return pd.concat([head, tail])
@@ -0,0 +1,327 @@
+"""
+Write-ahead journal for renewal edits.
+
+Status/expediente/email edits from the Renovaciones page used to read and
+rewrite the workbook on every call, and two concurrent edits could overwrite
+each other. Edits are now appended to a local SQLite journal and acknowledged
+right away. One background writer per workbook coalesces the pending edits
+(last value per policy and column wins) and applies them with a single
+workbook save every JOURNAL_FLUSH_SECONDS, or as soon as JOURNAL_FLUSH_EDITS
+are pending. Until then, reads overlay the pending edits on the cached sheet.
+
+Edits survive a restart: resume() starts writers for whatever is still in
+the journal. A flush that fails because the workbook is locked or being
+saved is retried; edits that can never be applied (sheet renamed, policy or
+id column gone) are moved to the failed_edits table with the error, so they
+don't hold up later edits to the same workbook.
+"""
+
+import sqlite3
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config import JOURNAL_PATH, JOURNAL_FLUSH_SECONDS, JOURNAL_FLUSH_EDITS
+from services import metrics, policies
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS edits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    insurer TEXT NOT NULL,
+    type TEXT NOT NULL,
+    id_col TEXT NOT NULL,
+    policy TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS edits_path ON edits (path, id);
+CREATE TABLE IF NOT EXISTS failed_edits (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    insurer TEXT NOT NULL,
+    type TEXT NOT NULL,
+    id_col TEXT NOT NULL,
+    policy TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT,
+    created REAL NOT NULL,
+    error TEXT NOT NULL,
+    failed REAL NOT NULL
+);
+"""
+
+_COLUMNS = "id, path, sheet, insurer, type, id_col, policy, field, value, created"
+
+_conn = None
+_conn_lock = threading.Lock()
+_writers = {}
+_flush_locks = {}
+
+
+def enabled() -> bool:
+    return JOURNAL_PATH is not None
+
+
+def _db() -> sqlite3.Connection:
+    # One shared connection; every use goes through _conn_lock
+    global _conn
+    if _conn is None:
+        Path(JOURNAL_PATH).parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(str(JOURNAL_PATH), check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=FULL")
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+
+class _Writer:
+    """
+    Background thread flushing one workbook's pending edits.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"journal:{Path(path).name}", daemon=True)
+        self._thread.start()
+
+    def notify(self, pending: int):
+        if pending >= JOURNAL_FLUSH_EDITS:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(JOURNAL_FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                flush(self.path)
+            except Exception as e:
+                # Typically the workbook is open in Excel; retry next round
+                print(f"Error flushing journal for {self.path}: {e}")
+
+
+def _writer(path: str) -> _Writer:
+    with _conn_lock:
+        if path not in _writers:
+            _writers[path] = _Writer(path)
+        return _writers[path]
+
+
+def _flush_lock(path: str) -> threading.Lock:
+    with _conn_lock:
+        return _flush_locks.setdefault(path, threading.Lock())
+
+
+def append(target: policies.RenewalTarget, edits: Dict[str, Dict[str, object]]):
+    """
+    Durably record {policy: {column: value}} for a target sheet.
+    """
+    path = str(target.path)
+    now = time.time()
+    rows = [
+        (path, str(target.sheet_name), target.insurer, target.type, target.id_col,
+         policy, field, None if value is None else str(value), now)
+        for policy, updates in edits.items()
+        for field, value in updates.items()
+    ]
+    if not rows:
+        return
+    with _conn_lock:
+        db = _db()
+        with db:
+            db.executemany(
+                "INSERT INTO edits (path, sheet, insurer, type, id_col, policy, field, value, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        (count,) = db.execute("SELECT COUNT(*) FROM edits WHERE path = ?", (path,)).fetchone()
+    _writer(path).notify(count)
+
+
+def record(match: policies.PolicyMatch, updates: Dict[str, object]):
+    """
+    Journal an edit to one located policy, or write it straight to the
+    workbook when the journal is disabled.
+    """
+    if not updates:
+        return
+    if enabled():
+        append(match.target, {match.policy: updates})
+    else:
+        policies.write_fields(match, updates)
+
+
+def pending(path) -> Dict[str, Dict[str, object]]:
+    """
+    Unflushed edits for a workbook, coalesced to {policy: {column: value}}.
+    """
+    if not enabled():
+        return {}
+    with _conn_lock:
+        rows = _db().execute(
+            "SELECT policy, field, value FROM edits WHERE path = ? ORDER BY id", (str(path),)
+        ).fetchall()
+    edits: Dict[str, Dict[str, object]] = {}
+    for policy, field, value in rows:
+        edits.setdefault(policy, {})[field] = value
+    return edits
+
+
+def version(path) -> Tuple[str, Optional[float]]:
+    """
+    (token, time of the newest edit) for a workbook's pending edits. The
+    token changes whenever an edit is journaled or the pending edits are
+    flushed, so it can be part of an ETag.
+    """
+    if not enabled():
+        return "", None
+    with _conn_lock:
+        last_id, created = _db().execute(
+            "SELECT MAX(id), MAX(created) FROM edits WHERE path = ?", (str(path),)
+        ).fetchone()
+    return str(last_id or 0), created
+
+
+def overlay(df: pd.DataFrame, path, id_col: str) -> pd.DataFrame:
+    """
+    Return `df` with the workbook's pending edits applied, so a user sees
+    their change before it reaches the xlsx. `df` itself is not modified.
+    """
+    with metrics.span("overlay", source=Path(path).name):
+        return _overlay(df, pending(path), id_col)
+
+
+def _overlay(df: pd.DataFrame, edits: Dict[str, Dict[str, object]], id_col: str) -> pd.DataFrame:
+    if not edits or id_col not in df.columns:
+        return df
+
+    ids = df[id_col].astype(str).str.strip().str.replace(".0", "", regex=False)
+    hit = ids.isin(list(edits)).to_numpy()
+    if not hit.any():
+        return df
+
+    df = df.copy()
+    for position in hit.nonzero()[0]:
+        for field, value in edits[ids.iat[position]].items():
+            if field not in df.columns:
+                continue
+            if df[field].dtype != object:
+                df[field] = df[field].astype(object)
+            df.iat[position, df.columns.get_loc(field)] = value
+    return df
+
+
+def _transient(error: Exception) -> bool:
+    # The workbook is open in Excel (locked on Windows) or half-saved; these
+    # go away. Anything else fails the same way on every retry.
+    if isinstance(error, FileNotFoundError):
+        return False
+    return isinstance(error, (OSError, zipfile.BadZipFile))
+
+
+def _settle(applied: List[int], failed: Dict[int, str]):
+    # Drop applied rows and move failed ones to failed_edits, atomically
+    now = time.time()
+    with _conn_lock:
+        db = _db()
+        with db:
+            for id, error in failed.items():
+                db.execute(
+                    f"INSERT OR REPLACE INTO failed_edits ({_COLUMNS}, error, failed)"
+                    f" SELECT {_COLUMNS}, ?, ? FROM edits WHERE id = ?",
+                    (error, now, id),
+                )
+            db.executemany("DELETE FROM edits WHERE id = ?", [(id,) for id in [*applied, *failed]])
+
+
+def flush(path) -> Dict[Tuple[str, str], str]:
+    """
+    Apply a workbook's pending edits with one save per sheet and drop them
+    from the journal. Edits that can't be applied are moved to failed_edits;
+    returns their errors as {(sheet, policy): error}.
+
+    Raises the first transient error (workbook locked or being saved) after
+    settling the other sheets; those edits stay pending for the next flush.
+    """
+    path = str(path)
+    with _flush_lock(path):
+        with _conn_lock:
+            rows = _db().execute(
+                "SELECT id, sheet, insurer, type, id_col, policy, field, value"
+                " FROM edits WHERE path = ? ORDER BY id",
+                (path,),
+            ).fetchall()
+        if not rows:
+            return {}
+
+        groups: Dict[tuple, Dict[str, Dict[str, object]]] = {}
+        ids: Dict[tuple, Dict[str, List[int]]] = {}
+        for id, sheet, insurer, type, id_col, policy, field, value in rows:
+            key = (sheet, insurer, type, id_col)
+            groups.setdefault(key, {}).setdefault(policy, {})[field] = value
+            ids.setdefault(key, {}).setdefault(policy, []).append(id)
+
+        applied: List[int] = []
+        failed: Dict[int, str] = {}
+        errors: Dict[Tuple[str, str], str] = {}
+        retry = None
+        for key, edits in groups.items():
+            sheet, insurer, type, id_col = key
+            target = policies.RenewalTarget(insurer, type, path, sheet, id_col)
+            try:
+                results = policies.write_batch(target, edits)
+            except Exception as e:
+                if _transient(e):
+                    retry = retry or e
+                    continue
+                results = {policy: f"Could not write to sheet {sheet}: {e!r}" for policy in edits}
+            for policy, error in results.items():
+                if error:
+                    print(f"Dropping journaled edit for {path}: {error}")
+                    errors[(sheet, policy)] = error
+                    failed.update(dict.fromkeys(ids[key][policy], error))
+                else:
+                    applied.extend(ids[key][policy])
+
+        _settle(applied, failed)
+        if applied:
+            print(f"Flushed {len(applied)} journaled edits to {path}")
+        if retry is not None:
+            raise retry
+        return errors
+
+
+def _pending_paths() -> List[str]:
+    with _conn_lock:
+        return [path for (path,) in _db().execute("SELECT DISTINCT path FROM edits")]
+
+
+def resume():
+    """
+    Start writers for edits left in the journal by a previous run.
+    """
+    if not enabled():
+        return
+    for path in _pending_paths():
+        _writer(path).notify(JOURNAL_FLUSH_EDITS)
+
+
+def flush_all():
+    """
+    Flush every workbook with pending edits (e.g. on shutdown).
+    """
+    if not enabled():
+        return
+    for path in _pending_paths():
+        try:
+            flush(path)
+        except Exception as e:
+            print(f"Error flushing journal for {path}: {e}")
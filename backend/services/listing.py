@@ -0,0 +1,127 @@
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+
+from services import metrics
+from services.serialization import FrameColumnsResponse, FrameJSONResponse, frame_json
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_CHUNK_ROWS = 5000
+
+
+class ListParams:
+    """
+    Paging, sorting and projection shared by the list endpoints.
+    Use as `params: ListParams = Depends()`. Without any of these
+    parameters an endpoint returns every row, as before.
+
+    Streaming is requested with ?stream=true or `Accept: application/x-ndjson`.
+    ?format=columns returns {"columns": [...], "data": [[...], ...]} with one
+    array per column instead of one object per row (ignored when streaming).
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        limit: Optional[int] = Query(None, ge=1, description="Maximum number of rows to return"),
+        offset: int = Query(0, ge=0, description="Number of rows to skip"),
+        sort: Optional[str] = Query(None, description="Comma-separated columns; prefix with '-' for descending"),
+        fields: Optional[str] = Query(None, description="Comma-separated columns to include"),
+        stream: bool = Query(False, description="Stream rows as newline-delimited JSON"),
+        format: str = Query("records", pattern="^(records|columns)$", description="'records' or 'columns'"),
+    ):
+        self.limit = limit
+        self.offset = offset
+        self.sort = _split(sort)
+        self.fields = _split(fields)
+        self.stream = stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+        self.columns = format == "columns"
+
+
+def _split(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def sort_frame(df: pd.DataFrame, sort: List[str]) -> pd.DataFrame:
+    """
+    Stable sort by the given columns; unknown columns are ignored.
+    """
+    keys = [(name.lstrip("-"), not name.startswith("-")) for name in sort]
+    keys = [(col, asc) for col, asc in keys if col in df.columns]
+    if not keys:
+        return df
+    cols = [col for col, _ in keys]
+    ascending = [asc for _, asc in keys]
+    try:
+        return df.sort_values(cols, ascending=ascending, kind="stable", na_position="last")
+    except TypeError:
+        # Columns mixing numbers and text (e.g. policy numbers) sort as text
+        return df.sort_values(
+            cols, ascending=ascending, kind="stable", na_position="last",
+            key=lambda s: s.astype(str) if s.dtype == object else s,
+        )
+
+
+def paginate(frames: List[pd.DataFrame], params: ListParams) -> Tuple[List[pd.DataFrame], int]:
+    """
+    Apply sort, projection and limit/offset across one or more frames
+    (e.g. Vida followed by GMM). Returns the page frames and the total
+    number of matching rows.
+    """
+    total = sum(len(df) for df in frames)
+
+    if params.sort:
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        frames = [sort_frame(df, params.sort)]
+
+    if params.fields:
+        frames = [df[[col for col in params.fields if col in df.columns]] for df in frames]
+
+    if params.offset or params.limit is not None:
+        start = params.offset
+        stop = total if params.limit is None else start + params.limit
+        page = []
+        for df in frames:
+            n = len(df)
+            if stop > 0 and start < n:
+                page.append(df.iloc[max(start, 0):min(stop, n)])
+            start -= n
+            stop -= n
+        frames = page
+
+    return frames, total
+
+
+def ndjson_chunks(frames: List[pd.DataFrame], chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Yield the rows as NDJSON, a few thousand at a time, so only one chunk
+    of records exists in memory at any point.
+    """
+    for df in frames:
+        for start in range(0, len(df), chunk_rows):
+            with metrics.span("serialize"):
+                chunk = frame_json(df.iloc[start:start + chunk_rows], lines=True)
+            yield chunk
+
+
+def page_records(frames: List[pd.DataFrame], params: ListParams):
+    """
+    Serialize only the requested page, with the total in a header.
+    In streaming mode the page is returned as an NDJSON StreamingResponse.
+    """
+    page, total = paginate(frames, params)
+    if params.stream:
+        return StreamingResponse(
+            ndjson_chunks(page),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={TOTAL_COUNT_HEADER: str(total)},
+        )
+
+    if params.columns:
+        return FrameColumnsResponse(page, headers={TOTAL_COUNT_HEADER: str(total)})
+    return FrameJSONResponse(page, headers={TOTAL_COUNT_HEADER: str(total)})
@@ -0,0 +1,222 @@
+"""
+Timing spans and counters, exposed at /metrics in Prometheus text format.
+
+Slow pages used to leave nothing behind but print() output, so there was no
+telling whether the time went to read_excel, the clean_* functions,
+filtering, serialization or SMTP. Each of those stages now runs inside a
+span:
+
+    with metrics.span("filter"):
+        df = ...
+
+    @metrics.span("smtp")
+    def send_email_smtp(...):
+
+Spans feed a latency histogram per stage, labelled with the endpoint
+(route template, so /cobranza/vida?insurer=SURA and ?insurer=Metlife share
+a series) of the request they ran for, or "background" for warmup and the
+writers; stages that read a workbook also carry its file name as `source`.
+MetricsMiddleware adds one histogram per endpoint. Workbook reads count
+rows and bytes per source. The cache and pool counters are read when
+/metrics is scraped.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Seconds; covers cached hits (ms) up to cold parses of the big extracts
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_histograms: Dict[str, Dict[tuple, list]] = {}
+_counters: Dict[str, Dict[tuple, float]] = {}
+_help: Dict[str, Tuple[str, str]] = {}
+# The ASGI scope of the request being served. The router records the
+# matched route in it, and the pools run tasks in the request's context.
+_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("metrics_scope", default=None)
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def describe(name: str, kind: str, text: str):
+    _help[name] = (kind, text)
+
+
+def observe(name: str, seconds: float, **labels):
+    """
+    Add one observation to histogram `name`.
+    """
+    key = _labels(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        slot = series.get(key)
+        if slot is None:
+            # Per-bucket counts, then sum and count
+            slot = series[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                slot[i] += 1
+                break
+        slot[-2] += seconds
+        slot[-1] += 1
+
+
+def count(name: str, amount: float = 1, **labels):
+    """
+    Increase counter `name` by `amount`.
+    """
+    key = _labels(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+
+def _route(scope: Optional[dict]) -> str:
+    if scope is None:
+        return "background"
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+def observe_stage(stage: str, seconds: float, **labels):
+    """
+    Record `seconds` spent in `stage` for the current endpoint.
+    """
+    observe("taiico_stage_duration_seconds", seconds, stage=stage, route=_route(_scope.get()), **labels)
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """
+    Time a block (or, as a decorator, each call) as `stage`, whether it
+    returns or raises. Extra labels, e.g. source=, go on the sample.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, **labels)
+
+
+describe("taiico_stage_duration_seconds", "histogram", "Time spent in each processing stage, per endpoint.")
+describe("taiico_http_request_duration_seconds", "histogram", "Request latency per endpoint.")
+describe("taiico_http_requests_total", "counter", "Requests per endpoint and status code.")
+describe("taiico_source_rows_read_total", "counter", "Rows read per workbook sheet, from the xlsx or a sidecar.")
+describe("taiico_source_bytes_read_total", "counter", "Workbook bytes parsed per source.")
+describe("taiico_ingest_total", "counter", "Append-only sheet reads, by whether new rows were appended or the whole sheet cleaned.")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request, up to the last body chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _scope.reset(token)
+            # Set by the router once a route matched
+            path = _route(scope)
+            method = scope["method"]
+            observe("taiico_http_request_duration_seconds", time.perf_counter() - start, method=method, route=path)
+            count("taiico_http_requests_total", method=method, route=path, status=status)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _header(lines: List[str], name: str, kind: str, text: str = ""):
+    kind, text = _help.get(name, (kind, text))
+    lines.append(f"# HELP {name} {text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _collected() -> List[Tuple[str, str, str, Dict[tuple, float]]]:
+    # Imported here: cache and executor record into this module
+    from services import executor
+    from services.cache import workbook_cache
+
+    cache = workbook_cache.stats()
+    pools = executor.stats()
+    gauges = [
+        ("taiico_cache_hits_total", "counter", "Workbook cache hits.", {(): cache["hits"]}),
+        ("taiico_cache_misses_total", "counter", "Workbook cache misses (sheets parsed or read from a sidecar).",
+         {(): cache["misses"]}),
+        ("taiico_cache_entries", "gauge", "Sheets held in the workbook cache.", {(): cache["entries"]}),
+        ("taiico_cache_bytes", "gauge", "Memory used by the workbook cache.", {(): cache["bytes"]}),
+    ]
+    for field, kind, text in [
+        ("workers", "gauge", "Workers per pool."),
+        ("running", "gauge", "Tasks running per pool."),
+        ("queued", "gauge", "Tasks waiting for a worker per pool."),
+        ("completed", "counter", "Tasks finished per pool."),
+        ("failed", "counter", "Tasks that raised per pool."),
+    ]:
+        name = f"taiico_pool_{field}" + ("_total" if kind == "counter" else "")
+        gauges.append((name, kind, text, {(("pool", pool),): stats[field] for pool, stats in pools.items()}))
+    return gauges
+
+
+def render() -> str:
+    """
+    Every metric in the Prometheus text exposition format.
+    """
+    lines: List[str] = []
+    with _lock:
+        histograms = {name: {k: list(v) for k, v in series.items()} for name, series in _histograms.items()}
+        counters = {name: dict(series) for name, series in _counters.items()}
+
+    for name, series in sorted(histograms.items()):
+        _header(lines, name, "histogram")
+        for labels, slot in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, slot):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {slot[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_number(slot[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {slot[-1]}")
+
+    for name, series in sorted(counters.items()):
+        _header(lines, name, "counter")
+        for labels, value in sorted(series.items()):
+            lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+
+    for name, kind, text, series in _collected():
+        _header(lines, name, kind, text)
+        for labels, value in series.items():
+            lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+
+    return "\n".join(lines) + "\n"
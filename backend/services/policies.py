@@ -0,0 +1,340 @@
+"""
+Locate renewal policies in their source workbooks.
+
+The renewal endpoints used to resolve the file, sheet and id column inline
+(opening the workbook just to learn its first sheet name) and scan the whole
+sheet for each policy. Here the raw sheet comes from the workbook cache and a
+hash index from normalized policy number to row positions is built once per
+file version.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from config import METLIFE_PATHS, SURA_PATHS, AARCO_PATHS, SHEET_NAMES
+from services import metrics, xlsx
+from services.cache import file_version, invalidate, load_frame, memo, replace
+
+STATUS_COL = "ESTATUS_DE_RENOVACION"
+EXPEDIENTE_COL = "EXPEDIENTE"
+EMAIL_COL = "Email"
+
+
+class RenewalTarget:
+    """
+    Workbook, sheet and id column holding one insurer/type's renewals.
+    """
+
+    def __init__(self, insurer: str, type: str, path, sheet_name, id_col: str):
+        self.insurer = insurer
+        self.type = type
+        self.path = path
+        self.sheet_name = sheet_name
+        self.id_col = id_col
+
+
+class PolicyMatch:
+    """
+    The rows of a target sheet holding one policy (GMM repeats a policy
+    once per insured), plus the raw frame they index into.
+    """
+
+    def __init__(self, target: RenewalTarget, policy: str, frame: pd.DataFrame, id_col: str, rows: List[int]):
+        self.target = target
+        self.policy = policy
+        self.frame = frame
+        self.id_col = id_col
+        self.rows = rows
+
+    def first(self) -> pd.Series:
+        return self.frame.iloc[self.rows[0]]
+
+
+_sheet_names = {}
+
+
+def first_sheet_name(path) -> str:
+    """
+    Name of a workbook's first sheet, remembered per file version.
+    """
+    key = (str(path), file_version(path))
+    if key not in _sheet_names:
+        wb = load_workbook(path, read_only=True)
+        try:
+            _sheet_names[key] = wb.sheetnames[0]
+        finally:
+            wb.close()
+    return _sheet_names[key]
+
+
+def resolve_target(insurer: str, type: str) -> Optional[RenewalTarget]:
+    """
+    Map an insurer/type pair to its renewal workbook, or None if unknown.
+    Raises FileNotFoundError if the workbook is missing.
+    """
+    if insurer.lower() == "metlife":
+        if type.upper() == "VIDA":
+            path, sheet_name, id_col = METLIFE_PATHS["RENOVACIONES_VIDA"], SHEET_NAMES["RENOVACIONES_VIDA"], "POLIZA_ACTUAL"
+        elif type.upper() == "GMM":
+            path, sheet_name, id_col = METLIFE_PATHS["RENOVACIONES_GMM"], SHEET_NAMES["RENOVACIONES_GMM"], "NPOLIZA"
+        else:
+            return None
+    elif insurer.lower() == "sura":
+        path, sheet_name, id_col = SURA_PATHS["RENOVACIONES"], None, "POLIZA"
+    elif insurer.upper() == "AARCO_AXA":
+        path, sheet_name, id_col = AARCO_PATHS["RENOVACIONES"], None, "POLIZA"
+    else:
+        return None
+
+    if file_version(path) is None:
+        raise FileNotFoundError(str(path))
+    if sheet_name is None:
+        # SURA and AARCO keep their data on the first sheet, whatever its name
+        sheet_name = first_sheet_name(path)
+    return RenewalTarget(insurer, type, path, sheet_name, id_col)
+
+
+def normalize_policy(value) -> str:
+    # Same normalization the renewal endpoints have always used: Excel hands
+    # back policy numbers as floats, so '123.0' must match '123'
+    return str(value).strip().replace(".0", "")
+
+
+def _id_column(target: RenewalTarget, frame: pd.DataFrame) -> Optional[str]:
+    if target.id_col in frame.columns:
+        return target.id_col
+    # Legacy AARCO layout
+    if target.insurer.upper() == "AARCO_AXA" and "NUM POL  ACTUAL" in frame.columns:
+        return "NUM POL  ACTUAL"
+    return None
+
+
+def build_policy_index(frame: pd.DataFrame, id_col: str) -> Dict[str, List[int]]:
+    ids = frame[id_col].astype(str).str.strip().str.replace(".0", "", regex=False)
+    index: Dict[str, List[int]] = {}
+    for position, policy in enumerate(ids):
+        index.setdefault(policy, []).append(position)
+    return index
+
+
+def locate(target: RenewalTarget, policy_number) -> Optional[PolicyMatch]:
+    """
+    Find a policy's rows in its target sheet with a single dict lookup.
+    Raises KeyError if the sheet has no id column.
+    """
+    frame = load_frame(target.path, target.sheet_name)
+    id_col = _id_column(target, frame)
+    if id_col is None:
+        raise KeyError(f"ID Column {target.id_col} not found")
+
+    index = memo(frame, ("policy_index", id_col), lambda: build_policy_index(frame, id_col))
+    policy = normalize_policy(policy_number)
+    rows = index.get(policy)
+    if not rows:
+        return None
+    return PolicyMatch(target, policy, frame, id_col, rows)
+
+
+def row_email(match: PolicyMatch, edits: Optional[Dict[str, object]] = None) -> Optional[str]:
+    """
+    Email typed into the policy row itself, which overrides the client list.
+    `edits` are pending changes to the row that take precedence over the file.
+    """
+    row = match.first()
+    if edits:
+        row = pd.concat([row, pd.Series(edits, dtype=object)])
+        row = row[~row.index.duplicated(keep="last")]
+    for col in [EMAIL_COL, "EMAIL"]:
+        if col in row.index:
+            val = row[col]
+            if pd.notna(val) and str(val).strip() and "@" in str(val):
+                return str(val).strip()
+    return None
+
+
+def _header_columns(ws) -> Dict[str, int]:
+    columns = {}
+    for cell in ws[1]:
+        if cell.value is not None and str(cell.value) not in columns:
+            columns[str(cell.value)] = cell.column
+    return columns
+
+
+def _sheet_row(ws, id_column: int, position: int, policy: str) -> Optional[int]:
+    """
+    Worksheet row of the data row at `position`. pandas reads the header
+    from row 1, so this is normally position + 2; the id cell is checked and
+    the column scanned if the layout doesn't line up (e.g. leading blank rows).
+    """
+    row = position + 2
+    if normalize_policy(ws.cell(row=row, column=id_column).value) == policy:
+        return row
+    for (cell,) in ws.iter_rows(min_row=2, min_col=id_column, max_col=id_column):
+        if normalize_policy(cell.value) == policy:
+            return cell.row
+    return None
+
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def _write_lock(path) -> threading.Lock:
+    with _write_locks_guard:
+        return _write_locks.setdefault(str(path), threading.Lock())
+
+
+@metrics.span("workbook_write")
+def write_batch(target: RenewalTarget, edits: Dict[str, Dict[str, object]]) -> Dict[str, Optional[str]]:
+    """
+    Apply {policy: {column: value}} to one sheet and save the workbook once.
+
+    The cells are patched in the sheet XML (see xlsx.SheetPatch) and the
+    cached raw sheet is updated to match, so an edit neither loads the
+    workbook into openpyxl nor parses the sheet again. Sheets that still
+    lack the status/expediente/email header columns, that don't line up
+    with the cached frame (edited by hand since it was read) or that
+    SheetPatch can't handle go through openpyxl, which adds the missing
+    columns. Either way the workbook is saved to a temp file and renamed
+    over the original, so readers never see a half-written file.
+
+    Returns {policy: None} for each applied policy, or an error message for
+    policies that are not in the sheet.
+    """
+    with _write_lock(target.path):
+        try:
+            return _patch_batch(target, edits)
+        except xlsx.Unsupported as e:
+            print(f"Writing {target.path} with openpyxl: {e}")
+        try:
+            return _rewrite_batch(target, edits)
+        finally:
+            invalidate(target.path)
+
+
+def _patch_batch(target: RenewalTarget, edits: Dict[str, Dict[str, object]]) -> Dict[str, Optional[str]]:
+    results: Dict[str, Optional[str]] = {}
+    applied: List[tuple] = []
+    patch = xlsx.SheetPatch(target.path, target.sheet_name)
+    try:
+        columns = patch.header()
+        fields = {col for updates in edits.values() for col in updates}
+        missing = [col for col in dict.fromkeys([STATUS_COL, EXPEDIENTE_COL, EMAIL_COL, *sorted(fields)]) if col not in columns]
+        if missing:
+            raise xlsx.Unsupported(f"adding columns {', '.join(missing)}")
+
+        for policy, updates in edits.items():
+            match = locate(target, policy)
+            if match is None or match.id_col not in columns:
+                results[policy] = f"Policy {policy} not found"
+                continue
+            # pandas reads the header from row 1, so data row i is sheet row i + 2
+            rows = [position + 2 for position in match.rows]
+            id_column = columns[match.id_col]
+            if any(normalize_policy(patch.value(id_column, row)) != match.policy for row in rows):
+                raise xlsx.Unsupported(f"policy {policy} has moved since the sheet was read")
+            for row in rows:
+                for col, value in updates.items():
+                    patch.set(columns[col], row, value)
+            results[policy] = None
+            applied.append((match, updates))
+
+        if applied:
+            patch.save()
+    finally:
+        patch.close()
+
+    frame = _patched_frame(applied) if applied else None
+    if frame is not None:
+        replace(target.path, target.sheet_name, frame)
+    elif applied:
+        invalidate(target.path)
+    return results
+
+
+def _patched_frame(applied: List[tuple]) -> Optional[pd.DataFrame]:
+    # The cached raw sheet with the cells just written, and the policy
+    # index carried over (the id column didn't change). None if the sheet
+    # was re-read in between (edited by hand) and must be read again.
+    original = applied[0][0].frame
+    if any(match.frame is not original or not set(updates) <= set(original.columns) for match, updates in applied):
+        return None
+    frame = original.copy()
+    for match, updates in applied:
+        for col, value in updates.items():
+            if frame[col].dtype != object:
+                frame[col] = frame[col].astype(object)
+            frame.iloc[match.rows, frame.columns.get_loc(col)] = np.nan if value is None else value
+    for match, _ in applied:
+        key = ("policy_index", match.id_col)
+        index = memo(original, key, lambda: build_policy_index(original, match.id_col))
+        memo(frame, key, lambda: index)
+    return frame
+
+
+def _rewrite_batch(target: RenewalTarget, edits: Dict[str, Dict[str, object]]) -> Dict[str, Optional[str]]:
+    # The openpyxl path: load the workbook, add missing header columns,
+    # set the cells and save it whole
+    results: Dict[str, Optional[str]] = {}
+    wb = load_workbook(target.path)
+    try:
+        ws = wb[target.sheet_name]
+        columns = _header_columns(ws)
+        if EMAIL_COL not in columns and "EMAIL" in columns:
+            ws.cell(row=1, column=columns["EMAIL"], value=EMAIL_COL)
+            columns[EMAIL_COL] = columns.pop("EMAIL")
+        fields = {col for updates in edits.values() for col in updates}
+        for col in [STATUS_COL, EXPEDIENTE_COL, EMAIL_COL, *sorted(fields)]:
+            if col not in columns:
+                columns[col] = ws.max_column + 1
+                ws.cell(row=1, column=columns[col], value=col)
+
+        for policy, updates in edits.items():
+            # The index is built from the cached raw sheet, which matches
+            # the file we just opened unless someone edited it by hand;
+            # _sheet_row double-checks every row
+            match = locate(target, policy)
+            if match is None:
+                results[policy] = f"Policy {policy} not found"
+                continue
+            id_column = columns.get(match.id_col)
+            rows = [_sheet_row(ws, id_column, position, match.policy) for position in match.rows]
+            if id_column is None or None in rows:
+                results[policy] = f"Policy {policy} not found"
+                continue
+            for row in rows:
+                for col, value in updates.items():
+                    ws.cell(row=row, column=columns[col], value=value)
+            results[policy] = None
+
+        if any(error is None for error in results.values()):
+            fd, tmp = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(target.path)))
+            os.close(fd)
+            try:
+                wb.save(tmp)
+                shutil.copymode(target.path, tmp)
+                os.replace(tmp, target.path)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+    finally:
+        wb.close()
+    return results
+
+
+def write_fields(match: PolicyMatch, updates: Dict[str, object]):
+    """
+    Set the given columns on one policy's rows (see write_batch).
+    Raises KeyError if the policy is no longer in the workbook.
+    """
+    error = write_batch(match.target, {match.policy: updates})[match.policy]
+    if error:
+        raise KeyError(error)
@@ -0,0 +1,252 @@
+"""
+On-demand cProfile profiles of single requests.
+
+Some requests are only slow for particular insurers or date ranges, on the
+production workbooks. With TAIICO_PROFILE_TOKEN set, a request carrying
+that token (header `X-Profile: <token>` or query `?profile=<token>`) is
+profiled and its profile stored under PROFILE_DIR; the response says where
+in an `X-Profile-Id` header. Profiles are listed at GET /profiles and
+downloaded from GET /profiles/{id} (pstats file, or ?format=text for the
+top functions), with the same token.
+
+Handlers do their work in the io and smtp pools (see executor.py), which
+run each task in the submitting request's context. Every task of a
+profiled request runs under its own cProfile.Profile, and the results are
+merged when the response is finished, so concurrent requests never show
+up in each other's profiles. Workbook parsing in the cleaning processes
+appears as the wait for its result.
+
+Python 3.12+ allows one active profiler per process, so only one task is
+profiled at a time; tasks starting meanwhile run unprofiled and are
+counted as `skipped`. Handlers that don't use the pools have no profiled
+tasks and their profile says so.
+"""
+
+import contextvars
+import cProfile
+import hmac
+import io
+import json
+import pstats
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional
+from urllib.parse import parse_qsl
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from config import PROFILE_TOKEN, PROFILE_DIR, PROFILE_KEEP
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+_session: contextvars.ContextVar[Optional["Session"]] = contextvars.ContextVar("profile_session", default=None)
+
+# Held while a task runs under cProfile (see the module docstring)
+_profiler_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(PROFILE_TOKEN)
+
+
+def _authorized(token: Optional[str]) -> bool:
+    return enabled() and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+class Session:
+    """
+    The profiles collected for one request.
+    """
+
+    def __init__(self, method: str, path: str, query: str):
+        self.id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.method = method
+        self.path = path
+        self.query = query
+        self.started = time.time()
+        self.profiles: List[cProfile.Profile] = []
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile):
+        with self._lock:
+            self.profiles.append(profile)
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def save(self, status: int, seconds: float):
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status": status,
+            "seconds": round(seconds, 4),
+            "created": self.started,
+            "tasks": len(self.profiles),
+            "skipped": self.skipped,
+        }
+        if self.profiles:
+            stats = pstats.Stats(self.profiles[0])
+            for profile in self.profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(str(PROFILE_DIR / f"{self.id}.prof"))
+        (PROFILE_DIR / f"{self.id}.json").write_text(json.dumps(meta))
+        _prune()
+
+
+def run(fn: Callable, *args, **kwargs):
+    """
+    Call fn, under a profiler if the current request is being profiled.
+    The pools call their tasks through this.
+    """
+    session = _session.get()
+    if session is None:
+        return fn(*args, **kwargs)
+    if not _profiler_lock.acquire(blocking=False):
+        session.skip()
+        return fn(*args, **kwargs)
+    try:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) holds the hook
+            session.skip()
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            session.add(profile)
+    finally:
+        _profiler_lock.release()
+
+
+def _prune():
+    metas = sorted(PROFILE_DIR.glob("*.json"))
+    for meta in metas[:max(len(metas) - PROFILE_KEEP, 0)]:
+        meta.with_suffix(".prof").unlink(missing_ok=True)
+        meta.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware starting a Session for requests that carry the token.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _requested(self, scope) -> bool:
+        # The /profiles endpoints take the same token but aren't profiled
+        if scope["path"].startswith(router.prefix):
+            return False
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER.encode() and _authorized(value.decode("latin-1")):
+                return True
+        query = parse_qsl(scope.get("query_string", b"").decode("latin-1"))
+        return any(name == "profile" and _authorized(value) for name, value in query)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled() or not self._requested(scope):
+            return await self.app(scope, receive, send)
+
+        # Imported here: the executor calls back into this module
+        from services.executor import io_pool
+
+        session = Session(scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"))
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER.lower().encode(), session.id.encode())]
+            await send(message)
+
+        token = _session.set(session)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _session.reset(token)
+            try:
+                await io_pool.run(session.save, status, time.perf_counter() - start)
+                print(f"Stored profile {session.id} for {session.method} {session.path}")
+            except Exception as e:
+                print(f"Error storing profile {session.id}: {e}")
+
+
+def _check(token: Optional[str]):
+    if not enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not _authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+def _profile_path(profile_id: str, suffix: str) -> Path:
+    # Ids are generated here; reject anything that could leave PROFILE_DIR
+    if not profile_id.replace("-", "").isalnum():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    path = PROFILE_DIR / f"{profile_id}{suffix}"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return path
+
+
+@router.get("/")
+def list_profiles(
+    token: Optional[str] = Query(None),
+    x_profile: Optional[str] = Header(None),
+):
+    """
+    Stored profiles, newest first.
+    """
+    _check(token or x_profile)
+    if not PROFILE_DIR.exists():
+        return []
+    return [json.loads(meta.read_text()) for meta in sorted(PROFILE_DIR.glob("*.json"), reverse=True)]
+
+
+@router.get("/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = Query("pstats", pattern="^(pstats|text)$", description="'pstats' file or 'text' summary"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    limit: int = Query(60, ge=1, le=1000),
+    token: Optional[str] = Query(None),
+    x_profile: Optional[str] = Header(None),
+):
+    """
+    Download a profile: the pstats file (open with `python -m pstats` or
+    snakeviz), or the top `limit` functions as text. Requests without
+    profiled tasks get a short note instead.
+    """
+    _check(token or x_profile)
+    meta = json.loads(_profile_path(profile_id, ".json").read_text())
+    summary = f"{meta['method']} {meta['path']}?{meta['query']} -> {meta['status']} in {meta['seconds']}s\n\n"
+    if not meta["tasks"]:
+        # pstats can't store an empty profile, so there is no file to send
+        if meta.get("skipped"):
+            reason = f"{meta['skipped']} task(s) ran while another task was being profiled."
+        else:
+            reason = "the handler did not run any work in the pools."
+        return PlainTextResponse(f"{summary}No profiled tasks: {reason}\n")
+    path = _profile_path(profile_id, ".prof")
+    if format == "pstats":
+        return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+    out = io.StringIO()
+    out.write(summary)
+    pstats.Stats(str(path), stream=out).sort_stats(sort).print_stats(limit)
+    return PlainTextResponse(out.getvalue())
@@ -1,14 +1,23 @@
-from fastapi import APIRouter, HTTPException, Query, Body
+from fastapi import APIRouter, HTTPException, Query, Body, Depends, Request
 import pandas as pd
 from typing import List, Optional
 from datetime import datetime, timedelta
 from config import METLIFE_PATHS, SURA_PATHS, SHEET_NAMES
+import functools
 import numpy as np
 import os
 import smtplib
 from email.message import EmailMessage
 from pathlib import Path
-from config import METLIFE_PATHS, SURA_PATHS, AARCO_PATHS, SHEET_NAMES, CLIENT_EMAILS_PATH
+from pydantic import BaseModel
+from config import METLIFE_PATHS, SURA_PATHS, AARCO_PATHS, SHEET_NAMES
+from services import cleaning, clientes_store, journal, metrics, policies
+from services.cache import load_frame
+from services.conditional import conditional, today_source
+from services.clientes import upsert_client_internal
+from services.executor import blocking, io_pool, smtp_pool
+from services.dateindex import filter_date_range, parse_date
+from services.listing import ListParams, page_records
 
 # Load env variables if not already loaded (simple loader as per user usage)
 # Since we created .env in backend/, we can load it.
@@ -31,38 +40,17 @@ def load_env_file():
 
 load_env_file()
 
-def normalize_name(value: str) -> str:
-    if not value:
-        return ""
-    return " ".join(str(value).strip().upper().split())
-
 def get_client_email(client_name: str) -> Optional[str]:
     """
-    Search for client email in CLIENT_EMAILS_PATH.
+    Search for the client's email in the client list.
     """
-    if not CLIENT_EMAILS_PATH.exists():
-        print(f"Client emails file found: {CLIENT_EMAILS_PATH}")
-        return None
-        
     try:
-        df = pd.read_excel(CLIENT_EMAILS_PATH)
-        # Columns: 'Clientes', 'Mail'
-        if 'Clientes' not in df.columns or 'Mail' not in df.columns:
-            print("Columns 'Clientes' or 'Mail' not found in email file")
-            return None
-            
-        norm_name = normalize_name(client_name)
-        df['__norm'] = df['Clientes'].apply(normalize_name)
-        
-        match = df[df['__norm'] == norm_name]
-        if not match.empty:
-            return str(match.iloc[0]['Mail']).strip()
-            
-        return None
+        return clientes_store.find_email(client_name)
     except Exception as e:
         print(f"Error reading client emails: {e}")
         return None
 
+@metrics.span("smtp")
 def send_email_smtp(subject: str, body: str, recipients: List[str], attachments: List[dict] = []):
     host = os.environ.get("SMTP_HOST")
     port = int(os.environ.get("SMTP_PORT", "587"))
@@ -111,55 +99,6 @@ router = APIRouter(
     tags=["renovaciones"]
 )
 
-def clean_data(df: pd.DataFrame) -> List[dict]:
-    """
-    Convert DataFrame to a list of dicts, handling NaN/NaT values.
-    """
-    df = df.replace({np.nan: None})
-    return df.to_dict(orient="records")
-
-def parse_gmm_date(val):
-    """
-    Parse YYYYMMDD integer/string to ISO date string YYYY-MM-DD.
-    """
-    if pd.isna(val):
-        return None
-    s = str(int(val)).zfill(8)
-    try:
-        dt = datetime.strptime(s, "%Y%m%d")
-        return dt.strftime("%Y-%m-%d")
-    except ValueError:
-        return None
-
-def parse_vida_date(val):
-    """
-    Parse various date formats to ISO date string YYYY-MM-DD.
-    """
-    if pd.isna(val):
-        return None
-    try:
-        dt = pd.to_datetime(val, errors='coerce')
-        if pd.isna(dt):
-            return None
-        return dt.strftime("%Y-%m-%d")
-    except:
-        return None
-
-def clean_money(val):
-    """
-    Convert currency string or number to float.
-    """
-    if pd.isna(val):
-        return None
-    if isinstance(val, (int, float)):
-        return float(val)
-    # Remove $ and ,
-    s = str(val).replace("$", "").replace(",", "").strip()
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
 def clean_gmm(df: pd.DataFrame) -> pd.DataFrame:
     """
     Clean and normalize Metlife GMM data.
@@ -169,17 +108,17 @@ def clean_gmm(df: pd.DataFrame) -> pd.DataFrame:
     date_cols = ["FINIVIG", "FFINVIG", "PAGADOHASTA"]
     for col in date_cols:
         if col in df.columns:
-            df[col] = df[col].apply(parse_gmm_date)
+            df[col] = cleaning.dates(df[col], format="%Y%m%d")
 
     # 2. Money Conversion
     money_cols = ["PRIMA", "PRIMA.1", "RECARGO", "GTOSEXP", "IVA", "DEDUCIBLE"]
     for col in money_cols:
         if col in df.columns:
-            df[col] = df[col].apply(clean_money)
+            df[col] = cleaning.money(df[col])
 
     # 3. Percentage Conversion
     if "COASEGURO" in df.columns:
-        df["COASEGURO"] = pd.to_numeric(df["COASEGURO"], errors="coerce") / 100.0
+        df["COASEGURO"] = cleaning.percentage(df["COASEGURO"])
 
     # 4. Select requested columns
     requested_cols = [
@@ -208,13 +147,13 @@ def clean_vida(df: pd.DataFrame) -> pd.DataFrame:
     date_cols = ["INI_VIG", "FIN_VIG", "PAGADO_HASTA"]
     for col in date_cols:
         if col in df.columns:
-            df[col] = df[col].apply(parse_vida_date)
+            df[col] = cleaning.dates(df[col])
 
     # 2. Money Conversion
     money_cols = ["PRIMA_ANUAL", "PRIMA_MODAL"]
     for col in money_cols:
         if col in df.columns:
-            df[col] = df[col].apply(clean_money)
+            df[col] = cleaning.money(df[col])
 
     # 3. Select requested columns
     requested_cols = [
@@ -241,11 +180,11 @@ def clean_sura(df: pd.DataFrame) -> pd.DataFrame:
     date_cols = ["INICIO VIGENCIA", "FIN VIGENCIA"]
     for col in date_cols:
         if col in df.columns:
-            df[col] = df[col].apply(parse_vida_date) # Use generic parser
+            df[col] = cleaning.dates(df[col]) # Use generic parser
 
     # 2. Money Conversion
     if "PRIMA" in df.columns:
-        df["PRIMA"] = df["PRIMA"].apply(clean_money)
+        df["PRIMA"] = cleaning.money(df["PRIMA"])
 
     requested_cols = [
         "POLIZA", "NOMBRE", "INICIO VIGENCIA", "FIN VIGENCIA", 
@@ -259,24 +198,35 @@ def clean_sura(df: pd.DataFrame) -> pd.DataFrame:
             
     return df[requested_cols]
 
+# Workbooks behind /upcoming; pending journal edits are overlaid on each
+RENEWAL_PATHS = [
+    METLIFE_PATHS["RENOVACIONES_VIDA"], METLIFE_PATHS["RENOVACIONES_GMM"],
+    SURA_PATHS["RENOVACIONES"], AARCO_PATHS["RENOVACIONES"],
+]
+
 @router.get("/upcoming")
-async def get_upcoming_renewals(
+# today_source: without a date range the window starts today
+@conditional(*RENEWAL_PATHS, *[functools.partial(journal.version, path) for path in RENEWAL_PATHS], today_source)
+@blocking
+def get_upcoming_renewals(
     start_date: Optional[str] = Query(None, description="Start date YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="End date YYYY-MM-DD"),
     days: Optional[int] = Query(30, description="Legacy: Days to look ahead"),
     insurer: str = Query("Metlife", description="Insurer name"),
-    type: str = Query("ALL", description="Policy type: ALL, VIDA, GMM")
+    type: str = Query("ALL", description="Policy type: ALL, VIDA, GMM"),
+    params: ListParams = Depends()
 ):
     """
     Get upcoming renewals for a specific insurer and type.
     Supports date range filtering.
     """
-    results = []
-    
+    frames = []
+    start_date, end_date = parse_date(start_date, "start_date"), parse_date(end_date, "end_date")
+
     # Determine date range
     today = datetime.now()
     
-    if start_date and end_date:
+    if start_date is not None and end_date is not None:
         start_str = start_date
         end_str = end_date
     else:
@@ -288,65 +238,69 @@ async def get_upcoming_renewals(
         # Load and process VIDA
         if type.upper() in ["ALL", "VIDA"]:
             try:
-                df_vida = pd.read_excel(METLIFE_PATHS["RENOVACIONES_VIDA"], sheet_name=SHEET_NAMES["RENOVACIONES_VIDA"])
-                df_vida = clean_vida(df_vida)
+                df_vida = load_frame(METLIFE_PATHS["RENOVACIONES_VIDA"], SHEET_NAMES["RENOVACIONES_VIDA"], clean_vida)
                 
                 # Filter by date on FIN_VIG
-                if "FIN_VIG" in df_vida.columns:
-                    mask = (df_vida["FIN_VIG"] >= start_str) & (df_vida["FIN_VIG"] <= end_str)
-                    df_vida = df_vida[mask]
+                df_vida = filter_date_range(df_vida, "FIN_VIG", start_str, end_str)
                 
-                results.extend(clean_data(df_vida))
+                df_vida = journal.overlay(df_vida, METLIFE_PATHS["RENOVACIONES_VIDA"], "POLIZA_ACTUAL")
+                frames.append(df_vida)
             except Exception as e:
                 print(f"Error loading Vida: {e}")
 
         # Load and process GMM
         if type.upper() in ["ALL", "GMM"]:
             try:
-                df_gmm = pd.read_excel(METLIFE_PATHS["RENOVACIONES_GMM"], sheet_name=SHEET_NAMES["RENOVACIONES_GMM"])
-                df_gmm = clean_gmm(df_gmm)
+                df_gmm = load_frame(METLIFE_PATHS["RENOVACIONES_GMM"], SHEET_NAMES["RENOVACIONES_GMM"], clean_gmm)
                 
                 # Filter by date on FFINVIG
-                if "FFINVIG" in df_gmm.columns:
-                    mask = (df_gmm["FFINVIG"] >= start_str) & (df_gmm["FFINVIG"] <= end_str)
-                    df_gmm = df_gmm[mask]
+                df_gmm = filter_date_range(df_gmm, "FFINVIG", start_str, end_str)
                 
-                results.extend(clean_data(df_gmm))
+                df_gmm = journal.overlay(df_gmm, METLIFE_PATHS["RENOVACIONES_GMM"], "NPOLIZA")
+                frames.append(df_gmm)
             except Exception as e:
                  print(f"Error loading GMM: {e}")
 
     elif insurer.lower() == "sura":
         try:
-            df_sura = pd.read_excel(SURA_PATHS["RENOVACIONES"])
-            df_sura = clean_sura(df_sura)
+            df_sura = load_frame(SURA_PATHS["RENOVACIONES"], 0, clean_sura)
             
             # Filter by date on FIN VIGENCIA
-            if "FIN VIGENCIA" in df_sura.columns:
-                mask = (df_sura["FIN VIGENCIA"] >= start_str) & (df_sura["FIN VIGENCIA"] <= end_str)
-                df_sura = df_sura[mask]
+            df_sura = filter_date_range(df_sura, "FIN VIGENCIA", start_str, end_str)
                 
-            results.extend(clean_data(df_sura))
+            df_sura = journal.overlay(df_sura, SURA_PATHS["RENOVACIONES"], "POLIZA")
+            frames.append(df_sura)
         except Exception as e:
             print(f"Error loading SURA: {e}")
 
     elif insurer.upper() == "AARCO_AXA":
         try:
-            df_aarco = pd.read_excel(AARCO_PATHS["RENOVACIONES"])
-            df_aarco = clean_aarco(df_aarco)
+            df_aarco = load_frame(AARCO_PATHS["RENOVACIONES"], 0, clean_aarco)
             
             # Filter by date on FIN VIGENCIA
-            if "FIN VIGENCIA" in df_aarco.columns:
-                mask = (df_aarco["FIN VIGENCIA"] >= start_str) & (df_aarco["FIN VIGENCIA"] <= end_str)
-                df_aarco = df_aarco[mask]
+            df_aarco = filter_date_range(df_aarco, "FIN VIGENCIA", start_str, end_str)
                 
-            results.extend(clean_data(df_aarco))
+            df_aarco = journal.overlay(df_aarco, AARCO_PATHS["RENOVACIONES"], "POLIZA")
+            frames.append(df_aarco)
         except Exception as e:
             print(f"Error loading AARCO: {e}")
 
-    return results
+    return page_records(frames, params)
+
+def field_updates(new_status: Optional[str], expediente: Optional[str], email: Optional[str]) -> dict:
+    # Only update the fields that were provided (allows partial updates)
+    updates = {}
+    if new_status is not None:
+        updates[policies.STATUS_COL] = new_status
+    if expediente is not None:
+        updates[policies.EXPEDIENTE_COL] = expediente
+    if email is not None:
+        updates[policies.EMAIL_COL] = email
+    return updates
 
 @router.post("/update")
-async def update_renewal_status(
+@blocking
+def update_renewal_status(
     insurer: str = Body(..., embed=True),
     type: str = Body(..., embed=True),
     policy_number: str | int = Body(..., embed=True),
@@ -359,134 +313,198 @@ async def update_renewal_status(
     """
     print(f"Received update request: Insurer={insurer}, Type={type}, Policy={policy_number}, Status={new_status}, Expediente={expediente}, Email={email}")
     
-    file_path = None
-    sheet_name = None
-    id_col = None
-    
-    if insurer.lower() == "metlife":
-        if type.upper() == "VIDA":
-            file_path = METLIFE_PATHS["RENOVACIONES_VIDA"]
-            sheet_name = SHEET_NAMES["RENOVACIONES_VIDA"]
-            id_col = "POLIZA_ACTUAL"
-        elif type.upper() == "GMM":
-            file_path = METLIFE_PATHS["RENOVACIONES_GMM"]
-            sheet_name = SHEET_NAMES["RENOVACIONES_GMM"]
-            id_col = "NPOLIZA"
-    elif insurer.lower() == "sura":
-        file_path = SURA_PATHS["RENOVACIONES"]
-        # Determine actual sheet name for SURA
-        try:
-            xl = pd.ExcelFile(file_path)
-            sheet_name = xl.sheet_names[0] # Use the first sheet
-            id_col = "POLIZA"
-        except Exception as e:
-            print(f"Error getting sheet name for SURA: {e}")
-            raise HTTPException(status_code=500, detail="Error accessing SURA file")
+    try:
+        target = policies.resolve_target(insurer, type)
+    except FileNotFoundError as e:
+        print(f"File not found: {e}")
+        raise HTTPException(status_code=404, detail="File not found")
+    except Exception as e:
+        print(f"Error accessing {insurer} file: {e}")
+        raise HTTPException(status_code=500, detail=f"Error accessing {insurer} file")
 
-    elif insurer.upper() == "AARCO_AXA":
-        file_path = AARCO_PATHS["RENOVACIONES"]
-        # Determine actual sheet name
-        try:
-            xl = pd.ExcelFile(file_path)
-            sheet_name = xl.sheet_names[0]
-            # Updated to new schema
-            id_col = "POLIZA"
-            
-        except Exception as e:
-             print(f"Error getting sheet name for AARCO: {e}")
-             raise HTTPException(status_code=500, detail="Error accessing AARCO file")
-             
-    if not file_path or not os.path.exists(file_path):
-        print(f"File not found: {file_path}")
+    if target is None:
         raise HTTPException(status_code=404, detail="File not found")
 
     try:
-        # Read the Excel file
-        print(f"Reading file: {file_path}, Sheet: {sheet_name}")
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
-        
-        # Ensure columns exist
-        if "ESTATUS_DE_RENOVACION" not in df.columns:
-            print("Adding ESTATUS_DE_RENOVACION column")
-            df["ESTATUS_DE_RENOVACION"] = None
-        
-        if "EXPEDIENTE" not in df.columns:
-            print("Adding EXPEDIENTE column")
-            df["EXPEDIENTE"] = None
-            
-        if "Email" not in df.columns:
-             # Try case insensitive match first?
-             if "EMAIL" in df.columns:
-                 df.rename(columns={"EMAIL": "Email"}, inplace=True)
-             else:
-                 print("Adding Email column")
-                 df["Email"] = None
-            
-        # Find and update the row
-        # Convert ID column to string for comparison to be safe
-        # Also clean the policy_number input
-        policy_str = str(policy_number).strip()
-        
-        # Create a temporary string column for matching
-        # Handle the column mapping for AARCO if needed
-        # If we didn't rename cols in df yet, we access by id_col
-        
-        if id_col not in df.columns and insurer.upper() == "AARCO_AXA":
-             # New schema uses "POLIZA"
-             if "POLIZA" in df.columns:
-                 id_col = "POLIZA"
-             # Try double space version if single space not found (legacy check)
-             elif "NUM POL  ACTUAL" in df.columns:
-                 id_col = "NUM POL  ACTUAL"
-                 
-        if id_col not in df.columns:
-             print(f"ID Column {id_col} not found in {df.columns.tolist()}")
-             raise HTTPException(status_code=500, detail=f"ID Column {id_col} not found")
+        match = policies.locate(target, policy_number)
+        if match is None:
+            print(f"Policy {policy_number} not found in {target.path} [{target.sheet_name}]")
+            raise HTTPException(status_code=404, detail=f"Policy {policy_number} not found")
+
+        updates = field_updates(new_status, expediente, email)
 
-        df['__id_str'] = df[id_col].astype(str).str.strip().str.replace('.0', '', regex=False)
-        policy_str_clean = policy_str.replace('.0', '')
-        
-        print(f"Searching for policy: {policy_str_clean} in column {id_col}")
-        
-        # Check if policy exists
-        if policy_str_clean not in df['__id_str'].values:
-             print(f"Policy {policy_str_clean} not found. Available IDs sample: {df['__id_str'].head().tolist()}")
-             raise HTTPException(status_code=404, detail=f"Policy {policy_number} not found")
-             
-        # Update status
-        mask = df['__id_str'] == policy_str_clean
-        
-        # Only update status if provided (allows partial updates)
-        if new_status is not None:
-             df.loc[mask, "ESTATUS_DE_RENOVACION"] = new_status
-        
-        # Update expediente if provided
-        if expediente is not None:
-             df.loc[mask, "EXPEDIENTE"] = expediente
-             
-        # Update email if provided
-        if email is not None:
-             df.loc[mask, "Email"] = email
-        
-        # Drop temp column
-        df = df.drop(columns=['__id_str'])
-        
-        # Save back to Excel
         print("Saving changes...")
-        with pd.ExcelWriter(file_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+        journal.record(match, updates)
             
         print("Update successful")
         return {"message": "Policy updated successfully"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error updating policy: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class RenewalUpdate(BaseModel):
+    insurer: str
+    type: str
+    policy_number: str | int
+    new_status: Optional[str] = None
+    expediente: Optional[str] = None
+    email: Optional[str] = None
+
+@router.post("/update-bulk")
+@blocking
+def update_renewal_status_bulk(items: List[RenewalUpdate]):
+    """
+    Apply many status/expediente/email updates at once.
+    Items are grouped by workbook and each workbook is saved once.
+    Returns one result per item, in request order. With the journal on,
+    items whose workbook couldn't be written yet (e.g. open in Excel) come
+    back with success=False and pending=True: they are kept and retried.
+    """
+    print(f"Received bulk update request: {len(items)} items")
+    results = [None] * len(items)
+    targets = {}
+    batches = {}  # workbook path -> (target, {policy: updates}, [item positions])
+
+    for i, item in enumerate(items):
+        result = {"insurer": item.insurer, "type": item.type, "policy_number": item.policy_number}
+        results[i] = result
+
+        key = (item.insurer.lower(), item.type.upper())
+        try:
+            if key not in targets:
+                targets[key] = policies.resolve_target(item.insurer, item.type)
+            target = targets[key]
+            if target is None:
+                raise FileNotFoundError(f"{item.insurer} {item.type}")
+            match = policies.locate(target, item.policy_number)
+        except FileNotFoundError:
+            targets[key] = None
+            result.update(success=False, detail="File not found")
+            continue
+        except Exception as e:
+            result.update(success=False, detail=str(e))
+            continue
+
+        if match is None:
+            result.update(success=False, detail=f"Policy {item.policy_number} not found")
+            continue
+
+        _, edits, positions = batches.setdefault(str(target.path), (target, {}, []))
+        # Later items for the same policy win, as if sent one by one
+        edits.setdefault(match.policy, {}).update(field_updates(item.new_status, item.expediente, item.email))
+        positions.append(i)
+
+    for path, (target, edits, positions) in batches.items():
+        try:
+            if journal.enabled():
+                # Journal first so the edits keep their order relative to
+                # single updates still pending, then apply them all in one save
+                journal.append(target, edits)
+                try:
+                    dropped = journal.flush(path)
+                except Exception as e:
+                    # Edits are durable in the journal; the writer retries
+                    print(f"Error flushing bulk update to {path}: {e}")
+                    for i in positions:
+                        results[i].update(success=False, pending=True, detail=f"Queued, not yet written to the workbook: {e}")
+                    continue
+                errors = {policy: error for (sheet, policy), error in dropped.items() if sheet == str(target.sheet_name)}
+            else:
+                errors = policies.write_batch(target, edits)
+        except Exception as e:
+            print(f"Error applying bulk update to {path}: {e}")
+            for i in positions:
+                results[i].update(success=False, detail=str(e))
+            continue
+
+        for i in positions:
+            policy = policies.normalize_policy(items[i].policy_number)
+            error = errors.get(policy)
+            results[i].update(success=error is None, detail=error or "Policy updated successfully")
+
+    return {"results": results}
+
 # Keep legacy endpoints for backward compatibility if needed, but redirecting logic
 @router.get("/vida")
-async def get_renovaciones_vida(days: int = 30):
-    return await get_upcoming_renewals(days=days, insurer="Metlife", type="VIDA")
+async def get_renovaciones_vida(request: Request, days: int = 30):
+    return await get_upcoming_renewals(
+        start_date=None, end_date=None, days=days, insurer="Metlife", type="VIDA",
+        params=ListParams(request, limit=None, offset=0, sort=None, fields=None, stream=False, format="records"),
+    )
+
+def find_recipient(insurer: str, type: str, policy_number, client_name: str):
+    """
+    Return (email, typed into the policy row?, policy match or None).
+    """
+    recipient_email = None
+    is_manual_email = False
+    match = None
+
+    try:
+        target = policies.resolve_target(insurer, type)
+        if target is not None:
+            match = policies.locate(target, policy_number)
+        if match is not None:
+            edits = journal.pending(target.path).get(match.policy)
+            recipient_email = policies.row_email(match, edits)
+            if recipient_email:
+                is_manual_email = True
+                print(f"Found overridden email in Excel: {recipient_email}")
+    except Exception as e:
+        print(f"Error looking up email in Excel: {e}")
+
+    # Fallback to general client list if not found in specific policy row
+    if not recipient_email:
+        recipient_email = get_client_email(client_name)
+
+    return recipient_email, is_manual_email, match
+
+def load_attachments(expediente: str) -> List[dict]:
+    """
+    Read the Expediente: a single file, or every file in a folder.
+    """
+    attachments = []
+    print(f"Processing Expediente path: {expediente}")
+    if os.path.exists(expediente):
+        if os.path.isdir(expediente):
+            print(f"Path is a directory: {expediente}")
+            # Is a directory, walk through it (non-recursive for now, or just top level files?)
+            # User said "all the files that are inside". I'll assume top-level files to avoid nested chaos.
+            try:
+                files = os.listdir(expediente)
+                print(f"Found {len(files)} files in directory")
+                for filename in files:
+                    file_path = os.path.join(expediente, filename)
+                    if os.path.isfile(file_path):
+                        # Skip hidden files
+                        if filename.startswith('.'):
+                            continue
+                        try:
+                            with open(file_path, "rb") as f:
+                                attachments.append({
+                                    "name": filename,
+                                    "content": f.read()
+                                })
+                        except Exception as e:
+                            print(f"Error reading file {filename}: {e}")
+            except Exception as e:
+                 print(f"Error reading directory {expediente}: {e}")
+
+        elif os.path.isfile(expediente):
+             # Is a file
+            try:
+                with open(expediente, "rb") as f:
+                    attachments.append({
+                        "name": os.path.basename(expediente),
+                        "content": f.read()
+                    })
+            except Exception as e:
+                print(f"Error reading file {expediente}: {e}")
+
+    return attachments
 
 @router.post("/send-email")
 async def send_renewal_email_endpoint(
@@ -504,83 +522,11 @@ async def send_renewal_email_endpoint(
     print(f"Sending email for: {client_name}, Policy: {policy_number}")
     
     # 1. Get Client Email
-    # Logic: 
-    # a. Check if "Email" column in the row (not passed here, but we can look it up while reading file?)
-    #    Actually better to pass it in from frontend if we trust frontend? 
-    #    No, reading from file is safer source of truth if we just saved it.
-    #    But to read it we need to open the file. We are already opening it to attach things? No.
-    #    Let's just use the `get_client_email` as fallback.
-    
-    # NEW LOGIC: Look up the specific policy row to see if there is an overridden email.
-    # This matches the Update logic to find the file/sheet/id
-    
-    recipient_email = None
-    is_manual_email = False
-    
-    # ... (Reuse file match logic)
-    file_path = None
-    sheet_name = None
-    id_col = None
-    
-    # ... Match file paths ... (reuse logic from update or extract to helper?)
-    # For brevity, I'll copy the locator logic, or better, Refactor later? 
-    # Let's copy-paste the locator block here for stability.
-    
-    if insurer.lower() == "metlife":
-        if type.upper() == "VIDA":
-            file_path = METLIFE_PATHS["RENOVACIONES_VIDA"]
-            sheet_name = SHEET_NAMES["RENOVACIONES_VIDA"]
-            id_col = "POLIZA_ACTUAL"
-        elif type.upper() == "GMM":
-            file_path = METLIFE_PATHS["RENOVACIONES_GMM"]
-            sheet_name = SHEET_NAMES["RENOVACIONES_GMM"]
-            id_col = "NPOLIZA"
-    elif insurer.lower() == "sura":
-        file_path = SURA_PATHS["RENOVACIONES"]
-        try:
-             xl = pd.ExcelFile(file_path)
-             sheet_name = xl.sheet_names[0]
-             id_col = "POLIZA"
-        except: pass
-    elif insurer.upper() == "AARCO_AXA":
-         file_path = AARCO_PATHS["RENOVACIONES"]
-         try:
-             xl = pd.ExcelFile(file_path)
-             sheet_name = xl.sheet_names[0]
-             id_col = "POLIZA"
-         except: pass
-
-    if file_path and os.path.exists(file_path):
-         try:
-             df = pd.read_excel(file_path, sheet_name=sheet_name)
-             policy_str = str(policy_number).strip()
-             
-             # Handle AARCO legacy/fallback
-             if id_col not in df.columns and insurer.upper() == "AARCO_AXA":
-                 if "NUM POL  ACTUAL" in df.columns: id_col = "NUM POL  ACTUAL"
-                 
-             if id_col in df.columns:
-                 df['__id_str'] = df[id_col].astype(str).str.strip().str.replace('.0', '', regex=False)
-                 policy_str_clean = policy_str.replace('.0', '')
-                 
-                 row = df[df['__id_str'] == policy_str_clean]
-                 if not row.empty:
-                     # Check Email column
-                     # Column might be "Email" or "EMAIL"
-                     email_col = "Email" if "Email" in df.columns else "EMAIL" if "EMAIL" in df.columns else None
-                     
-                     if email_col:
-                         val = row.iloc[0][email_col]
-                         if pd.notna(val) and str(val).strip() and "@" in str(val):
-                             recipient_email = str(val).strip()
-                             is_manual_email = True
-                             print(f"Found overridden email in Excel: {recipient_email}")
-         except Exception as e:
-             print(f"Error looking up email in Excel: {e}")
-
-    # Fallback to general client list if not found in specific policy row
-    if not recipient_email:
-        recipient_email = get_client_email(client_name)
+    # An email typed into the policy row overrides the client list. The same
+    # match is reused below to mark the row as sent.
+    recipient_email, is_manual_email, match = await io_pool.run(
+        find_recipient, insurer, type, policy_number, client_name
+    )
 
     if not recipient_email:
         raise HTTPException(status_code=404, detail=f"No existe correo para cliente {client_name}. Favor de editar el Email en la póliza o agregarlo en la base de clientes.")
@@ -597,62 +543,24 @@ async def send_renewal_email_endpoint(
     )
 
     # 3. Handle Attachments (Expediente)
-    # Expediente can be a folder path. If so, attach all files inside.
     attachments = []
-    
     if expediente:
         # Clean path: remove quotes if present, strip whitespace
         expediente = expediente.strip().strip("'").strip('"')
-        print(f"Processing Expediente path: {expediente}")
-        
-        if os.path.exists(expediente):
-            if os.path.isdir(expediente):
-                print(f"Path is a directory: {expediente}")
-                # Is a directory, walk through it (non-recursive for now, or just top level files?)
-                # User said "all the files that are inside". I'll assume top-level files to avoid nested chaos.
-                try:
-                    files = os.listdir(expediente)
-                    print(f"Found {len(files)} files in directory")
-                    for filename in files:
-                        file_path = os.path.join(expediente, filename)
-                        if os.path.isfile(file_path):
-                            # Skip hidden files
-                            if filename.startswith('.'):
-                                continue
-                            try:
-                                with open(file_path, "rb") as f:
-                                    attachments.append({
-                                        "name": filename,
-                                        "content": f.read()
-                                    })
-                            except Exception as e:
-                                print(f"Error reading file {filename}: {e}")
-                except Exception as e:
-                     print(f"Error reading directory {expediente}: {e}")
-
-            elif os.path.isfile(expediente):
-                 # Is a file
-                try:
-                    with open(expediente, "rb") as f:
-                        attachments.append({
-                            "name": os.path.basename(expediente),
-                            "content": f.read()
-                        })
-                except Exception as e:
-                    print(f"Error reading file {expediente}: {e}")
-        
-        elif expediente.startswith("http"):
-             body += f"\n\nLink al expediente: {expediente}"
+        if expediente.startswith("http") and not os.path.exists(expediente):
+            body += f"\n\nLink al expediente: {expediente}"
+        else:
+            attachments = await io_pool.run(load_attachments, expediente)
     
     # 4. Send Email
     try:
         recipients = [r.strip() for r in recipient_email.split(",") if r.strip()]
-        send_email_smtp(subject, body, recipients, attachments)
+        await smtp_pool.run(send_email_smtp, subject, body, recipients, attachments)
         
         if is_manual_email:
              try:
                  primary_email = recipients[0]
-                 upsert_client_internal(client_name, primary_email)
+                 await io_pool.run(upsert_client_internal, client_name, primary_email)
              except Exception as e:
                  print(f"Error auto-saving client: {e}")
                  
@@ -660,61 +568,13 @@ async def send_renewal_email_endpoint(
         print(f"SMTP Error: {e}")
         raise HTTPException(status_code=500, detail=f"Error al enviar correo: {str(e)}")
 
-    # 5. Update 'Email' column in source file to 'Enviado'
-    # Reuse update logic or copy-paste simplified version
+    # 5. Mark the policy as sent ('Enviado')
     try:
-        file_path = None
-        sheet_name = None
-        id_col = None
-        
-        if insurer.lower() == "metlife":
-            if type.upper() == "VIDA":
-                file_path = METLIFE_PATHS["RENOVACIONES_VIDA"]
-                sheet_name = SHEET_NAMES["RENOVACIONES_VIDA"]
-                id_col = "POLIZA_ACTUAL"
-            elif type.upper() == "GMM":
-                file_path = METLIFE_PATHS["RENOVACIONES_GMM"]
-                sheet_name = SHEET_NAMES["RENOVACIONES_GMM"]
-                id_col = "NPOLIZA"
-        elif insurer.lower() == "sura":
-            file_path = SURA_PATHS["RENOVACIONES"]
-            # Determine actual sheet name for SURA
-            if os.path.exists(file_path):
-                 xl = pd.ExcelFile(file_path)
-                 sheet_name = xl.sheet_names[0]
-            else:
-                 sheet_name = "Sheet1" # Fallback
-            id_col = "POLIZA"
-        elif insurer.upper() == "AARCO_AXA":
-            file_path = AARCO_PATHS["RENOVACIONES"]
-            if os.path.exists(file_path):
-                 xl = pd.ExcelFile(file_path)
-                 sheet_name = xl.sheet_names[0]
-            else:
-                 sheet_name = "Sheet1"
-            # Updated to new schema
-            id_col = "POLIZA"
-            
-        if file_path and os.path.exists(file_path):
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            
-            # Ensure ESTATUS_DE_RENOVACION exists
-            if "ESTATUS_DE_RENOVACION" not in df.columns:
-                df["ESTATUS_DE_RENOVACION"] = None
-            
-            policy_str = str(policy_number).strip()
-            df['__id_str'] = df[id_col].astype(str).str.strip().str.replace('.0', '', regex=False)
-            policy_str_clean = policy_str.replace('.0', '')
-            
-            mask = df['__id_str'] == policy_str_clean
-            if mask.any():
-                df.loc[mask, "ESTATUS_DE_RENOVACION"] = "Enviado"
-                # Do NOT update Email column as per user request
-                df = df.drop(columns=['__id_str'])
-                with pd.ExcelWriter(file_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
-            else:
-                print("Policy not found for updating Email status")
+        if match is not None:
+            # Do NOT update Email column as per user request
+            await io_pool.run(journal.record, match, {policies.STATUS_COL: "Enviado"})
+        else:
+            print("Policy not found for updating Email status")
 
     except Exception as e:
         print(f"Error updating Excel status: {e}")
@@ -739,16 +599,14 @@ def clean_aarco(df: pd.DataFrame) -> pd.DataFrame:
     date_cols = ["INICIO VIGENCIA", "FIN VIGENCIA"]
     for col in date_cols:
         if col in df.columns:
-            # First ensure it's datetime, falling back to string parsing if needed
-            df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
-            # Or use generic parser? pd.to_datetime usually smart enough used like this.
-            # If they are already datetime objects from Excel, this works.
+            # Usually already datetime objects from Excel; text is parsed too
+            df[col] = cleaning.dates(df[col])
             
     # 1. Money Conversion
     money_cols = ["PRIMA NETA ANUAL", "PRIMA TOTAL ANUAL"]
     for col in money_cols:
         if col in df.columns:
-            df[col] = df[col].apply(clean_money)
+            df[col] = cleaning.money(df[col])
 
     requested_cols = [
         "POLIZA", "ASEGURADORA", "PROMOTORIA", "AGENTE", "PROSPECTADOR", "RAMO", "PRODUCTO", 
@@ -0,0 +1,188 @@
+"""
+Typo-tolerant search over client names and policy numbers.
+
+Every source (cartera, renovaciones and the client list) gets its own
+trigram inverted index, built from the cached frame and memoized on it, so
+when one workbook changes only that source's segment is rebuilt. Text is
+accent-folded and upper-cased before indexing, so "juan perez" finds
+"JUAN  PÉREZ LOPEZ".
+
+A document matches when enough of the query's trigrams appear in it. The
+last query word is treated as a prefix ("JUA" finds "JUAN"), and results
+are ranked by that coverage, then by overall similarity.
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import METLIFE_PATHS, SURA_PATHS, AARCO_PATHS, SHEET_NAMES
+from services import metrics
+from services.cache import load_frame, memo
+
+DEFAULT_THRESHOLD = 0.5
+_NON_ALNUM = re.compile(r"[^0-9A-Z ]+")
+
+
+def fold(text) -> str:
+    """
+    Upper-case, strip accents and punctuation, collapse whitespace.
+    """
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return ""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).upper()
+    # Excel hands back policy numbers as floats
+    text = re.sub(r"(\d)\.0\b", r"\1", text)
+    return " ".join(_NON_ALNUM.sub(" ", text).split())
+
+
+def trigrams(text: str, prefix: bool = False) -> set:
+    """
+    Trigrams of each word, padded like pg_trgm ('  J', ' JU', ..., 'AN ').
+    With prefix=True the last word gets no end padding, so it matches any
+    word that starts with it.
+    """
+    grams = set()
+    words = text.split()
+    for i, word in enumerate(words):
+        padded = "  " + word
+        if not (prefix and i == len(words) - 1):
+            padded += " "
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+class Segment:
+    """
+    Trigram index over the documents of one source.
+    """
+
+    def __init__(self, docs: pd.DataFrame):
+        postings: Dict[str, List[int]] = {}
+        sizes = []
+        for i, text in enumerate(docs["text"]):
+            grams = trigrams(text)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.sizes = np.array(sizes, dtype=np.int32)
+        docs = docs.drop(columns="text")
+        self.records = docs.astype(object).where(docs.notna(), None).to_dict(orient="records")
+
+    def search(self, grams: set, threshold: float):
+        """
+        Return (doc positions, coverage of the query, Jaccard similarity)
+        for the documents sharing at least `threshold` of the query trigrams.
+        """
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty.astype(float), empty.astype(float)
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.records))
+        score = shared / len(grams)
+        hit = np.flatnonzero(score >= threshold)
+        similarity = shared[hit] / (len(grams) + self.sizes[hit] - shared[hit])
+        return hit, score[hit], similarity
+
+
+def _documents(frame: pd.DataFrame, source: dict) -> pd.DataFrame:
+    def column(name):
+        if name and name in frame.columns:
+            return frame[name].astype(object).where(frame[name].notna(), None)
+        return pd.Series(None, index=frame.index, dtype=object)
+
+    docs = pd.DataFrame({
+        "kind": source["kind"],
+        "insurer": source.get("insurer"),
+        "type": source.get("type"),
+        "name": column(source.get("name")),
+        "policy": column(source.get("policy")).map(lambda v: fold(v) or None),
+        "email": column(source.get("email")),
+    })
+    docs = docs.drop_duplicates(subset=["name", "policy"])
+    docs["text"] = [
+        " ".join(part for part in (fold(name), policy) if part)
+        for name, policy in zip(docs["name"], docs["policy"])
+    ]
+    return docs[docs["text"] != ""]
+
+
+def _sources() -> List[dict]:
+    # Imported here to avoid a cycle (renovaciones -> clientes -> search)
+    from services import cartera, clientes_store, renovaciones
+
+    def sheet(path, sheet_name, clean):
+        return lambda: load_frame(path, sheet_name, clean)
+
+    return [
+        {"kind": "cartera", "insurer": "Metlife", "type": "VIDA", "name": "Contratante", "policy": "Poliza",
+         "load": sheet(METLIFE_PATHS["CARTERA"], SHEET_NAMES["CARTERA_VIDA"], cartera.clean_metlife_vida)},
+        {"kind": "cartera", "insurer": "Metlife", "type": "GMM", "name": "Contratante", "policy": "Poliza actual",
+         "load": sheet(METLIFE_PATHS["CARTERA"], SHEET_NAMES["CARTERA_GMM"], cartera.clean_metlife_gmm)},
+        {"kind": "cartera", "insurer": "SURA", "type": "ALL", "name": None, "policy": "PÓLIZA",
+         "load": sheet(SURA_PATHS["CARTERA"], "SURA", cartera.clean_sura)},
+        {"kind": "renovacion", "insurer": "Metlife", "type": "VIDA", "name": "CONTRATANTE", "policy": "POLIZA_ACTUAL",
+         "load": sheet(METLIFE_PATHS["RENOVACIONES_VIDA"], SHEET_NAMES["RENOVACIONES_VIDA"], renovaciones.clean_vida)},
+        {"kind": "renovacion", "insurer": "Metlife", "type": "GMM", "name": "CONTRATANTE", "policy": "NPOLIZA",
+         "load": sheet(METLIFE_PATHS["RENOVACIONES_GMM"], SHEET_NAMES["RENOVACIONES_GMM"], renovaciones.clean_gmm)},
+        {"kind": "renovacion", "insurer": "SURA", "type": "ALL", "name": "NOMBRE", "policy": "POLIZA",
+         "load": sheet(SURA_PATHS["RENOVACIONES"], 0, renovaciones.clean_sura)},
+        {"kind": "renovacion", "insurer": "AARCO_AXA", "type": "ALL", "name": "CONTRATANTE", "policy": "POLIZA",
+         "load": sheet(AARCO_PATHS["RENOVACIONES"], 0, renovaciones.clean_aarco)},
+        {"kind": "cliente", "name": "nombre", "email": "correo", "load": clientes_store.list_clients},
+    ]
+
+
+def segment(source: dict) -> Optional[Segment]:
+    try:
+        frame = source["load"]()
+    except FileNotFoundError:
+        return None
+    # Rebuilt only when this source's cached frame is replaced
+    return memo(frame, ("search_segment", source["kind"], source.get("name"), source.get("policy")),
+                lambda: Segment(_documents(frame, source)))
+
+
+@metrics.span("search")
+def search(query: str, kinds: Optional[List[str]] = None, limit: int = 20,
+           threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """
+    Best matches for `query` across the sources of the given kinds
+    ('cartera', 'renovacion', 'cliente'; all by default).
+    """
+    grams = trigrams(fold(query), prefix=True)
+    if not grams:
+        return []
+
+    segments, positions, scores, similarities = [], [], [], []
+    for source in _sources():
+        if kinds and source["kind"] not in kinds:
+            continue
+        try:
+            seg = segment(source)
+        except Exception as e:
+            print(f"Error indexing {source['kind']} {source.get('insurer') or ''} for search: {e}")
+            continue
+        if seg is None:
+            continue
+        hit, score, similarity = seg.search(grams, threshold)
+        segments.extend([seg] * len(hit))
+        positions.append(hit)
+        scores.append(score)
+        similarities.append(similarity)
+
+    if not segments:
+        return []
+    positions = np.concatenate(positions)
+    scores = np.concatenate(scores)
+    # Best coverage first, then closest overall; ties keep source order
+    order = np.lexsort((-np.concatenate(similarities), -scores))[:limit]
+    return [
+        dict(segments[i].records[positions[i]], score=round(float(scores[i]), 3))
+        for i in order
+    ]
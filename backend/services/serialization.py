@@ -0,0 +1,136 @@
+import json
+from typing import List
+
+import numpy as np
+import pandas as pd
+from fastapi import Response
+
+from services import metrics
+
+
+def format_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return a shallow copy with datetime columns rendered as 'YYYY-MM-DD'.
+    Cleaned frames keep typed dates; they only become text on the way out.
+    """
+    date_cols = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
+    if not date_cols:
+        return df
+    df = df.copy(deep=False)
+    for col in date_cols:
+        values = df[col].to_numpy()
+        text = np.datetime_as_string(values, unit="D").astype(object)
+        text[np.isnat(values)] = None
+        df[col] = text
+    return df
+
+
+def to_records(df: pd.DataFrame) -> List[dict]:
+    """
+    Convert a DataFrame to a list of dicts, with NaN/NaT as None and dates
+    as ISO strings.
+    """
+    df = format_dates(df)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient="records")
+
+
+def _decimals(df: pd.DataFrame) -> int:
+    """
+    double_precision for to_json. pandas' encoder counts decimal places, not
+    significant digits, so 987654.32 printed with 10 decimals comes out as
+    987654.3199999999. Use as many decimals as the largest float in the
+    frame leaves within 15 significant digits, up to pandas' default of 10
+    and no fewer than 2, so amounts keep their cents next to a column of
+    very large numbers.
+    """
+    floats = df.select_dtypes("float")
+    if floats.empty:
+        return 10
+    values = np.abs(floats.to_numpy(dtype="float64"))
+    values = values[np.isfinite(values)]
+    if not values.size:
+        return 10
+    digits = max(int(np.log10(values.max())) + 1, 1) if values.max() > 0 else 1
+    return max(2, min(10, 15 - digits))
+
+
+def frame_json(df: pd.DataFrame, lines: bool = False) -> bytes:
+    """
+    Serialize a frame straight to JSON bytes with pandas' C encoder:
+    a records array, or one object per line when `lines` is set.
+    NaN/NaT become null and dates 'YYYY-MM-DD', as in to_records.
+    """
+    text = format_dates(df).to_json(
+        orient="records",
+        lines=lines,
+        force_ascii=False,
+        date_format="iso",
+        double_precision=_decimals(df),
+        default_handler=str,
+    )
+    if lines and text and not text.endswith("\n"):
+        text += "\n"
+    return text.encode("utf-8")
+
+
+class FrameJSONResponse(Response):
+    """
+    JSON response built from one or more DataFrames without going through
+    to_dict(orient="records") and FastAPI's per-value jsonable_encoder.
+    Several frames (e.g. Vida and GMM) are emitted as one flat array.
+    """
+
+    media_type = "application/json"
+
+    @metrics.span("serialize")
+    def render(self, content: List[pd.DataFrame]) -> bytes:
+        parts = [frame_json(df)[1:-1] for df in content if len(df)]
+        return b"[" + b",".join(parts) + b"]"
+
+
+def column_json(series: pd.Series) -> bytes:
+    """
+    Serialize one column as a JSON array, with the conventions of frame_json.
+    """
+    frame = series.to_frame()
+    values = format_dates(frame).iloc[:, 0]
+    text = values.to_json(
+        orient="values",
+        force_ascii=False,
+        date_format="iso",
+        double_precision=_decimals(frame),
+        default_handler=str,
+    )
+    return text.encode("utf-8")
+
+
+class FrameColumnsResponse(Response):
+    """
+    Column-oriented JSON: {"columns": [names], "data": [[values of each
+    column], ...]}, so each column name is sent once instead of once per
+    row. Several frames are stacked; a column missing from one of them is
+    null for its rows.
+    """
+
+    media_type = "application/json"
+
+    @metrics.span("serialize")
+    def render(self, content: List[pd.DataFrame]) -> bytes:
+        frames = [df for df in content if len(df)]
+        columns = []
+        for df in frames:
+            columns.extend(col for col in df.columns if col not in columns)
+
+        data = []
+        for col in columns:
+            parts = []
+            for df in frames:
+                if col in df.columns:
+                    parts.append(column_json(df[col])[1:-1])
+                else:
+                    parts.append(b",".join([b"null"] * len(df)))
+            data.append(b"[" + b",".join(parts) + b"]")
+
+        names = json.dumps([str(col) for col in columns], ensure_ascii=False).encode("utf-8")
+        return b'{"columns":' + names + b',"data":[' + b",".join(data) + b"]}"
@@ -0,0 +1,206 @@
+import datetime
+import hashlib
+import json
+import numbers
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from config import SIDECAR_DIR
+from services.ingest import IngestState
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Without pyarrow sidecars are disabled and every miss parses the xlsx
+    pa = pq = None
+
+METADATA_KEY = b"taiico_source"
+
+SERVICES_DIR = Path(__file__).resolve().parent
+
+
+def _code_fingerprint() -> str:
+    """
+    Hash of the backend service sources. Sidecars hold *cleaned* data, so a
+    change to any clean_* function must invalidate them.
+    """
+    digest = hashlib.sha1()
+    for source in sorted(SERVICES_DIR.glob("*.py")):
+        digest.update(source.name.encode())
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+CODE_FINGERPRINT = _code_fingerprint()
+
+
+def enabled() -> bool:
+    return pq is not None and SIDECAR_DIR is not None
+
+
+def sidecar_path(path: str, sheet_name, cleaner: str) -> Path:
+    name = hashlib.sha1(f"{path}|{sheet_name}|{cleaner}".encode()).hexdigest()[:20]
+    return SIDECAR_DIR / f"{name}.parquet"
+
+
+def _metadata(path: str, sheet_name, cleaner: str, version: tuple) -> dict:
+    return {
+        "path": path,
+        "sheet": sheet_name,
+        "cleaner": cleaner,
+        "version": list(version),
+        "code": CODE_FINGERPRINT,
+    }
+
+
+# Object columns mixing numbers, text and dates (normal in these workbooks)
+# have no Parquet type. They are stored as text with a one-letter tag per
+# value and the column names go in the "coerced" metadata entry.
+_DECODERS = {
+    "s": str,
+    "i": int,
+    "f": float,
+    "b": lambda text: text == "True",
+    "d": datetime.datetime.fromisoformat,
+    "D": datetime.date.fromisoformat,
+    "t": datetime.time.fromisoformat,
+    "n": lambda text: pd.NaT,
+}
+
+
+def _encode(value):
+    if value is None:
+        return None
+    if value is pd.NaT:
+        return "n"
+    if isinstance(value, (bool, np.bool_)):
+        return f"b{bool(value)}"
+    if isinstance(value, numbers.Integral):
+        return f"i{int(value)}"
+    if isinstance(value, numbers.Real):
+        return f"f{float(value)!r}"
+    if isinstance(value, datetime.datetime):
+        return f"d{value.isoformat()}"
+    if isinstance(value, datetime.date):
+        return f"D{value.isoformat()}"
+    if isinstance(value, datetime.time):
+        return f"t{value.isoformat()}"
+    return f"s{value}"
+
+
+def _decode(text):
+    # Missing values come back as NaN from pandas' string columns
+    if not isinstance(text, str):
+        return None
+    return _DECODERS[text[0]](text[1:])
+
+
+def _coerce_mixed(frame: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Return the frame with every object column Arrow can't type replaced by
+    its tagged text, and the names of those columns.
+    """
+    coerced = []
+    for name in frame.columns[frame.dtypes == object]:
+        try:
+            pa.array(frame[name], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            coerced.append(name)
+    if not coerced:
+        return frame, coerced
+    frame = frame.copy()
+    for name in coerced:
+        frame[name] = pd.Series([_encode(value) for value in frame[name]], index=frame.index, dtype=object)
+    return frame, [str(name) for name in coerced]
+
+
+def _restore_mixed(frame: pd.DataFrame, coerced: List[str]) -> pd.DataFrame:
+    for name in coerced:
+        frame[name] = pd.Series([_decode(text) for text in frame[name]], index=frame.index, dtype=object)
+    return frame
+
+
+def _stored(target: Path) -> Optional[dict]:
+    if not target.exists():
+        return None
+    # Only the footer is read to validate the sidecar
+    meta = pq.read_schema(target).metadata or {}
+    return json.loads(meta.get(METADATA_KEY, b"{}"))
+
+
+def read(path: str, sheet_name, cleaner: str, version: tuple) -> Optional[pd.DataFrame]:
+    """
+    Return the sidecar frame if it was built from this exact workbook version.
+    """
+    if not enabled():
+        return None
+    target = sidecar_path(path, sheet_name, cleaner)
+    try:
+        stored = _stored(target)
+        if stored is None:
+            return None
+        stored.pop("ingest", None)
+        coerced = stored.pop("coerced", [])
+        if stored != _metadata(path, sheet_name, cleaner, version):
+            return None
+        return _restore_mixed(pd.read_parquet(target), coerced)
+    except Exception as e:
+        print(f"Error reading sidecar {target}: {e}")
+        return None
+
+
+def read_previous(path: str, sheet_name, cleaner: str) -> Optional[Tuple[pd.DataFrame, IngestState]]:
+    """
+    Return (frame, ingest state) from the sidecar of an append-only sheet,
+    whatever workbook version it was built from, so a restart can resume
+    incremental ingest. None if there is no usable sidecar.
+    """
+    if not enabled():
+        return None
+    target = sidecar_path(path, sheet_name, cleaner)
+    try:
+        stored = _stored(target)
+        if stored is None:
+            return None
+        state = stored.pop("ingest", None)
+        coerced = stored.pop("coerced", [])
+        if state is None or stored != _metadata(path, sheet_name, cleaner, stored.get("version", [])):
+            return None
+        return _restore_mixed(pd.read_parquet(target), coerced), IngestState(**state)
+    except Exception as e:
+        print(f"Error reading sidecar {target}: {e}")
+        return None
+
+
+def write(path: str, sheet_name, cleaner: str, version: tuple, frame: pd.DataFrame,
+          state: Optional[IngestState] = None):
+    """
+    Persist a cleaned frame next to the others, with the ingest state of an
+    append-only sheet. Failures are logged and ignored; the workbook stays
+    the source of truth.
+    """
+    if not enabled():
+        return
+    target = sidecar_path(path, sheet_name, cleaner)
+    tmp = target.with_suffix(".tmp")
+    try:
+        SIDECAR_DIR.mkdir(parents=True, exist_ok=True)
+        frame, coerced = _coerce_mixed(frame)
+        table = pa.Table.from_pandas(frame)
+        meta = dict(table.schema.metadata or {})
+        stored = _metadata(path, sheet_name, cleaner, version)
+        if coerced:
+            stored["coerced"] = coerced
+        if state is not None:
+            stored["ingest"] = state._asdict()
+        meta[METADATA_KEY] = json.dumps(stored).encode()
+        pq.write_table(table.replace_schema_metadata(meta), tmp)
+        os.replace(tmp, target)
+    except Exception as e:
+        print(f"Could not write sidecar for {path} [{sheet_name}]: {e}")
+        if tmp.exists():
+            tmp.unlink()
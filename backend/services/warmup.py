@@ -0,0 +1,128 @@
+"""
+Parse every configured data source in the background at startup.
+
+The CRM is restarted daily, and the first user on each page used to wait for
+cold workbook parses. start() loads all workbooks in parallel (on threads of
+its own, so io_pool stays free for requests; cleaning runs in cpu_pool)
+into the workbook cache and the sidecars. Requests are
+served meanwhile: a request for a sheet that is still loading waits for that
+parse instead of starting its own, and anything not warmed yet loads on
+demand as before. status() reports per-source state and timing for '/'.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from config import (
+    METLIFE_PATHS, SURA_PATHS, AARCO_PATHS, CLIENT_EMAILS_PATH, USERS_DB, SHEET_NAMES, WARMUP,
+)
+from services import cartera, clientes_store, cobranza, renovaciones
+from services.cache import file_version, load_frames
+
+_lock = threading.Lock()
+_sources: Dict[str, dict] = {}
+_started = None
+
+
+def _workbook(path, sheets: dict) -> Callable:
+    return lambda: load_frames(path, sheets)
+
+
+def sources() -> List[Tuple[str, object, Callable]]:
+    """
+    (name, path, load) for every configured workbook and the client list.
+    """
+    return [
+        # Users first: logging in is the first thing anyone does
+        ("USERS", USERS_DB, _workbook(USERS_DB, {0: None})),
+        ("METLIFE_COBRANZA", METLIFE_PATHS["COBRANZA"], _workbook(METLIFE_PATHS["COBRANZA"], {
+            SHEET_NAMES["COBRANZA_VIDA"]: cobranza.clean_vida,
+            SHEET_NAMES["COBRANZA_GMM"]: cobranza.clean_gmm,
+        })),
+        ("METLIFE_CARTERA", METLIFE_PATHS["CARTERA"], _workbook(METLIFE_PATHS["CARTERA"], {
+            SHEET_NAMES["CARTERA_VIDA"]: cartera.clean_metlife_vida,
+            SHEET_NAMES["CARTERA_GMM"]: cartera.clean_metlife_gmm,
+        })),
+        ("METLIFE_RENOVACIONES_VIDA", METLIFE_PATHS["RENOVACIONES_VIDA"], _workbook(METLIFE_PATHS["RENOVACIONES_VIDA"], {
+            SHEET_NAMES["RENOVACIONES_VIDA"]: renovaciones.clean_vida,
+        })),
+        ("METLIFE_RENOVACIONES_GMM", METLIFE_PATHS["RENOVACIONES_GMM"], _workbook(METLIFE_PATHS["RENOVACIONES_GMM"], {
+            SHEET_NAMES["RENOVACIONES_GMM"]: renovaciones.clean_gmm,
+        })),
+        ("SURA_RENOVACIONES", SURA_PATHS["RENOVACIONES"], _workbook(SURA_PATHS["RENOVACIONES"], {
+            0: renovaciones.clean_sura,
+        })),
+        ("SURA_COBRANZA", SURA_PATHS["COBRANZA"], _workbook(SURA_PATHS["COBRANZA"], {
+            "Cobranza": cobranza.clean_sura_cobranza,
+        })),
+        ("SURA_CARTERA", SURA_PATHS["CARTERA"], _workbook(SURA_PATHS["CARTERA"], {
+            "SURA": cartera.clean_sura,
+        })),
+        ("AARCO_COBRANZA", AARCO_PATHS["COBRANZA"], _workbook(AARCO_PATHS["COBRANZA"], {
+            0: cobranza.clean_aarco,
+        })),
+        ("AARCO_RENOVACIONES", AARCO_PATHS["RENOVACIONES"], _workbook(AARCO_PATHS["RENOVACIONES"], {
+            0: renovaciones.clean_aarco,
+        })),
+        # The client list lives in SQLite; this runs the one-time import
+        ("CLIENTES", CLIENT_EMAILS_PATH, clientes_store.list_clients),
+    ]
+
+
+def _update(name: str, **changes):
+    # A new dict is swapped in under the lock, so status() never sees a
+    # source half-updated (e.g. done_at without seconds)
+    with _lock:
+        _sources[name] = {**_sources[name], **changes}
+
+
+def _load(name: str, path, load: Callable):
+    if name != "CLIENTES" and file_version(path) is None:
+        _update(name, state="missing", done_at=time.perf_counter())
+        return
+    _update(name, state="loading")
+    start = time.perf_counter()
+    try:
+        load()
+        result = {"state": "ready"}
+    except Exception as e:
+        print(f"Warm-up of {name} failed: {e}")
+        result = {"state": "error", "error": str(e)}
+    done_at = time.perf_counter()
+    _update(name, **result, done_at=done_at, seconds=round(done_at - start, 3))
+
+
+def start():
+    """
+    Queue every source for loading and return immediately.
+    """
+    global _started
+    if not WARMUP:
+        return
+    with _lock:
+        _started = time.perf_counter()
+        todo = sources()
+        for name, _, _ in todo:
+            _sources[name] = {"state": "pending"}
+    workers = ThreadPoolExecutor(len(todo), thread_name_prefix="warmup")
+    for name, path, load in todo:
+        workers.submit(_load, name, path, load)
+    # Threads exit once their source is loaded
+    workers.shutdown(wait=False)
+
+
+def status() -> dict:
+    """
+    {"ready": bool, "seconds": elapsed, "sources": {name: {state, seconds}}}.
+    Ready once every source is loaded, missing or failed.
+    """
+    with _lock:
+        if _started is None:
+            return {"ready": True, "enabled": False, "sources": {}}
+        sources = {name: dict(state) for name, state in _sources.items()}
+    done_at = [s.pop("done_at") for s in sources.values() if "done_at" in s]
+    ready = len(done_at) == len(sources)
+    end = max(done_at, default=_started) if ready else time.perf_counter()
+    return {"ready": ready, "enabled": True, "seconds": round(end - _started, 3), "sources": sources}
@@ -0,0 +1,271 @@
+"""
+Direct access to the parts of an xlsx package.
+
+openpyxl loads and saves every cell of a workbook, which for one status
+change in a renewal sheet of 20k rows takes seconds. The helpers here work
+on the package itself: ingest.py locates rows in the sheet XML, and
+SheetPatch rewrites single cells and leaves the rest of the file as it was.
+"""
+
+import math
+import numbers
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape, unescape
+
+REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+# Only the layout Excel and openpyxl write: unprefixed tags and cells with
+# r="" first (rows may carry their attributes in any order)
+_ROW = re.compile(rb"<row\b([^>]*)>")
+_R = re.compile(rb'\sr="(\d+)"')
+_ROW_END = b"</row>"
+_CELL = re.compile(rb'<c r="([A-Z]+)(\d+)"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_CELL_START = re.compile(rb"<c[\s/>]")
+_TYPE = re.compile(rb'\st="(\w+)"')
+_STYLE = re.compile(rb'\ss="\d+"')
+_V = re.compile(rb"<v>([^<]*)</v>")
+_T = re.compile(rb"<t(?:\s[^>]*)?>([^<]*)</t>")
+_PHONETIC = re.compile(rb"<rPh\b.*?</rPh>", re.S)
+_STRING = re.compile(rb"<si\b")
+# Characters XML 1.0 can't carry; openpyxl refuses them too
+_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+
+def relationships(package: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """
+    {id: (type, target part)} for a package part ("" for the package).
+    """
+    folder, name = posixpath.split(part)
+    root = ET.fromstring(package.read(posixpath.join(folder, "_rels", name + ".rels")))
+    result = {}
+    for rel in root:
+        target = rel.get("Target")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(folder, target))
+        result[rel.get("Id")] = (rel.get("Type").rsplit("/", 1)[-1], target)
+    return result
+
+
+def workbook_parts(package: zipfile.ZipFile) -> Tuple[str, List[Tuple[str, str]], Dict[str, Tuple[str, str]]]:
+    """
+    (workbook part, [(sheet name, worksheet part)] in order, the workbook's
+    relationships).
+    """
+    workbook = next(target for kind, target in relationships(package, "").values() if kind == "officeDocument")
+    related = relationships(package, workbook)
+    sheets = [
+        (element.get("name"), related[element.get(REL_ID)][1])
+        for element in ET.fromstring(package.read(workbook)).iter()
+        if element.tag.endswith("}sheet")
+    ]
+    return workbook, sheets, related
+
+
+def column_number(letters: str) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+def _text(raw: bytes) -> str:
+    return unescape(raw.decode("utf-8"), _ENTITIES)
+
+
+class Unsupported(ValueError):
+    """
+    The sheet is laid out in a way SheetPatch doesn't handle.
+    """
+
+
+class SheetPatch:
+    """
+    Cell edits to one worksheet of an xlsx, saved by rewriting only that
+    worksheet's XML. Values are written as inline strings, so the shared
+    strings table is left alone. Raises Unsupported for anything it can't
+    edit safely (prefixed tags, cells without references, formulas); the
+    caller then falls back to openpyxl.
+    """
+
+    def __init__(self, path, sheet_name):
+        self.path = path
+        self.package = zipfile.ZipFile(path)
+        try:
+            _, sheets, related = workbook_parts(self.package)
+            part = next((part for name, part in sheets if name == sheet_name), None)
+            if part is None:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            self.part = part
+            self.xml = self.package.read(part)
+            if b"<sheetData" not in self.xml:
+                raise Unsupported("sheetData is missing or prefixed")
+            parts = {kind: target for kind, target in related.values()}
+            self.strings = self.package.read(parts["sharedStrings"]) if "sharedStrings" in parts else b""
+        except Exception:
+            self.package.close()
+            raise
+        self._string_starts = None
+        self._row_starts = None
+        # Row number -> (start, end, open tag, {column: cell xml})
+        self._rows: Dict[int, tuple] = {}
+        self._edited = set()
+
+    def close(self):
+        self.package.close()
+
+    def _string(self, index: int) -> str:
+        if self._string_starts is None:
+            self._string_starts = [match.start() for match in _STRING.finditer(self.strings)]
+        start = self._string_starts[index]
+        end = self._string_starts[index + 1] if index + 1 < len(self._string_starts) else len(self.strings)
+        return "".join(_text(t) for t in _T.findall(_PHONETIC.sub(b"", self.strings[start:end])))
+
+    def _row(self, number: int) -> tuple:
+        if number in self._rows:
+            return self._rows[number]
+        if self._row_starts is None:
+            self._row_starts = {}
+            for match in _ROW.finditer(self.xml):
+                found = _R.search(match.group(1))
+                if found is not None:
+                    self._row_starts[int(found.group(1))] = match.start()
+        start = self._row_starts.get(number)
+        if start is None:
+            row = (None, None, None, {})
+        else:
+            tag_end = self.xml.index(b">", start) + 1
+            if self.xml[tag_end - 2:tag_end] == b"/>":
+                end, tag, content = tag_end, self.xml[start:tag_end - 2] + b">", b""
+            else:
+                end = self.xml.index(_ROW_END, tag_end) + len(_ROW_END)
+                tag, content = self.xml[start:tag_end], self.xml[tag_end:end - len(_ROW_END)]
+            cells = {}
+            for match in _CELL.finditer(content):
+                if int(match.group(2)) != number:
+                    raise Unsupported(f"cell {match.group(1).decode()}{match.group(2).decode()} in row {number}")
+                cells[match.group(1).decode()] = match
+            if len(cells) != len(_CELL_START.findall(content)):
+                raise Unsupported(f"cells without references in row {number}")
+            row = (start, end, tag, cells)
+        self._rows[number] = row
+        return row
+
+    def value(self, column: str, number: int) -> Optional[str]:
+        """
+        Text of a cell as Excel shows it unformatted: the string, or the
+        number as stored ('1000115', '0.15'). None for blank cells.
+        """
+        cell = self._row(number)[3].get(column)
+        if cell is None:
+            return None
+        if isinstance(cell, bytes):
+            raise Unsupported("reading an edited cell")
+        content = cell.group(4) or b""
+        kind = _TYPE.search(cell.group(3))
+        kind = kind.group(1) if kind else b"n"
+        if kind == b"inlineStr":
+            return "".join(_text(t) for t in _T.findall(_PHONETIC.sub(b"", content)))
+        value = _V.search(content)
+        if value is None:
+            return None
+        if kind == b"s":
+            return self._string(int(value.group(1)))
+        return _text(value.group(1))
+
+    def header(self) -> Dict[str, str]:
+        """
+        {row 1 text: column letters}; the first column wins for repeated names.
+        """
+        columns = {}
+        for column in sorted(self._row(1)[3], key=column_number):
+            text = self.value(column, 1)
+            if text is not None and text not in columns:
+                columns[text] = column
+        return columns
+
+    def set(self, column: str, number: int, value):
+        """
+        Set one cell, keeping its style. Strings are written as inline
+        strings, numbers as numbers and None as a blank cell.
+        """
+        start, _, _, cells = self._row(number)
+        if start is None:
+            raise Unsupported(f"row {number} is not in the sheet")
+        old = cells.get(column)
+        style = b""
+        if old is not None:
+            if isinstance(old, bytes):
+                attributes, content = old, b""
+            else:
+                attributes, content = old.group(3), old.group(4) or b""
+            if b"<f" in content:
+                # Excel's calcChain would still point at the formula
+                raise Unsupported(f"formula in {column}{number}")
+            found = _STYLE.search(attributes)
+            style = found.group(0) if found else b""
+        ref = f"{column}{number}".encode()
+        if isinstance(value, numbers.Real) and not isinstance(value, bool) and not math.isfinite(value):
+            value = None
+        if value is None:
+            cell = b'<c r="%s"%s/>' % (ref, style)
+        elif isinstance(value, numbers.Real) and not isinstance(value, bool):
+            number_text = str(int(value)) if isinstance(value, numbers.Integral) else repr(float(value))
+            cell = b'<c r="%s"%s><v>%s</v></c>' % (ref, style, number_text.encode())
+        else:
+            text = str(value)
+            if _ILLEGAL.search(text):
+                raise Unsupported(f"characters XML can't hold in {column}{number}")
+            cell = b'<c r="%s"%s t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % (
+                ref, style, escape(text).encode("utf-8"))
+        # Edited cells are kept as their new XML; the match attributes are
+        # only needed for the style, which is now part of it
+        cells[column] = cell
+        self._edited.add(number)
+
+    def _render(self, number: int) -> bytes:
+        _, _, tag, cells = self._rows[number]
+        parts = []
+        for column in sorted(cells, key=column_number):
+            cell = cells[column]
+            parts.append(cell if isinstance(cell, bytes) else cell.group(0))
+        return tag + b"".join(parts) + _ROW_END
+
+    def save(self):
+        """
+        Write the edits through a temp file renamed over the original, so
+        readers never see a half-written file. Closes the package.
+        """
+        pieces, position = [], 0
+        for number in sorted(self._edited, key=lambda number: self._rows[number][0]):
+            start, end = self._rows[number][:2]
+            pieces += [self.xml[position:start], self._render(number)]
+            position = end
+        pieces.append(self.xml[position:])
+        xml = b"".join(pieces)
+
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(suffix=".xlsx", dir=folder)
+        os.close(fd)
+        try:
+            try:
+                with zipfile.ZipFile(tmp, "w") as copy:
+                    for info in self.package.infolist():
+                        copy.writestr(info, xml if info.filename == self.part else self.package.read(info))
+            finally:
+                self.package.close()
+            shutil.copymode(self.path, tmp)
+            os.replace(tmp, self.path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
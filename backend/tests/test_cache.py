@@ -0,0 +1,37 @@
+import gc
+import threading
+
+import pandas as pd
+
+from services import cache
+
+
+def test_memo_builds_once_per_frame():
+    frame = pd.DataFrame({"a": [1, 2]})
+    calls = []
+    for _ in range(3):
+        assert cache.memo(frame, "total", lambda: calls.append(1) or frame["a"].sum()) == 3
+    assert len(calls) == 1
+    assert cache.memo(frame.copy(), "total", lambda: "rebuilt") == "rebuilt"
+
+
+def test_collecting_a_frame_under_the_memo_lock_does_not_deadlock():
+    frame = pd.DataFrame({"a": [1]})
+    cache.memo(frame, "value", lambda: "derived")
+    key = id(frame)
+
+    def collect_while_locked():
+        # What a GC pass triggered by an allocation inside memo() does
+        nonlocal frame
+        with cache._derived_lock:
+            del frame
+            gc.collect()
+
+    worker = threading.Thread(target=collect_while_locked, daemon=True)
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+
+    # The slot is dropped on the next memo call
+    cache.memo(pd.DataFrame(), "other", lambda: None)
+    assert key not in cache._derived or cache._derived[key][0]() is not None
@@ -0,0 +1,24 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from services import cleaning
+
+
+def test_money_mixed_datetimes_text_and_numbers():
+    # A stray date or time cell used to make the text assignment hit a
+    # read-only array under pandas 3
+    series = pd.Series(
+        [1.5, datetime.datetime(2024, 1, 1), "$1,200.50", None, datetime.time(3, 0), "n/a", 7],
+        dtype=object,
+    )
+    result = cleaning.money(series)
+    expected = [1.5, np.nan, 1200.5, np.nan, np.nan, np.nan, 7.0]
+    np.testing.assert_array_equal(result.to_numpy(), expected)
+    assert result.dtype == "float64"
+
+
+def test_money_datetimes_without_text():
+    series = pd.Series([10, datetime.datetime(2024, 1, 1), None], dtype=object)
+    np.testing.assert_array_equal(cleaning.money(series).to_numpy(), [10.0, np.nan, np.nan])
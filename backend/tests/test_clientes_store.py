@@ -0,0 +1,94 @@
+import os
+
+import pandas as pd
+import pytest
+
+from services import clientes_store as store
+
+
+@pytest.fixture(autouse=True)
+def workbook(tmp_path, monkeypatch):
+    path = tmp_path / "Clientes Correos Taiico.xlsx"
+    monkeypatch.setattr(store, "CLIENT_EMAILS_PATH", path)
+    monkeypatch.setattr(store, "CLIENTS_DB_PATH", tmp_path / "clientes.sqlite3")
+    monkeypatch.setattr(store, "CLIENTS_EXPORT_SECONDS", 0)
+    _restart(monkeypatch)
+    _save(path, [("Ana", "ana@example.com", 5512345678), ("Beto", None, None)])
+    yield path
+    if store._conn is not None:
+        store._conn.close()
+
+
+def _restart(monkeypatch):
+    if store._conn is not None:
+        store._conn.close()
+    for name, value in [("_conn", None), ("_workbook_seen", None), ("_version", 0),
+                        ("_exported_version", 0), ("_frame", (None, None))]:
+        monkeypatch.setattr(store, name, value)
+
+
+def _save(path, rows):
+    # What the office does in Excel; the mtime is bumped so the change is
+    # seen even within the file system's timestamp resolution
+    before = path.stat().st_mtime_ns if path.exists() else 0
+    pd.DataFrame(rows, columns=["Clientes", "Mail", "Telefono"]).to_excel(path, index=False)
+    os.utime(path, ns=(before + 10**9, before + 10**9))
+
+
+def _clients():
+    rows = store.list_clients().itertuples(index=False)
+    return [tuple(None if pd.isna(value) else value for value in row) for row in rows]
+
+
+def _logged():
+    with store._lock:
+        return store._conn.execute("SELECT op FROM changes ORDER BY id").fetchall()
+
+
+def test_first_open_imports_the_workbook():
+    assert _clients() == [("Ana", "ana@example.com", "5512345678"), ("Beto", None, None)]
+    assert store.find_email("  ana ") == "ana@example.com"
+
+
+def test_office_edits_are_reimported(workbook):
+    _clients()
+    token, _ = store.version()
+    _save(workbook, [("Ana", "ana@nuevo.com", None), ("Carla", "carla@example.com", None)])
+    assert _clients() == [("Ana", "ana@nuevo.com", None), ("Carla", "carla@example.com", None)]
+    assert store.version()[0] != token
+
+
+def test_changes_made_here_are_replayed_on_office_edits(workbook):
+    store.add("Diego", "diego@example.com", None)
+    store.upsert_email("beto", "beto@example.com")
+    _save(workbook, [("Ana", "ana@example.com", None), ("Beto", None, None), ("Carla", None, None)])
+
+    assert _clients() == [
+        ("Ana", "ana@example.com", None),
+        ("Beto", "beto@example.com", None),
+        ("Carla", None, None),
+        ("Diego", "diego@example.com", None),
+    ]
+    assert len(_logged()) == 2
+
+
+def test_export_merges_and_clears_the_log(workbook):
+    store.update("Ana", "Ana María", "ana@example.com", None)
+    _save(workbook, [("Ana", "ana@example.com", None), ("Beto", None, None), ("Carla", None, None)])
+    store.export_workbook()
+
+    assert _logged() == []
+    assert store._workbook_seen == store.file_version(workbook)
+    written = pd.read_excel(workbook)
+    assert written["Clientes"].tolist() == ["Ana María", "Beto", "Carla"]
+    # The file just written is not taken for an office edit
+    version = store._version
+    _clients()
+    assert store._version == version
+
+
+def test_logged_changes_survive_a_restart(workbook, monkeypatch):
+    store.delete("Beto")
+    _restart(monkeypatch)
+    _save(workbook, [("Ana", "ana@example.com", None), ("Beto", None, None), ("Elena", None, None)])
+    assert [name for name, _, _ in _clients()] == ["Ana", "Elena"]
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from services.dateindex import DateIndex, filter_date_range, parse_date
+
+
+def _frame(dates):
+    return pd.DataFrame({"Fecha": pd.to_datetime(dates), "n": range(len(dates))})
+
+
+def test_between_returns_rows_in_sheet_order():
+    df = _frame(["2024-03-01", "2024-01-15", None, "2024-02-01", "2024-01-15", "2023-12-31"])
+    index = DateIndex(df["Fecha"])
+    assert not index.in_row_order
+    np.testing.assert_array_equal(index.between("2024-01-15", "2024-02-29"), [1, 3, 4])
+    np.testing.assert_array_equal(index.between("2025-01-01", "2025-12-31"), [])
+
+
+def test_sheets_in_date_order_are_sliced():
+    df = _frame(["2024-01-01", None, "2024-01-01", "2024-02-01", "2024-03-01"])
+    index = DateIndex(df["Fecha"])
+    assert index.in_row_order
+    np.testing.assert_array_equal(index.between("2024-01-01", "2024-02-15"), [0, 2, 3])
+
+
+def test_filter_matches_a_boolean_mask():
+    rng = np.random.default_rng(0)
+    dates = pd.Series(pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, 500), unit="D"))
+    df = pd.DataFrame({"Fecha": dates.where(rng.random(500) > 0.1)})
+    start, end = pd.Timestamp("2024-03-10"), pd.Timestamp("2024-07-04")
+    expected = df[(df["Fecha"] >= start) & (df["Fecha"] <= end)]
+    pd.testing.assert_frame_equal(filter_date_range(df, "Fecha", start, end), expected)
+
+
+def test_parse_date():
+    assert parse_date("", "start_date") is None
+    assert parse_date("2024-05-01", "start_date") == pd.Timestamp("2024-05-01")
+    with pytest.raises(HTTPException) as raised:
+        parse_date("01/05/2024x", "end_date")
+    assert raised.value.status_code == 400
@@ -0,0 +1,122 @@
+import datetime
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from services import cache, executor, ingest, sidecar
+
+SHEET = "Cobranza"
+HEADER = ["Póliza", "Fecha", "Importe", "Concepto"]
+
+
+@ingest.append_only
+def clean_cobranza(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["Importe"] = pd.to_numeric(df["Importe"], errors="coerce")
+    return df
+
+
+def _rows(start, count):
+    return [[1000 + i, datetime.datetime(2024, 1, 1) + datetime.timedelta(days=i), 100.5 + i, f"Recibo {i}"]
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = SHEET
+    ws.append(HEADER)
+    for row in _rows(0, 20):
+        ws.append(row)
+    wb.create_sheet("Notas").append(["sin datos"])
+    path = tmp_path / "cobranza.xlsx"
+    wb.save(path)
+    return path
+
+
+def _edit(path, change):
+    wb = load_workbook(path)
+    change(wb[SHEET])
+    wb.save(path)
+
+
+def _append(path, start, count):
+    def change(ws):
+        for row in _rows(start, count):
+            ws.append(row)
+    _edit(path, change)
+
+
+def _split(path, state):
+    return ingest.split(path.read_bytes(), {SHEET: state})
+
+
+def test_first_read_is_full_and_tracks_the_sheet(workbook):
+    trimmed, results = _split(workbook, None)
+    appended, state = results[SHEET]
+    assert trimmed is None and not appended
+    assert state.rows == 21
+
+
+def test_appended_rows_are_parsed_alone(workbook):
+    _, results = _split(workbook, None)
+    _append(workbook, 20, 3)
+
+    trimmed, results = _split(workbook, results[SHEET][1])
+    appended, state = results[SHEET]
+    assert appended and state.rows == 24
+    tail = pd.read_excel(io.BytesIO(trimmed), sheet_name=SHEET)
+    assert tail.columns.tolist() == HEADER
+    assert tail["Póliza"].tolist() == [1020, 1021, 1022]
+
+
+def test_unchanged_sheet_has_no_new_rows(workbook):
+    _, results = _split(workbook, None)
+    trimmed, again = _split(workbook, results[SHEET][1])
+    assert again[SHEET] == (True, results[SHEET][1])
+    assert pd.read_excel(io.BytesIO(trimmed), sheet_name=SHEET).empty
+
+
+def _restyle(ws):
+    # A date shown as a number reads back as a different value
+    ws.cell(row=8, column=2).number_format = "0.00"
+
+
+@pytest.mark.parametrize("change", [
+    lambda ws: ws.cell(row=5, column=3, value=999.0),
+    lambda ws: ws.delete_rows(3),
+    lambda ws: ws.cell(row=1, column=4, value="Descripción"),
+    _restyle,
+], ids=["edited", "deleted", "header", "restyled"])
+def test_changes_above_the_ingested_rows_need_a_full_parse(workbook, change):
+    _, results = _split(workbook, None)
+    _edit(workbook, change)
+    _append(workbook, 20, 2)
+    _, results = _split(workbook, results[SHEET][1])
+    appended, state = results[SHEET]
+    assert not appended and state is not None
+
+
+def test_cache_appends_to_the_frame_cleaned_before(workbook, monkeypatch):
+    monkeypatch.setattr(executor, "CPU_WORKERS", 0)
+    monkeypatch.setattr(sidecar, "SIDECAR_DIR", None)
+    combined = []
+    combine = ingest.combine
+    monkeypatch.setattr(ingest, "combine", lambda head, tail: combined.append(len(tail)) or combine(head, tail))
+    workbook_cache = cache.WorkbookCache(1 << 30)
+
+    def check():
+        got = workbook_cache.load(workbook, SHEET, clean_cobranza)
+        full = clean_cobranza(pd.read_excel(workbook, sheet_name=SHEET))
+        pd.testing.assert_frame_equal(got, full)
+
+    check()
+    _append(workbook, 20, 5)
+    check()
+    assert combined == [5]
+    _edit(workbook, lambda ws: ws.cell(row=2, column=4, value="Editado"))
+    check()
+    assert combined == [5]
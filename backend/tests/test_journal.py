@@ -0,0 +1,123 @@
+import pytest
+
+from services import journal, policies
+
+PATH = "/data/Metlife Vida.xlsx"
+
+
+class _Writer:
+    notified = {}
+
+    def __init__(self, path):
+        self.path = path
+
+    def notify(self, pending):
+        _Writer.notified[self.path] = pending
+
+
+@pytest.fixture(autouse=True)
+def journal_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, "JOURNAL_PATH", tmp_path / "journal.sqlite3")
+    monkeypatch.setattr(journal, "_conn", None)
+    monkeypatch.setattr(journal, "_writers", {})
+    monkeypatch.setattr(journal, "_Writer", _Writer)
+    _Writer.notified = {}
+    yield
+    if journal._conn is not None:
+        journal._conn.close()
+
+
+@pytest.fixture
+def workbook(monkeypatch):
+    # {(sheet, policy): {column: value}} as written, plus what to fail with
+    sheets = {"written": {}, "raise": {}, "missing": set()}
+
+    def write_batch(target, edits):
+        error = sheets["raise"].get(target.sheet_name)
+        if error is not None:
+            raise error
+        results = {}
+        for policy, updates in edits.items():
+            if policy in sheets["missing"]:
+                results[policy] = f"Policy {policy} not found"
+            else:
+                sheets["written"].setdefault((target.sheet_name, policy), {}).update(updates)
+                results[policy] = None
+        return results
+
+    monkeypatch.setattr(policies, "write_batch", write_batch)
+    return sheets
+
+
+def _target(sheet="Vida"):
+    return policies.RenewalTarget("Metlife", "VIDA", PATH, sheet, "POLIZA_ACTUAL")
+
+
+def _failed():
+    with journal._conn_lock:
+        return journal._db().execute("SELECT sheet, policy, field, value, error FROM failed_edits ORDER BY id").fetchall()
+
+
+def test_pending_edits_coalesce_and_flush(workbook):
+    journal.append(_target(), {"1001": {"ESTATUS_DE_RENOVACION": "PENDIENTE", "EXPEDIENTE": "E1"}})
+    journal.append(_target(), {"1001": {"ESTATUS_DE_RENOVACION": "RENOVADA"}})
+    assert journal.pending(PATH) == {"1001": {"ESTATUS_DE_RENOVACION": "RENOVADA", "EXPEDIENTE": "E1"}}
+    token, _ = journal.version(PATH)
+
+    assert journal.flush(PATH) == {}
+    assert workbook["written"] == {("Vida", "1001"): {"ESTATUS_DE_RENOVACION": "RENOVADA", "EXPEDIENTE": "E1"}}
+    assert journal.pending(PATH) == {}
+    assert journal.version(PATH)[0] != token
+
+
+def test_transient_errors_keep_the_edits(workbook):
+    journal.append(_target(), {"1001": {"EXPEDIENTE": "E1"}})
+    workbook["raise"]["Vida"] = PermissionError("locked by Excel")
+    with pytest.raises(PermissionError):
+        journal.flush(PATH)
+    assert journal.pending(PATH) == {"1001": {"EXPEDIENTE": "E1"}}
+
+    del workbook["raise"]["Vida"]
+    journal.flush(PATH)
+    assert journal.pending(PATH) == {}
+    assert _failed() == []
+
+
+def test_permanent_errors_move_edits_aside(workbook):
+    journal.append(_target("Vida"), {"1001": {"EXPEDIENTE": "E1"}, "1002": {"EXPEDIENTE": "E2"}})
+    journal.append(_target("Renombrada"), {"1003": {"EXPEDIENTE": "E3"}})
+    workbook["missing"].add("1002")
+    workbook["raise"]["Renombrada"] = KeyError("Worksheet Renombrada does not exist.")
+
+    errors = journal.flush(PATH)
+    assert set(errors) == {("Vida", "1002"), ("Renombrada", "1003")}
+    assert errors[("Vida", "1002")] == "Policy 1002 not found"
+    assert workbook["written"] == {("Vida", "1001"): {"EXPEDIENTE": "E1"}}
+    assert journal.pending(PATH) == {}
+    assert [row[:4] for row in _failed()] == [("Vida", "1002", "EXPEDIENTE", "E2"), ("Renombrada", "1003", "EXPEDIENTE", "E3")]
+
+
+def test_a_transient_sheet_does_not_hold_up_the_others(workbook):
+    journal.append(_target("Vida"), {"1001": {"EXPEDIENTE": "E1"}})
+    journal.append(_target("GMM"), {"2001": {"EXPEDIENTE": "G1"}})
+    workbook["raise"]["GMM"] = OSError("being saved")
+    with pytest.raises(OSError):
+        journal.flush(PATH)
+    assert workbook["written"] == {("Vida", "1001"): {"EXPEDIENTE": "E1"}}
+    assert journal.pending(PATH) == {"2001": {"EXPEDIENTE": "G1"}}
+
+
+def test_resume_starts_writers_for_edits_left_by_a_previous_run(workbook, monkeypatch):
+    journal.append(_target(), {"1001": {"EXPEDIENTE": "E1"}})
+    other = policies.RenewalTarget("SURA", "VIDA", "/data/SURA.xlsx", "Hoja1", "POLIZA")
+    journal.append(other, {"3001": {"EXPEDIENTE": "S1"}})
+    journal.flush(other.path)
+
+    # A restart: new connection, no writers
+    journal._conn.close()
+    monkeypatch.setattr(journal, "_conn", None)
+    monkeypatch.setattr(journal, "_writers", {})
+    _Writer.notified = {}
+    journal.resume()
+    assert _Writer.notified == {PATH: journal.JOURNAL_FLUSH_EDITS}
+    assert journal.pending(PATH) == {"1001": {"EXPEDIENTE": "E1"}}
@@ -0,0 +1,19 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from services.serialization import column_json, frame_json
+
+MONEY = [249688.31, 987654.32, 5000000.01, 0.15, np.nan]
+
+
+def test_money_is_serialized_without_float_noise():
+    body = frame_json(pd.DataFrame({"Importe": MONEY, "Póliza": list("abcde")}))
+    assert body.decode().count("249688.31,") == 1
+    assert [row["Importe"] for row in json.loads(body)] == [249688.31, 987654.32, 5000000.01, 0.15, None]
+    assert b"99999" not in body
+
+
+def test_columns_use_the_same_precision():
+    assert column_json(pd.Series(MONEY)) == b"[249688.31,987654.32,5000000.01,0.15,null]"
@@ -0,0 +1,61 @@
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from services import sidecar
+from services.ingest import IngestState
+
+PATH = "/data/SURA base cobranza.xlsx"
+VERSION = (1, 2)
+
+
+@pytest.fixture(autouse=True)
+def sidecar_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_DIR", tmp_path)
+    return tmp_path
+
+
+def _mixed_frame():
+    return pd.DataFrame({
+        "Póliza": ["A1", "A2", "A3", "A4", "A5"],
+        "Comisión de derecho": pd.Series([120, "$306.32", None, 47.5, np.nan], dtype=object),
+        "Fecha": pd.Series(
+            [datetime.datetime(2024, 1, 2), "sin fecha", datetime.time(3, 0), True, pd.NaT], dtype=object),
+        "Importe": [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+
+
+def test_mixed_int_and_str_column_round_trips():
+    frame = _mixed_frame()
+    sidecar.write(PATH, "Cobranza", "clean", VERSION, frame)
+
+    target = sidecar.sidecar_path(PATH, "Cobranza", "clean")
+    stored = json.loads(pq.read_schema(target).metadata[sidecar.METADATA_KEY])
+    assert stored["coerced"] == ["Comisión de derecho", "Fecha"]
+
+    result = sidecar.read(PATH, "Cobranza", "clean", VERSION)
+    pd.testing.assert_frame_equal(result, frame)
+    assert [type(value) for value in result["Comisión de derecho"][:2]] == [int, str]
+
+
+def test_mixed_columns_keep_the_ingest_state():
+    frame = _mixed_frame()
+    state = IngestState(rows=6, strings=10, fingerprint="abc")
+    sidecar.write(PATH, "Cobranza", "clean", VERSION, frame, state)
+
+    result, stored_state = sidecar.read_previous(PATH, "Cobranza", "clean")
+    pd.testing.assert_frame_equal(result, frame)
+    assert stored_state == state
+
+
+def test_typed_frames_are_not_coerced():
+    frame = _mixed_frame().drop(columns=["Comisión de derecho", "Fecha"])
+    sidecar.write(PATH, "Cobranza", "clean", VERSION, frame)
+
+    stored = json.loads(pq.read_schema(sidecar.sidecar_path(PATH, "Cobranza", "clean")).metadata[sidecar.METADATA_KEY])
+    assert "coerced" not in stored
+    pd.testing.assert_frame_equal(sidecar.read(PATH, "Cobranza", "clean", VERSION), frame)
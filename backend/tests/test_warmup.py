@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from services import warmup
+
+
+@pytest.fixture(autouse=True)
+def started(monkeypatch):
+    monkeypatch.setattr(warmup, "_sources", {})
+    monkeypatch.setattr(warmup, "WARMUP", True)
+    monkeypatch.setattr(warmup, "file_version", lambda path: None if path == "missing.xlsx" else (1, 1))
+
+
+def _wait_for(condition) -> dict:
+    for _ in range(500):
+        status = warmup.status()
+        if condition(status):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"Warm-up never got there: {status}")
+
+
+def test_status_reports_each_source(monkeypatch):
+    release = threading.Event()
+
+    def failing():
+        raise OSError("locked")
+
+    monkeypatch.setattr(warmup, "sources", lambda: [
+        ("SLOW", "slow.xlsx", release.wait),
+        ("BROKEN", "broken.xlsx", failing),
+        ("GONE", "missing.xlsx", lambda: None),
+    ])
+    warmup.start()
+    status = _wait_for(lambda status: status["sources"]["SLOW"]["state"] == "loading"
+                       and all(status["sources"][name]["state"] != "pending" for name in ("BROKEN", "GONE")))
+    assert not status["ready"]
+    assert status["sources"]["BROKEN"]["state"] == "error"
+    assert status["sources"]["BROKEN"]["error"] == "locked"
+    assert status["sources"]["GONE"] == {"state": "missing"}
+
+    release.set()
+    status = _wait_for(lambda status: status["ready"])
+    assert status["sources"]["SLOW"]["state"] == "ready"
+    assert status["sources"]["SLOW"]["seconds"] >= 0
@@ -0,0 +1,190 @@
+import re
+import zipfile
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from services import cache, policies, sidecar, xlsx
+
+SHEET = "Renovaciones"
+SHEET_PART = "xl/worksheets/sheet1.xml"
+HEADER = ["POLIZA", "NOMBRE", "ESTATUS_DE_RENOVACION", "EXPEDIENTE", "Email"]
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_DIR", None)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = SHEET
+    ws.append(HEADER)
+    ws.append([1001, "Ana & Luis", "PENDIENTE", None, "ana@example.com"])
+    ws.append([1002, "Beatriz", None, None, None])
+    ws.append([1003, "Carlos", "PENDIENTE", None, None])
+    ws["C2"].font = Font(bold=True)
+    path = tmp_path / "renovaciones.xlsx"
+    wb.save(path)
+    _share_strings(path)
+    yield path
+    cache.invalidate(path)
+
+
+def _edit_parts(path, edits, added=None):
+    with zipfile.ZipFile(path) as package:
+        parts = [(info, package.read(info)) for info in package.infolist()]
+    with zipfile.ZipFile(path, "w") as package:
+        for info, data in parts:
+            package.writestr(info, edits[info.filename](data) if info.filename in edits else data)
+        for name, data in (added or {}).items():
+            package.writestr(name, data)
+
+
+def _edit_sheet_xml(path, edit):
+    _edit_parts(path, {SHEET_PART: edit})
+
+
+def _share_strings(path):
+    # openpyxl writes inline strings; Excel keeps text in the shared strings
+    # table, so move it there as Excel would
+    strings = []
+
+    def share(match):
+        strings.append(match.group(3))
+        return b'<c r="%s"%s t="s"><v>%d</v></c>' % (match.group(1), match.group(2), len(strings) - 1)
+
+    inline = re.compile(rb'<c r="([A-Z]+\d+)"([^>]*?) t="inlineStr"><is><t>([^<]*)</t></is></c>')
+    sheet = lambda xml: inline.sub(share, xml)
+    _edit_sheet_xml(path, sheet)
+    table = b"".join(b"<si><t>%s</t></si>" % text for text in strings)
+    _edit_parts(path, {
+        "[Content_Types].xml": lambda xml: xml.replace(b"</Types>", (
+            b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+            b'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')),
+        "xl/_rels/workbook.xml.rels": lambda xml: xml.replace(b"</Relationships>", (
+            b'<Relationship Id="rIdStrings" Target="sharedStrings.xml" Type="http://schemas.'
+            b'openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/></Relationships>')),
+    }, {"xl/sharedStrings.xml": (
+        b'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="%d" uniqueCount="%d">%s</sst>'
+        % (len(strings), len(strings), table))})
+
+
+def _sheet_xml(path, part=SHEET_PART):
+    with zipfile.ZipFile(path) as package:
+        return package.read(part)
+
+
+def _patch(path, edits):
+    patch = xlsx.SheetPatch(path, SHEET)
+    for (column, row), value in edits.items():
+        patch.set(column, row, value)
+    patch.save()
+
+
+def test_existing_cell_keeps_its_style(workbook):
+    _patch(workbook, {("C", 2): "RENOVADA"})
+    cell = load_workbook(workbook)[SHEET]["C2"]
+    assert cell.value == "RENOVADA"
+    assert cell.font.bold
+
+
+def test_missing_cell_is_inserted_in_column_order(workbook):
+    _patch(workbook, {("D", 3): "EXP-9", ("C", 3): 7})
+    ws = load_workbook(workbook)[SHEET]
+    assert [cell.value for cell in ws[3]] == [1002, "Beatriz", 7, "EXP-9", None]
+    row = re.search(rb'<row r="3".*?</row>', _sheet_xml(workbook)).group(0)
+    assert [ref for ref in re.findall(rb'<c r="([A-Z]+)3"', row)] == [b"A", b"B", b"C", b"D"]
+
+
+def test_only_the_edited_rows_change(workbook):
+    before = _sheet_xml(workbook)
+    _patch(workbook, {("E", 3): "b@example.com", ("C", 3): None})
+    after = _sheet_xml(workbook)
+    rows = lambda xml: re.findall(rb'<row r="\d+".*?</row>', xml)
+    assert [old == new for old, new in zip(rows(before), rows(after))] == [True, True, False, True]
+    assert load_workbook(workbook)[SHEET]["E3"].value == "b@example.com"
+
+
+def test_row_with_r_after_other_attributes(workbook):
+    _edit_sheet_xml(workbook, lambda xml: xml.replace(b'<row r="3">', b'<row spans="1:5" r="3">'))
+    patch = xlsx.SheetPatch(workbook, SHEET)
+    assert patch.value("B", 3) == "Beatriz"
+    patch.set("C", 3, "RENOVADA")
+    patch.save()
+    assert b'<row spans="1:5" r="3">' in _sheet_xml(workbook)
+    assert load_workbook(workbook)[SHEET]["C3"].value == "RENOVADA"
+
+
+def test_shared_and_inline_strings(workbook):
+    # Row 4 then mixes shared strings, an inline string and a number
+    _edit_sheet_xml(workbook, lambda xml: re.sub(
+        rb'<c r="B4" t="s"><v>\d+</v></c>', b'<c r="B4" t="inlineStr"><is><t>Carlos &lt;CEO&gt;</t></is></c>', xml))
+    before = _sheet_xml(workbook, "xl/sharedStrings.xml")
+    patch = xlsx.SheetPatch(workbook, SHEET)
+    assert patch.header() == {name: "ABCDE"[i] for i, name in enumerate(HEADER)}
+    assert patch.value("B", 2) == "Ana & Luis"
+    assert patch.value("B", 4) == "Carlos <CEO>"
+    assert patch.value("A", 4) == "1003"
+    assert patch.value("D", 4) is None
+    patch.set("E", 4, 'c&"o"@example.com')
+    patch.save()
+
+    # New text goes in as an inline string; the shared table is untouched
+    assert _sheet_xml(workbook, "xl/sharedStrings.xml") == before
+    ws = load_workbook(workbook)[SHEET]
+    assert [cell.value for cell in ws[4]] == [1003, "Carlos <CEO>", "PENDIENTE", None, 'c&"o"@example.com']
+
+
+def test_formula_cells_are_unsupported(workbook):
+    _edit_sheet_xml(workbook, lambda xml: xml.replace(b'<c r="A4" t="n"><v>1003</v></c>', b'<c r="A4"><f>1000+3</f><v>1003</v></c>'))
+    patch = xlsx.SheetPatch(workbook, SHEET)
+    with pytest.raises(xlsx.Unsupported):
+        patch.set("A", 4, 5)
+    patch.close()
+
+
+def test_cells_without_references_are_unsupported(workbook):
+    _edit_sheet_xml(workbook, lambda xml: xml.replace(b'<c r="B3" ', b'<c '))
+    patch = xlsx.SheetPatch(workbook, SHEET)
+    with pytest.raises(xlsx.Unsupported):
+        patch.value("B", 3)
+    patch.close()
+
+
+@pytest.fixture
+def rewrites(monkeypatch):
+    calls = []
+    rewrite = policies._rewrite_batch
+    monkeypatch.setattr(policies, "_rewrite_batch", lambda target, edits: calls.append(edits) or rewrite(target, edits))
+    return calls
+
+
+def _target(path):
+    return policies.RenewalTarget("SURA", "VIDA", path, SHEET, "POLIZA")
+
+
+def test_write_batch_patches_and_updates_the_cache(workbook, rewrites):
+    target = _target(workbook)
+    results = policies.write_batch(target, {"1001": {"ESTATUS_DE_RENOVACION": "RENOVADA"}, "9999": {"EXPEDIENTE": "x"}})
+    assert results == {"1001": None, "9999": "Policy 9999 not found"}
+    assert rewrites == []
+    assert load_workbook(workbook)[SHEET]["C2"].value == "RENOVADA"
+    assert policies.locate(target, "1001").first()["ESTATUS_DE_RENOVACION"] == "RENOVADA"
+
+
+def test_write_batch_falls_back_to_openpyxl_for_formulas(workbook, rewrites):
+    _edit_sheet_xml(workbook, lambda xml: re.sub(
+        rb'<c r="E2"[^>]*>.*?</c>', b'<c r="E2" t="str"><f>LOWER("ANA@EXAMPLE.COM")</f><v>ana@example.com</v></c>', xml))
+    results = policies.write_batch(_target(workbook), {"1001": {"Email": "nueva@example.com"}})
+    assert results == {"1001": None}
+    assert len(rewrites) == 1
+    assert load_workbook(workbook)[SHEET]["E2"].value == "nueva@example.com"
+
+
+def test_write_batch_falls_back_to_openpyxl_for_new_columns(workbook, rewrites):
+    results = policies.write_batch(_target(workbook), {"1002": {"NOTAS": "llamar"}})
+    assert results == {"1002": None}
+    assert len(rewrites) == 1
+    ws = load_workbook(workbook)[SHEET]
+    assert ws.cell(row=1, column=6).value == "NOTAS"
+    assert ws.cell(row=3, column=6).value == "llamar"
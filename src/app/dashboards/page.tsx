@@ -1,7 +1,6 @@
-import { getCobranzaVida, getCobranzaGMM } from '@/modules/cobranza/service';
+import { getCommissionRollup } from '@/modules/dashboards/service';
 import { DashboardsView } from '@/components/dashboards/DashboardsView';
 import { DateRangeFilter } from '@/components/ui/DateRangeFilter';
-import { CobranzaVida, CobranzaGMM, CobranzaSura, CobranzaAarco } from '@/lib/types/cobranza';
 import Link from 'next/link';
 
 export const dynamic = 'force-dynamic';
@@ -16,19 +15,8 @@ export default async function DashboardsPage({
     const startDate = params.startDate;
     const endDate = params.endDate;
 
-    let vidaData: CobranzaVida[] = [];
-    let gmmData: CobranzaGMM[] = [];
-    let suraData: CobranzaSura[] = [];
-    let aarcoData: CobranzaAarco[] = [];
-
-    if (insurer === 'Metlife') {
-        vidaData = await getCobranzaVida(startDate, endDate, insurer) as CobranzaVida[];
-        gmmData = await getCobranzaGMM(startDate, endDate, insurer) as CobranzaGMM[];
-    } else if (insurer === 'SURA') {
-        suraData = await getCobranzaVida(startDate, endDate, insurer) as CobranzaSura[];
-    } else if (insurer === 'AARCO_AXA') {
-        aarcoData = (await getCobranzaVida(startDate, endDate, insurer)) as unknown as CobranzaAarco[];
-    }
+    // Monthly commission totals are aggregated by the backend
+    const rollup = await getCommissionRollup(insurer, startDate, endDate);
 
     return (
         <div className="flex flex-col h-full bg-gray-50/50">
@@ -57,10 +45,7 @@ export default async function DashboardsPage({
 
             <div className="flex-1 min-h-0 px-8 pb-8 overflow-y-auto">
                 <DashboardsView
-                    vidaData={vidaData}
-                    gmmData={gmmData}
-                    suraData={suraData}
-                    aarcoData={aarcoData}
+                    rollup={rollup}
                     insurer={insurer}
                 />
             </div>
@@ -11,17 +11,14 @@ import {
     Legend,
     ResponsiveContainer
 } from 'recharts';
-import { CobranzaGMM, CobranzaVida, CobranzaSura, CobranzaAarco } from '@/lib/types/cobranza';
+import { CommissionRollup } from '@/lib/types/dashboards';
 
 interface DashboardsViewProps {
-    vidaData?: CobranzaVida[];
-    gmmData?: CobranzaGMM[];
-    suraData?: CobranzaSura[];
-    aarcoData?: CobranzaAarco[];
+    rollup?: CommissionRollup[];
     insurer?: string;
 }
 
-export function DashboardsView({ vidaData = [], gmmData = [], suraData = [], aarcoData = [], insurer = 'Metlife' }: DashboardsViewProps) {
+export function DashboardsView({ rollup = [], insurer = 'Metlife' }: DashboardsViewProps) {
     const [activeTab, setActiveTab] = useState<'VIDA' | 'GMM'>('VIDA');
 
     // Helper to format money for tooltip
@@ -30,58 +27,20 @@ export function DashboardsView({ vidaData = [], gmmData = [], suraData = [], aar
     };
 
     const chartData = useMemo(() => {
-        const dataMap = new Map<string, number>();
-
-        // Select Data Source and Metric Key based on rules
-        let sourceData: any[] = [];
-        let dateKey = '';
-        let valueKey = '';
-
-        if (insurer === 'Metlife') {
-            if (activeTab === 'VIDA') {
-                sourceData = vidaData;
-                dateKey = 'Fecha de Pago del Recibo';
-                valueKey = 'Comisión Neta';
-            } else { // GMM
-                sourceData = gmmData;
-                dateKey = 'Fecha de Pago del Recibo';
-                valueKey = 'Comisión Neta';
-            }
-        } else if (insurer === 'SURA') {
-            sourceData = suraData;
-            dateKey = 'Fecha aplicación de la póliza';
-            valueKey = 'Total Comisión pagado';
-        } else if (insurer === 'AARCO_AXA') {
-            sourceData = aarcoData;
-            dateKey = 'F_COBRO';
-            valueKey = 'COM_APL_MN';
-        }
-
-        // Aggregate by Month
-        sourceData.forEach(item => {
-            const dateStr = item[dateKey];
-            const val = item[valueKey];
-
-            if (dateStr && typeof val === 'number') {
-                // Extract YYYY-MM
-                const date = new Date(dateStr);
-                if (!isNaN(date.getTime())) {
-                    const monthKey = date.toISOString().slice(0, 7); // YYYY-MM
-                    const current = dataMap.get(monthKey) || 0;
-                    dataMap.set(monthKey, current + val);
-                }
-            }
-        });
-
-        // Convert Map to Array and Sort
-        const result = Array.from(dataMap.entries()).map(([month, total]) => ({
-            month,
-            total
+        // Rows arrive already summed per month ('Comisión Neta' for Metlife,
+        // 'Total Comisión pagado' for SURA, 'COM_APL_MN' for AARCO & AXA)
+        const rows = insurer === 'Metlife'
+            ? rollup.filter(row => row.type === activeTab)
+            : rollup;
+
+        const result = rows.map(row => ({
+            month: row.month,
+            total: row.total
         }));
 
         return result.sort((a, b) => a.month.localeCompare(b.month)); // Sort chronological
 
-    }, [vidaData, gmmData, suraData, aarcoData, insurer, activeTab]);
+    }, [rollup, insurer, activeTab]);
 
     return (
         <div className="flex flex-col h-full space-y-6">
@@ -0,0 +1,10 @@
+export interface CommissionRollup {
+    insurer: string;
+    type: string;
+    month: string; // YYYY-MM
+    producto?: string | null;
+    conducto?: string | null;
+    prospectador?: string | null;
+    total: number;
+    count: number;
+}
@@ -0,0 +1,12 @@
+import { fetchFromApi } from '@/lib/api';
+import { CommissionRollup } from '@/lib/types/dashboards';
+
+export async function getCommissionRollup(insurer: string, startDate?: string, endDate?: string): Promise<CommissionRollup[]> {
+    const params: Record<string, string> = { insurer };
+    if (startDate) params.start_date = startDate;
+    if (endDate) params.end_date = endDate;
+
+    const queryString = new URLSearchParams(params).toString();
+
+    return fetchFromApi<CommissionRollup[]>(`/dashboards/rollup?${queryString}`);
+}